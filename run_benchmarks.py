@@ -0,0 +1,24 @@
+"""
+This script runs the benchmarks on synthetic data and saves the results as JSON, or compares two result files.
+"""
+import argparse
+from src.benchmarks.runner import run_benchmarks, compare_results
+
+benchmark_config_path = 'src/config/benchmark_config.yaml'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmarks, or compare two benchmark results.")
+    parser.add_argument('--scenarios', nargs='+', default=None,
+                        help="Scenarios to run: transform, match, match_bulk, rank_and_filter and/or startup (default: all).")
+    parser.add_argument('--models', nargs='+', default=None, help="Models to benchmark (default: all models of the config).")
+    parser.add_argument('--output', default=None, help="Path of the results file (default: output_path of the config).")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), default=None,
+                        help="Compare two results files instead of running the benchmarks.")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Relative slowdown that counts as a regression.")
+    args = parser.parse_args()
+    if args.compare:
+        comparison = compare_results(*args.compare, tolerance=args.tolerance)
+        if any(case['regression'] for case in comparison):
+            raise SystemExit(1)
+    else:
+        run_benchmarks(benchmark_config_path, scenarios=args.scenarios, models=args.models, output_path=args.output)
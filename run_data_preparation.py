@@ -1,9 +1,14 @@
 """
 This script prepares the training and testing dataset from the raw json file.
 """
+import argparse
 from src.pipelines.data_preparation import prepare_data
 
 data_config_path = 'src/config/data_config.yaml'
 
 if __name__ == "__main__":
-    prepare_data(data_config_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Prepare the training and testing datasets.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of processes for the feature transformation (default: transform_workers of the data config).")
+    args = parser.parse_args()
+    prepare_data(data_config_path, workers=args.workers)
@@ -0,0 +1,20 @@
+"""
+This script load tests the API on this machine and saves the latency, error rate and throughput per endpoint as JSON.
+"""
+import argparse
+from src.benchmarks.load_test import run_load_test
+
+load_test_config_path = 'src/config/load_test_config.yaml'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the match, match_bulk and rank_and_filter endpoints.")
+    parser.add_argument('requests', nargs='*',
+                        help="Recorded requests to replay: .json request bodies or .jsonl files (default: synthesized requests).")
+    parser.add_argument('--url', default=None, help="URL of a running API server (default: start a local uvicorn server).")
+    parser.add_argument('--rate', type=float, default=None, help="Open loop arrivals per second, 0 for a closed loop.")
+    parser.add_argument('--concurrency', type=int, default=None, help="Maximum number of requests in flight.")
+    parser.add_argument('--duration', type=float, default=None, help="Seconds to send requests for.")
+    parser.add_argument('--output', default=None, help="Path of the report (default: output_path of the config).")
+    args = parser.parse_args()
+    run_load_test(load_test_config_path, request_files=args.requests or None, url=args.url, rate=args.rate,
+                  concurrency=args.concurrency, duration=args.duration, output_path=args.output)
@@ -1,10 +1,100 @@
-from fastapi import FastAPI
-from typing import Any
+import json
+import os
+import time
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, Callable, Iterator, Optional
 from src.api.search import Search
-from src.api.schemas import MatchRequest, MatchBulkRequest, RankAndFilterRequest
+from src.api.catalog import UnknownJobIds
+from src.api.schemas import MatchRequest, MatchBulkRequest, RankAndFilterRequest, JobsUpsertRequest, JobsDeleteRequest, \
+    ColumnarMatchBulkRequest, ColumnarRankAndFilterRequest
+from src.api.metrics import MetricsRegistry, SearchCacheMetrics, latency_buckets
+from src.api.reload import SearchReloader
+from src.utils import instrumentation
+from src.utils.config_utils import load_yaml_config
+
+# The model config can be chosen per deployment with the MODEL_CONFIG_PATH environment variable
+model_config_path = os.environ.get("MODEL_CONFIG_PATH", "src/config/model_logistic_regression.yaml")
+model_config = load_yaml_config(model_config_path)
+instrumentation.configure(model_config.get('instrumentation', False), memory=model_config.get('trace_memory', False))
 
 app = FastAPI(title="Talent Job Matching API")
-search = Search(model_config_path="src/config/model_logistic_regression.yaml")
+# With metrics_dir, the metrics of all uvicorn worker processes are aggregated through that directory
+metrics = MetricsRegistry(directory=model_config.get('metrics_dir'))
+
+# Requests are served by the current Search of the reloader, a retrained model is swapped in by POST /admin/reload,
+# or, with model_watch_interval, as soon as the model artifact changes (needed with several uvicorn workers).
+# The cache counters of a replaced model are kept, so that they never go down
+reloader = SearchReloader(lambda: Search(model_config_path=model_config_path, metrics=metrics),
+                          Search.model_artifact_paths(model_config_path),
+                          watch_interval=model_config.get('model_watch_interval'), metrics=metrics,
+                          on_swap=lambda previous, search: cache_metrics.swap(previous, search),
+                          on_retire=lambda search: cache_metrics.retire(search))
+cache_metrics = SearchCacheMetrics(reloader.search)
+metrics.add_collector(cache_metrics)
+
+@app.on_event("shutdown")
+def shutdown():
+    reloader.close()
+    # The last snapshot, with the requests since the previous one
+    metrics.close()
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    # With instrumentation enabled, the stages of every request are logged and returned in a Server-Timing header
+    # (for streamed responses only the stages before the first chunk make it into the header)
+    request_trace = instrumentation.trace(request.url.path)
+    if request_trace is None:
+        return await call_next(request)
+    with request_trace:
+        response = await call_next(request)
+    response.headers["Server-Timing"] = instrumentation.server_timing(request_trace)
+    request_trace.log(status=response.status_code)
+    return response
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Unknown paths share one label, so that the number of series stays bounded
+        endpoint = request.url.path if request.url.path in route_paths else "other"
+        metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=status)
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - start, latency_buckets, endpoint=endpoint)
+
+def ndjson_response(chunks: Iterator[list[dict]], on_close: Optional[Callable[[], None]] = None) -> StreamingResponse:
+    """
+    Stream result chunks as newline-delimited JSON, one result per line. on_close runs once the response is done,
+    also when the client disconnected before the body was streamed.
+    """
+    lines = ("".join(json.dumps(result) + "\n" for result in chunk) for chunk in chunks)
+    return StreamingResponse(lines, media_type="application/x-ndjson",
+                             background=BackgroundTask(on_close) if on_close is not None else None)
+
+def run_search(call: Callable[[Search], Any], stream: bool = False) -> Any:
+    """
+    Run a search on the current Search. It stays leased until the results are built (for streamed responses, until
+    the last chunk is sent), so a model reload meanwhile does not close it. Unknown job ids are a 404.
+    """
+    search = reloader.acquire()
+    try:
+        results = call(search)
+    except UnknownJobIds as e:
+        reloader.release(search)
+        raise HTTPException(status_code=404, detail=str(e))
+    except BaseException:
+        reloader.release(search)
+        raise
+    if stream:
+        release = reloader.release_once(search)
+        return ndjson_response(reloader.release_after(release, results), on_close=release)
+    reloader.release(search)
+    return results
 
 @app.get("/")
 def read_root():
@@ -12,18 +102,75 @@ def read_root():
 
 @app.post("/match", response_model=dict)
 def match(request: MatchRequest):
-    result = search.match(request.talent.model_dump(), request.job.model_dump())
-    return result
+    return run_search(lambda search: search.match(request.talent.model_dump(), request.job.model_dump()))
 
 @app.post("/match_bulk", response_model=list[dict])
 def match_bulk(request: MatchBulkRequest):
     talents_list = [talent.model_dump() for talent in request.talents]
-    jobs_list = [job.model_dump() for job in request.jobs]
-    results = search.match_bulk(talents_list, jobs_list, request.filter_false_predictions)
-    return results
+    jobs_list = None if request.jobs is None else [job.model_dump() for job in request.jobs]
+    return run_search(lambda search: (search.match_bulk_chunks if request.stream else search.match_bulk)(
+        talents_list, jobs_list, request.filter_false_predictions, request.top_k, request.top_k_per_talent,
+        job_ids=request.job_ids, ids_only=request.ids_only), request.stream)
 
 @app.post("/rank_and_filter", response_model=list[dict])
 def rank_and_filter(request: RankAndFilterRequest):
-    jobs_list = [job.model_dump() for job in request.jobs]
-    results = search.rank_and_filter(request.talent.model_dump(), jobs_list, request.criteria)
-    return results
\ No newline at end of file
+    jobs_list = None if request.jobs is None else [job.model_dump() for job in request.jobs]
+    return run_search(lambda search: (search.rank_and_filter_chunks if request.stream else search.rank_and_filter)(
+        request.talent.model_dump(), jobs_list, request.criteria, job_ids=request.job_ids, ids_only=request.ids_only), request.stream)
+
+@app.post("/match_bulk_columnar", response_model=list[dict])
+def match_bulk_columnar(request: ColumnarMatchBulkRequest):
+    # Columnar batches are passed on as plain column lists, the results carry talent_id and job_id
+    jobs_columns = None if request.jobs is None else request.jobs.model_dump()
+    return run_search(lambda search: (search.match_bulk_chunks if request.stream else search.match_bulk)(
+        request.talents.model_dump(), jobs_columns, request.filter_false_predictions, request.top_k,
+        request.top_k_per_talent, job_ids=request.job_ids, ids_only=True), request.stream)
+
+@app.post("/rank_and_filter_columnar", response_model=list[dict])
+def rank_and_filter_columnar(request: ColumnarRankAndFilterRequest):
+    jobs_columns = None if request.jobs is None else request.jobs.model_dump()
+    return run_search(lambda search: (search.rank_and_filter_chunks if request.stream else search.rank_and_filter)(
+        request.talent.model_dump(), jobs_columns, request.criteria, job_ids=request.job_ids, ids_only=True), request.stream)
+
+@app.get("/jobs", response_model=list[str])
+def list_jobs():
+    return reloader.search.catalog.job_ids()
+
+@app.post("/jobs", response_model=dict)
+def upsert_jobs(request: JobsUpsertRequest):
+    upserted = reloader.upsert_jobs([job.model_dump() for job in request.jobs])
+    return {"upserted": upserted, "total": len(reloader.search.catalog)}
+
+@app.delete("/jobs", response_model=dict)
+def delete_jobs(request: JobsDeleteRequest):
+    deleted = reloader.delete_jobs(request.job_ids)
+    return {"deleted": deleted, "total": len(reloader.search.catalog)}
+
+@app.get("/talent_cache_stats", response_model=dict)
+def talent_cache_stats():
+    return reloader.search.talent_cache.stats()
+
+@app.get("/score_cache_stats", response_model=dict)
+def score_cache_stats():
+    score_cache = reloader.search.score_cache
+    return score_cache.stats() if score_cache is not None else {}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/reload", response_model=dict)
+def reload_model(wait: bool = False):
+    # Without wait, the reload runs in the background and GET /admin/model shows when it is done
+    if not wait:
+        return {"started": reloader.reload_in_background(), **reloader.status()}
+    if not reloader.reload():
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {reloader.last_error}")
+    return reloader.status()
+
+@app.get("/admin/model", response_model=dict)
+def model_status():
+    return reloader.status()
+
+# The paths of the endpoints above, for the endpoint label of the request metrics
+route_paths = {route.path for route in app.routes}
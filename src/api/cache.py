@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+def content_hash(payload: Any) -> str:
+    """
+    A stable hash of a JSON-serializable payload (dict key order does not matter).
+    """
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """
+    A thread-safe LRU cache with an optional time-to-live.
+
+    Every entry is stored together with a version (e.g. a content hash of the payload it was computed from).
+    A lookup with a different version is a miss and drops the entry, so a stale value is never served.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None):
+        """
+        Args:
+            maxsize: Maximum number of entries, the least recently used entry is evicted first (0 disables the cache).
+            ttl: Time-to-live of an entry in seconds (None for no expiry).
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable, version: Hashable = None) -> Optional[Any]:
+        """
+        Get the value of a key if it is cached with the same version and has not expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry_version, value, expires_at = entry
+                if entry_version == version and (expires_at is None or expires_at > time.monotonic()):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, version: Hashable = None) -> None:
+        """
+        Cache a value, evicting the least recently used entries when the cache is full.
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self.lock:
+            self.entries[key] = (version, value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drop all entries (the counters are kept).
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Cache size and hit/miss counters, to help sizing the cache.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
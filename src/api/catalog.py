@@ -0,0 +1,140 @@
+from __future__ import annotations
+import threading
+from typing import Any, Optional
+import numpy as np
+from src.api.columns import job_columns
+from src.data_processing.feature_transformer.cross_transformer import CrossFeatureTransformer, concat_encodings, slice_encoding
+from src.utils.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+
+
+class UnknownJobIds(KeyError):
+    """
+    Raised when a request refers to job ids that are not in the job catalog.
+    """
+
+    def __init__(self, job_ids: list[str]):
+        super().__init__(job_ids)
+        self.job_ids = job_ids
+
+    def __str__(self) -> str:
+        return f"Jobs not in the catalog: {self.job_ids}"
+
+
+class JobCatalog:
+    """
+    In-memory job catalog keyed by job_id.
+
+    Jobs are encoded once when they are upserted and kept as columnar encodings (salary, degree label,
+    seniority mask, role bitsets, language matrices), so ranking requests can refer to jobs by id
+    instead of sending and featurizing the full job payloads every time.
+    Writes build a new immutable state that is swapped in atomically, so readers never see a half update.
+    """
+
+    def __init__(self, cross_transformer: CrossFeatureTransformer, frames: bool = True):
+        """
+        Args:
+            cross_transformer: The transformer used to encode the jobs (shared with Search, so the
+                job encodings and the talent encodings use the same vocabularies).
+            frames: Keep a job frame for the criteria masks. Without it (the slim serving mode), the jobs are
+                encoded from columns and the criteria are evaluated on the job dicts, so pandas is not needed.
+        """
+        self.cross_transformer = cross_transformer
+        self.frames = frames
+        self.lock = threading.Lock()
+        # (jobs, job frame with 'job.*' columns (None without frames), job encoding, job_id -> row)
+        self.state = ([], pd.DataFrame() if frames else None, None, {})
+
+    def __len__(self) -> int:
+        return len(self.state[0])
+
+    def job_ids(self) -> list[str]:
+        """
+        All job ids in the catalog, in catalog order.
+        """
+        return list(self.state[3])
+
+    @staticmethod
+    def take_rows(state: tuple, rows: np.ndarray) -> tuple[list[dict], Optional[pd.DataFrame], Optional[dict[str, Any]]]:
+        """
+        Jobs, frame and encoding of the given rows of a catalog state.
+        """
+        jobs, frame, encoding, _ = state
+        if len(rows) == 0:
+            return [], None if frame is None else pd.DataFrame(), None
+        frame = None if frame is None else frame.iloc[rows].reset_index(drop=True)
+        return [jobs[row] for row in rows], frame, slice_encoding(encoding, rows)
+
+    def upsert(self, jobs: list[dict]) -> int:
+        """
+        Insert new jobs or replace existing jobs with the same job_id. Only the upserted jobs are encoded.
+
+        Args:
+            jobs: A list of job data dicts.
+
+        Returns:
+            Number of upserted jobs.
+        """
+        # The last version wins when the same job_id is sent more than once
+        jobs = list({job['job_id']: job for job in jobs}.values())
+        if not jobs:
+            return 0
+        if self.frames:
+            new_frame = pd.json_normalize([{"job": job} for job in jobs], sep='.')
+            new_encoding = self.cross_transformer.encode_jobs(new_frame)
+        else:
+            new_encoding = self.cross_transformer.encode_job_columns(job_columns(jobs))
+
+        with self.lock:
+            upserted_ids = {job['job_id'] for job in jobs}
+            rows = np.array([row for job_id, row in self.state[3].items() if job_id not in upserted_ids], dtype=int)
+            kept_jobs, kept_frame, kept_encoding = self.take_rows(self.state, rows)
+
+            all_jobs = kept_jobs + jobs
+            frame = pd.concat([kept_frame, new_frame], ignore_index=True) if self.frames else None
+            encoding = new_encoding if kept_encoding is None else concat_encodings([kept_encoding, new_encoding])
+            self.state = (all_jobs, frame, encoding, {job['job_id']: row for row, job in enumerate(all_jobs)})
+        return len(jobs)
+
+    def delete(self, job_ids: list[str]) -> int:
+        """
+        Delete jobs from the catalog (unknown ids are ignored).
+
+        Args:
+            job_ids: The ids of the jobs to delete.
+
+        Returns:
+            Number of deleted jobs.
+        """
+        with self.lock:
+            deleted_ids = set(job_ids)
+            index = self.state[3]
+            rows = np.array([row for job_id, row in index.items() if job_id not in deleted_ids], dtype=int)
+            n_deleted = len(index) - len(rows)
+            if n_deleted:
+                jobs, frame, encoding = self.take_rows(self.state, rows)
+                self.state = (jobs, frame, encoding, {job['job_id']: row for row, job in enumerate(jobs)})
+        return n_deleted
+
+    def select(self, job_ids: Optional[list[str]] = None) -> tuple[list[dict], Optional[pd.DataFrame], Optional[dict[str, Any]]]:
+        """
+        Get jobs from the catalog together with their frame and encoding.
+
+        Args:
+            job_ids: The ids of the jobs to get, all jobs when None.
+
+        Returns:
+            The job dicts, the job frame ('job.*' columns, None without frames) and the job encoding, row-aligned.
+
+        Raises:
+            UnknownJobIds: If a job id is not in the catalog.
+        """
+        state = self.state
+        jobs, frame, encoding, index = state
+        if job_ids is None:
+            return jobs, frame, encoding
+        missing = [job_id for job_id in job_ids if job_id not in index]
+        if missing:
+            raise UnknownJobIds(missing)
+        return self.take_rows(state, np.array([index[job_id] for job_id in job_ids], dtype=int))
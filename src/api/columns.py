@@ -0,0 +1,61 @@
+"""
+Columnar (struct-of-arrays) talent and job batches, see schemas.TalentColumns and schemas.JobColumns.
+
+Scalar fields are parallel lists with one entry per talent or job. List fields are offset-encoded:
+the items of row i are values[offsets[i]:offsets[i + 1]], and the languages are split into parallel
+title, rating (and must_have for jobs) lists.
+"""
+from __future__ import annotations
+from typing import Any
+
+
+def list_column(lists: list[list]) -> dict[str, list]:
+    """
+    Offset-encode a list of lists.
+    """
+    offsets, values = [0], []
+    for items in lists:
+        values.extend(items)
+        offsets.append(len(values))
+    return {"offsets": offsets, "values": values}
+
+
+def language_column(languages: list[list[dict]], must_have: bool = False) -> dict[str, list]:
+    """
+    Offset-encode lists of languages into parallel title and rating (and must_have) lists.
+    """
+    column = list_column(languages)
+    items = column.pop("values")
+    column["title"] = [lang["title"] for lang in items]
+    column["rating"] = [lang["rating"] for lang in items]
+    if must_have:
+        column["must_have"] = [bool(lang.get("must_have")) for lang in items]
+    return column
+
+
+def talent_columns(talents: list[dict]) -> dict[str, Any]:
+    """
+    Convert talent dicts into a columnar talent batch.
+    """
+    return {
+        "talent_id": [talent["talent_id"] for talent in talents],
+        "salary_expectation": [talent["salary_expectation"] for talent in talents],
+        "degree": [talent["degree"] for talent in talents],
+        "seniority": [talent["seniority"] for talent in talents],
+        "job_roles": list_column([talent["job_roles"] for talent in talents]),
+        "languages": language_column([talent["languages"] for talent in talents]),
+    }
+
+
+def job_columns(jobs: list[dict]) -> dict[str, Any]:
+    """
+    Convert job dicts into a columnar job batch.
+    """
+    return {
+        "job_id": [job["job_id"] for job in jobs],
+        "max_salary": [job["max_salary"] for job in jobs],
+        "min_degree": [job["min_degree"] for job in jobs],
+        "seniorities": list_column([job["seniorities"] for job in jobs]),
+        "job_roles": list_column([job["job_roles"] for job in jobs]),
+        "languages": language_column([job["languages"] for job in jobs], must_have=True),
+    }
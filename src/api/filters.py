@@ -0,0 +1,147 @@
+"""
+Job filtering criteria for rank_and_filter.
+
+Every criterion only depends on job fields, so it is compiled into a vectorized boolean mask over the
+whole job batch and evaluated before any feature transformation or model scoring (filter push-down).
+New criteria are added by writing a mask function and registering it in criteria_masks.
+
+A job batch is a DataFrame with 'job.*' columns, (in the slim serving mode, without pandas) the list of job dicts,
+or a columnar job batch (see src/api/columns.py), whose list fields are evaluated on the offset-encoded arrays.
+"""
+from __future__ import annotations
+from typing import Any, Callable
+import numpy as np
+from src.config.feature_settings import degree_mapping
+from src.data_processing.feature_transformer.encoders import flatten_lists, encode_labels
+from src.utils.lazy_imports import LazyModule
+from src.utils.log import log
+
+pd = LazyModule('pandas')
+
+
+def job_column(jobs: pd.DataFrame | list[dict] | dict[str, Any], name: str, default: Any) -> list:
+    """
+    Get a (scalar) job column as a python list, with the default for missing jobs fields.
+    """
+    if isinstance(jobs, dict):
+        values = jobs[name]
+    elif isinstance(jobs, list):
+        values = [job.get(name) for job in jobs]
+    else:
+        column = f'job.{name}'
+        if column not in jobs:
+            return [default] * len(jobs)
+        values = jobs[column]
+    return [default if value is None or (isinstance(value, float) and np.isnan(value)) else value for value in values]
+
+
+def lists_contain_any(lists: list[list], values: list) -> np.ndarray:
+    """
+    Mask of the lists that contain at least one of the values.
+    """
+    rows, items = flatten_lists(lists)
+    mask = np.zeros(len(lists), dtype=bool)
+    mask[rows[np.isin(np.asarray(items, dtype=object), values)]] = True
+    return mask
+
+
+def count_per_row(flags: np.ndarray, offsets: list[int]) -> np.ndarray:
+    """
+    Number of set flags per row of an offset-encoded list column, given one flag per item.
+    """
+    counts = np.concatenate([[0], np.cumsum(flags, dtype=np.int64)])
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return counts[offsets[1:]] - counts[offsets[:-1]]
+
+
+def list_field_contains_any(jobs: pd.DataFrame | list[dict] | dict[str, Any], name: str, values: list) -> np.ndarray:
+    """
+    Mask of the jobs whose list field contains at least one of the values (lists_contain_any, or the
+    same on the offset-encoded column of a columnar job batch).
+    """
+    if isinstance(jobs, dict):
+        column = jobs[name]
+        return count_per_row(np.isin(np.asarray(column['values'], dtype=object), values), column['offsets']) > 0
+    return lists_contain_any(job_column(jobs, name, []), values)
+
+
+def n_jobs(jobs: pd.DataFrame | list[dict] | dict[str, Any]) -> int:
+    """
+    Number of jobs in a job batch.
+    """
+    return len(jobs['job_id']) if isinstance(jobs, dict) else len(jobs)
+
+
+def max_salary_mask(jobs: pd.DataFrame | list[dict] | dict[str, Any], salary_expectation: int) -> np.ndarray:
+    """
+    Keep the jobs whose max salary is at least the salary expectation.
+    """
+    return np.asarray(job_column(jobs, 'max_salary', 0), dtype=float) >= salary_expectation
+
+
+def seniority_mask(jobs: pd.DataFrame | list[dict] | dict[str, Any], seniority: str) -> np.ndarray:
+    """
+    Keep the jobs that are open to the seniority.
+    """
+    return list_field_contains_any(jobs, 'seniorities', [seniority])
+
+
+def min_degree_mask(jobs: pd.DataFrame | list[dict] | dict[str, Any], degree: str) -> np.ndarray:
+    """
+    Keep the jobs whose min degree requirement is met by the degree.
+    """
+    job_degrees = encode_labels(job_column(jobs, 'min_degree', 'none'), degree_mapping)
+    return (job_degrees >= 0) & (job_degrees <= degree_mapping.get(degree, -1))
+
+
+def must_have_languages_mask(jobs: pd.DataFrame | list[dict] | dict[str, Any], languages: list[str]) -> np.ndarray:
+    """
+    Keep the jobs whose must-have languages are all in the given languages.
+    """
+    if isinstance(jobs, dict):
+        column = jobs['languages']
+        unmet = np.asarray(column['must_have'], dtype=bool) & ~np.isin(np.asarray(column['title'], dtype=object), list(languages))
+        return count_per_row(unmet, column['offsets']) == 0
+    job_languages = job_column(jobs, 'languages', [])
+    rows, items = flatten_lists(job_languages)
+    unmet = np.array([bool(lang.get('must_have')) and lang.get('title') not in languages for lang in items], dtype=bool)
+    mask = np.ones(len(job_languages), dtype=bool)
+    mask[rows[unmet]] = False
+    return mask
+
+
+def job_roles_mask(jobs: pd.DataFrame | list[dict] | dict[str, Any], job_roles: list[str]) -> np.ndarray:
+    """
+    Keep the jobs that have at least one of the job roles.
+    """
+    return list_field_contains_any(jobs, 'job_roles', list(job_roles))
+
+
+# Criterion name -> mask function
+criteria_masks: dict[str, Callable[[pd.DataFrame | list[dict] | dict[str, Any], Any], np.ndarray]] = {
+    'salary_expectation': max_salary_mask,
+    'seniority': seniority_mask,
+    'min_degree': min_degree_mask,
+    'must_have_languages': must_have_languages_mask,
+    'job_roles': job_roles_mask,
+}
+
+
+def criteria_mask(jobs: pd.DataFrame | list[dict] | dict[str, Any], criteria: dict[str, Any]) -> np.ndarray:
+    """
+    Evaluate all criteria on a job batch.
+
+    Args:
+        jobs: DataFrame of jobs with 'job.*' columns, the list of job dicts or a columnar job batch.
+        criteria: A dictionary of criteria, say, {"salary_expectation": 80000, "seniority": "senior"}
+
+    Returns:
+        Boolean mask of the jobs that meet all criteria.
+    """
+    mask = np.ones(n_jobs(jobs), dtype=bool)
+    for name, value in criteria.items():
+        if name not in criteria_masks:
+            log.warning(f"Unknown filtering criterion '{name}' is ignored.")
+            continue
+        mask &= criteria_masks[name](jobs, value)
+    return mask
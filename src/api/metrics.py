@@ -0,0 +1,357 @@
+"""
+Operational metrics of the API in the Prometheus text format, without an external client library or service.
+
+Every process keeps its counters and histograms in memory. With a metrics directory (shared by all uvicorn
+worker processes), a background thread of every process also writes a snapshot of its metrics to
+<directory>/metrics_<run>_<process>.json every flush_interval seconds (and once more on shutdown), and GET /metrics
+merges the snapshots of all processes of the same run: counters and histograms are summed (also those of processes
+that have exited, so the counters never go down), and per-process gauges such as the memory are only reported for
+processes that are still running.
+
+A run is identified by the parent process of the workers (the uvicorn master or reloader), so the workers of one
+server agree on it without any setup, and every worker removes the snapshots of other runs when it starts.
+"""
+import glob
+import json
+import os
+import resource
+import threading
+from typing import Callable, Optional
+from src.utils.log import log
+
+latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+batch_size_buckets = [1, 10, 100, 1000, 10000, 100000]
+pairs_buckets = [1, 100, 1000, 10000, 100000, 1000000, 10000000]
+
+# Metric name -> (type, help)
+metric_definitions = {
+    'http_requests_total': ('counter', 'Requests by endpoint and status code.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint (until the response starts).'),
+    'search_batch_talents': ('histogram', 'Talents per request.'),
+    'search_batch_jobs': ('histogram', 'Jobs per request.'),
+    'search_pairs_per_request': ('histogram', 'Talent x job pairs scored per request.'),
+    'search_pairs_scored_total': ('counter', 'Talent x job pairs scored (rate() gives pairs per second).'),
+    'search_featurization_seconds_total': ('counter', 'Time spent computing pair features.'),
+    'search_inference_seconds_total': ('counter', 'Time spent in model inference (including the score cache).'),
+    'cache_hits_total': ('counter', 'Cache hits (for the score cache: rows served from the table).'),
+    'cache_lookups_total': ('counter', 'Cache lookups (for the score cache: rows predicted).'),
+    'cache_hit_ratio': ('gauge', 'Hits per lookup over all processes.'),
+    'cache_size': ('gauge', 'Entries in the cache, by process.'),
+    'catalog_jobs': ('gauge', 'Jobs in the job catalog, by process.'),
+    'process_resident_memory_bytes': ('gauge', 'Resident memory of the process.'),
+    'model_reloads_total': ('counter', 'Model reloads by status (success or failure).'),
+    'model_reload_seconds': ('histogram', 'Time to load, warm up and swap in a model.'),
+    'model_version': ('gauge', 'Number of models loaded by the process (1 until the first reload).'),
+}
+
+
+def process_memory() -> int:
+    """
+    Resident memory of this process in bytes (the peak resident memory where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def label_key(labels: dict) -> str:
+    """
+    A stable key of a label set, e.g. 'endpoint="/match",status="200"'.
+    """
+    return ','.join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+def process_start_time(pid: int) -> Optional[int]:
+    """
+    Start time of a process in clock ticks since boot (None where /proc is not available).
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            # The fields after the command name, which is in parentheses and may contain spaces
+            return int(file.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_key(pid: int) -> str:
+    """
+    A key of a process that is not reused by a later process with the same pid, e.g. '1234-56789'.
+    """
+    return f'{pid}-{process_start_time(pid) or 0}'
+
+
+def process_alive(pid: int) -> bool:
+    """
+    Whether a process is still running.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and gauges of one process, with the snapshot files for multi-process aggregation.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0):
+        """
+        Args:
+            directory: Directory shared by the worker processes (None for a single process). The snapshots of
+                previous runs in it are removed.
+            flush_interval: Time between two snapshot writes of a process in seconds.
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.run = process_key(os.getppid())
+        self.process = process_key(os.getpid())
+        self.counters = {}
+        self.histograms = {}
+        # Functions called on every snapshot, returning counters and gauges of other objects (e.g. cache stats)
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            clear_snapshots(directory, keep_run=self.run)
+            # The snapshot files are written by a thread, not in the request handling
+            self.flusher = threading.Thread(target=self.flush_periodically, name='metrics-flusher', daemon=True)
+            self.flusher.start()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increment a counter.
+        """
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: list[float], **labels) -> None:
+        """
+        Add an observation to a histogram.
+        """
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': buckets, 'counts': [0] * (len(buckets) + 1), 'sum': 0.0}
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            histogram['counts'][index] += 1
+            histogram['sum'] += value
+
+    def add_collector(self, collector: Callable[[], dict]) -> None:
+        """
+        Add a function that returns {"counters": [(name, labels, value)], "gauges": [(name, labels, value)]}
+        with the cumulative values of another object, read on every snapshot.
+        """
+        self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """
+        The metrics of this process as a JSON-serializable dict.
+        """
+        with self.lock:
+            counters = {f'{name}|{labels}': value for (name, labels), value in self.counters.items()}
+            histograms = {f'{name}|{labels}': dict(histogram, counts=list(histogram['counts']))
+                          for (name, labels), histogram in self.histograms.items()}
+        gauges = {f'process_resident_memory_bytes|': process_memory()}
+        for collector in self.collectors:
+            collected = collector()
+            for name, labels, value in collected.get('counters', []):
+                counters[f'{name}|{label_key(labels)}'] = counters.get(f'{name}|{label_key(labels)}', 0) + value
+            for name, labels, value in collected.get('gauges', []):
+                gauges[f'{name}|{label_key(labels)}'] = value
+        return {'pid': os.getpid(), 'process': self.process, 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def snapshot_path(self, process: str) -> str:
+        return os.path.join(self.directory, f'metrics_{self.run}_{process}.json')
+
+    def flush(self) -> None:
+        """
+        Write the snapshot of this process to the metrics directory.
+        """
+        if self.directory is None:
+            return
+        path = self.snapshot_path(self.process)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path + '.tmp', path)
+
+    def flush_periodically(self) -> None:
+        """
+        Write the snapshot every flush_interval seconds until close (runs in the flusher thread).
+        """
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning(f"Writing the metrics snapshot failed: {e}")
+
+    def close(self) -> None:
+        """
+        Stop the flusher thread and write the final snapshot, so that no counts of this process are lost.
+        """
+        self.stopped.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+
+    def collect(self) -> list[dict]:
+        """
+        The snapshots of all processes: this one, and the snapshot files of the others.
+        """
+        snapshots = [self.snapshot()]
+        if self.directory is None:
+            return snapshots
+        for path in glob.glob(self.snapshot_path('*')):
+            if path == self.snapshot_path(self.process):
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                # A snapshot that is being replaced, it is read on the next scrape
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        """
+        All metrics of all processes in the Prometheus text format.
+        """
+        counters, histograms, gauges = {}, {}, {}
+        for snapshot in self.collect():
+            own = snapshot['process'] == self.process
+            for key, value in snapshot['counters'].items():
+                counters[key] = counters.get(key, 0) + value
+            for key, histogram in snapshot['histograms'].items():
+                merged = histograms.setdefault(key, {'buckets': histogram['buckets'], 'counts': [0] * len(histogram['counts']), 'sum': 0.0})
+                merged['counts'] = [a + b for a, b in zip(merged['counts'], histogram['counts'])]
+                merged['sum'] += histogram['sum']
+            if own or (process_alive(snapshot['pid']) and process_key(snapshot['pid']) == snapshot['process']):
+                for key, value in snapshot['gauges'].items():
+                    name, labels = key.split('|', 1)
+                    gauges[f'{name}|{label_key({"pid": snapshot["pid"]})}{"," if labels else ""}{labels}'] = value
+
+        # Hit ratios over all processes
+        for key, lookups in list(counters.items()):
+            name, labels = key.split('|', 1)
+            if name == 'cache_lookups_total':
+                gauges[f'cache_hit_ratio|{labels}'] = counters.get(f'cache_hits_total|{labels}', 0) / lookups if lookups else 0.0
+
+        samples = {}
+        for values in [counters, gauges]:
+            for key, value in values.items():
+                name, labels = key.split('|', 1)
+                samples.setdefault(name, []).append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+        for key, histogram in histograms.items():
+            name, labels = key.split('|', 1)
+            prefix = f'{labels},' if labels else ''
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+                cumulative += count
+                samples.setdefault(name, []).append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            samples[name].append(f'{name}_sum{{{labels}}} {histogram["sum"]}' if labels else f'{name}_sum {histogram["sum"]}')
+            samples[name].append(f'{name}_count{{{labels}}} {cumulative}' if labels else f'{name}_count {cumulative}')
+
+        lines = []
+        for name in sorted(samples):
+            metric_type, help_text = metric_definitions.get(name, ('untyped', ''))
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}'] + samples[name]
+        return '\n'.join(lines) + '\n'
+
+
+def clear_snapshots(directory: str, keep_run: Optional[str] = None) -> None:
+    """
+    Remove the snapshot files of previous server runs.
+
+    Args:
+        directory: The metrics directory.
+        keep_run: Run whose snapshots are kept (None to remove all).
+    """
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json*')):
+        if keep_run is not None and os.path.basename(path).startswith(f'metrics_{keep_run}_'):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Removed by another worker starting at the same time
+            pass
+
+
+def search_cache_counters(search) -> list[tuple[str, dict, float]]:
+    """
+    The cumulative cache hits and lookups of a Search, as (name, labels, value).
+    """
+    talent_stats = search.talent_cache.stats()
+    counters = [
+        ('cache_hits_total', {'cache': 'talent'}, talent_stats['hits']),
+        ('cache_lookups_total', {'cache': 'talent'}, talent_stats['hits'] + talent_stats['misses']),
+    ]
+    if search.score_cache is not None:
+        score_stats = search.score_cache.stats()
+        counters += [
+            ('cache_hits_total', {'cache': 'score'}, score_stats['rows'] - score_stats['scored_rows']),
+            ('cache_lookups_total', {'cache': 'score'}, score_stats['rows']),
+        ]
+    return counters
+
+
+class SearchCacheMetrics:
+    """
+    A collector (see MetricsRegistry.add_collector) of the cache counters and the catalog and cache sizes of the
+    current Search. Across model reloads, the counters keep counting up: a replaced Search is still counted until
+    it is retired (its last requests may still use its caches), and then its final counts are carried over.
+    The lookups of the warm-up before a Search is swapped in are not counted.
+    """
+
+    def __init__(self, search):
+        """
+        Args:
+            search: The Search that serves the requests.
+        """
+        self.search = search
+        self.lock = threading.Lock()
+        # (name, labels) -> counts of retired Searches
+        self.carried = {}
+        # Search -> counts at the time it was swapped in, for the current Search and the replaced ones not yet retired
+        self.baselines = {search: {}}
+
+    @staticmethod
+    def counts(search) -> dict:
+        return {(name, tuple(sorted(labels.items()))): value for name, labels, value in search_cache_counters(search)}
+
+    def swap(self, previous, search) -> None:
+        """
+        Count a Search that replaces the previous one from now on (see SearchReloader on_swap).
+        """
+        with self.lock:
+            self.baselines[search] = self.counts(search)
+            self.search = search
+
+    def retire(self, search) -> None:
+        """
+        Carry the final counts of a replaced Search over (see SearchReloader on_retire).
+        """
+        with self.lock:
+            baseline = self.baselines.pop(search, {})
+            for key, value in self.counts(search).items():
+                self.carried[key] = self.carried.get(key, 0) + value - baseline.get(key, 0)
+
+    def __call__(self) -> dict:
+        with self.lock:
+            counters = dict(self.carried)
+            for search, baseline in self.baselines.items():
+                for key, value in self.counts(search).items():
+                    counters[key] = counters.get(key, 0) + value - baseline.get(key, 0)
+            search = self.search
+        gauges = [('cache_size', {'cache': 'talent'}, search.talent_cache.stats()['size']), ('catalog_jobs', {}, len(search.catalog))]
+        if search.score_cache is not None:
+            gauges.append(('cache_size', {'cache': 'score'}, search.score_cache.stats()['size']))
+        return {'counters': [(name, dict(labels), value) for (name, labels), value in counters.items()], 'gauges': gauges}
@@ -0,0 +1,130 @@
+"""
+Process-pool execution of large match_bulk requests.
+
+The talents and the jobs are encoded once in the serving process and copied into shared memory blocks.
+Every worker process attaches to those blocks (no pickling of the encodings), featurizes and scores a
+shard of talents against all jobs, and returns only the pairs it keeps.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Optional
+import numpy as np
+from src.data_processing.feature_transformer.cross_transformer import slice_encoding
+from src.data_processing.feature_transformer.encoders import issparse
+from src.utils.lazy_imports import LazyModule
+
+sparse = LazyModule('scipy.sparse')
+
+# The Search of a worker process, set by init_worker
+worker_search = None
+# The worker processes are not forked from the serving process: it runs request threads, and a fork copies the locks
+# they hold (e.g. of logging or the caches) in their locked state
+start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class SharedEncoding:
+    """
+    An encoding (dict of arrays, see CrossFeatureTransformer) copied into one shared memory block.
+
+    The descriptor (block name plus offset, dtype and shape of every array) is small and picklable,
+    worker processes use it to attach and view the arrays without copying them.
+    """
+
+    def __init__(self, encoding: dict[str, Any]):
+        parts, layout, size = [], {}, 0
+        for name, array in encoding.items():
+            if issparse(array):
+                array = array.tocsr()
+                components = {'data': array.data, 'indices': array.indices, 'indptr': array.indptr}
+                layout[name] = {'shape': array.shape, 'components': {}}
+            else:
+                components = {None: np.ascontiguousarray(array)}
+                layout[name] = {'components': {}}
+            for component, values in components.items():
+                # Keep every array aligned
+                size += -size % 64
+                layout[name]['components'][component] = (size, values.dtype.str, values.shape)
+                parts.append((size, values))
+                size += values.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for offset, values in parts:
+            np.ndarray(values.shape, dtype=values.dtype, buffer=self.shm.buf, offset=offset)[...] = values
+        self.descriptor = {'name': self.shm.name, 'layout': layout}
+
+    def close(self) -> None:
+        """
+        Release the shared memory block.
+        """
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedEncoding":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def attach(descriptor: dict) -> tuple[shared_memory.SharedMemory, dict[str, Any]]:
+        """
+        Attach to a shared encoding from its descriptor.
+
+        Returns:
+            The shared memory block (keep it open while the arrays are used) and the encoding.
+        """
+        shm = shared_memory.SharedMemory(name=descriptor['name'])
+        encoding = {}
+        for name, spec in descriptor['layout'].items():
+            arrays = {
+                component: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+                for component, (offset, dtype, shape) in spec['components'].items()
+            }
+            if 'shape' in spec:
+                encoding[name] = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=spec['shape'], copy=False)
+            else:
+                encoding[name] = arrays[None]
+        return shm, encoding
+
+
+def init_worker(model, pair_chunk_size: int, score_cache_size: int, serving_mode: str) -> None:
+    """
+    Process pool initializer: one Search per worker process, with the model and serving mode of the serving process.
+    """
+    global worker_search
+    from src.api.search import Search
+    worker_search = Search(model=model, pair_chunk_size=pair_chunk_size, talent_cache_size=0,
+                           score_cache_size=score_cache_size, workers=1, serving_mode=serving_mode)
+
+
+def score_shard(talent_descriptor: dict, job_descriptor: dict, start: int, stop: int, filter_false_predictions: bool,
+                top_k: Optional[int], top_k_per_talent: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score the talents [start, stop) against all jobs in a worker process.
+
+    Returns:
+        The kept pairs (talent-major index into all talent x job pairs), their labels and scores.
+    """
+    from src.api.search import concat_pairs
+    talent_shm, talent_encoding = SharedEncoding.attach(talent_descriptor)
+    job_shm, job_encoding = SharedEncoding.attach(job_descriptor)
+    try:
+        talent_shard = slice_encoding(talent_encoding, slice(start, stop))
+        blocks = worker_search.score_encoded(talent_shard, job_encoding)
+        return concat_pairs(worker_search.select_pairs(blocks, len(job_encoding['salary']), filter_false_predictions,
+                                                       top_k, top_k_per_talent, talent_offset=start))
+    finally:
+        # The views into the shared blocks need to be gone before the blocks can be closed
+        talent_encoding = job_encoding = talent_shard = blocks = None
+        talent_shm.close()
+        job_shm.close()
+
+
+def create_pool(model, workers: int, pair_chunk_size: int, score_cache_size: int,
+                serving_mode: str = 'full') -> ProcessPoolExecutor:
+    """
+    Start the worker processes (with start_method), each with its own copy of the model.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method),
+                               initializer=init_worker, initargs=(model, pair_chunk_size, score_cache_size, serving_mode))
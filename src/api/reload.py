@@ -0,0 +1,275 @@
+"""
+Zero-downtime model reloads.
+
+The API serves from the current Search of a SearchReloader. A reload builds a new Search in the background (from
+the model artifact on disk), warms it up on the example requests and with the feature rows the score cache of the
+current model has seen, copies the job catalog over, and swaps it in under a lock. Every request leases the Search
+it starts with and finishes on it, so in-flight requests finish on the old model, and the old Search (with its
+worker processes) is only closed once its last lease is released.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from src.api.search import Search
+from src.api.examples import example_talent, example_talent_2, example_job, example_job_2, example_criteria
+from src.api.metrics import MetricsRegistry, latency_buckets
+from src.utils.log import log
+
+
+def artifact_signature(paths: list[str]) -> tuple:
+    """
+    The modification times and sizes of the files at the paths (and of the files in directories at the paths),
+    changes when an artifact is rewritten.
+    """
+    signature = []
+    for path in paths:
+        files = [os.path.join(root, name) for root, _, names in os.walk(path) for name in sorted(names)] \
+            if os.path.isdir(path) else [path]
+        for file in files:
+            try:
+                stat = os.stat(file)
+            except FileNotFoundError:
+                continue
+            signature.append((file, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def warm_up(search: Search, previous: Optional[Search] = None) -> None:
+    """
+    Run the example requests through a new Search, and score the feature rows in the score cache of the Search
+    it replaces, so that the first requests after the swap neither pay for lazy initialization nor miss the cache.
+    """
+    search.match(example_talent, example_job)
+    search.match_bulk([example_talent, example_talent_2], [example_job, example_job_2])
+    search.rank_and_filter(example_talent, [example_job, example_job_2], example_criteria)
+    if previous is not None and previous.score_cache is not None and search.score_cache is not None:
+        search.score_cache.warm(previous.score_cache)
+
+
+class SearchReloader:
+    """
+    Holds the current Search and replaces it when the model artifact changes (see the module docstring).
+    """
+
+    def __init__(self, load_search: Callable[[], Search], artifact_paths: list[str], watch_interval: Optional[float] = None,
+                 metrics: Optional[MetricsRegistry] = None, on_swap: Optional[Callable[[Search, Search], None]] = None,
+                 on_retire: Optional[Callable[[Search], None]] = None):
+        """
+        Args:
+            load_search: Function that loads a Search with the model artifact currently on disk.
+            artifact_paths: The files of the model artifact (see Search.model_artifact_paths).
+            watch_interval: Check the artifact files for changes every this many seconds, and reload when they
+                changed and have been unchanged for one interval (None disables the watcher).
+            metrics: Registry for the reload counts and durations (optional).
+            on_swap: Called with the replaced and the new Search when a reloaded model is swapped in (after its
+                warm-up, before any request uses it).
+            on_retire: Called with a replaced Search once its last request finished, before it is closed.
+        """
+        self.load_search = load_search
+        self.artifact_paths = artifact_paths
+        self.metrics = metrics
+        self.on_swap = on_swap
+        self.on_retire = on_retire
+        self.signature = artifact_signature(artifact_paths)
+        # The artifact of the last failed reload, the watcher does not retry it
+        self.failed_signature = None
+        self.search = load_search()
+        self.version = 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        # Guards the current Search, the leases and the job catalog writes
+        self.lock = threading.Lock()
+        # One reload at a time
+        self.reload_lock = threading.Lock()
+        self.leases = {}
+        self.stopped = threading.Event()
+        self.watcher = None
+        if watch_interval:
+            self.watcher = threading.Thread(target=self.watch, args=(watch_interval,), name="model-watcher", daemon=True)
+            self.watcher.start()
+        if metrics is not None:
+            metrics.add_collector(lambda: {'gauges': [('model_version', {}, self.version)]})
+
+    def acquire(self) -> Search:
+        """
+        Lease the current Search, it is not closed before the lease is released.
+        """
+        with self.lock:
+            search = self.search
+            self.leases[search] = self.leases.get(search, 0) + 1
+        return search
+
+    def release(self, search: Search) -> None:
+        """
+        Release a lease, and retire the Search when it has been replaced and this was its last lease.
+        """
+        with self.lock:
+            self.leases[search] -= 1
+            if self.leases[search] > 0:
+                return
+            del self.leases[search]
+            replaced = search is not self.search
+        if replaced:
+            self.retire(search)
+
+    @contextmanager
+    def lease(self) -> Iterator[Search]:
+        """
+        The current Search, leased for the with-block.
+        """
+        search = self.acquire()
+        try:
+            yield search
+        finally:
+            self.release(search)
+
+    def release_once(self, search: Search) -> Callable[[], None]:
+        """
+        A function that releases a lease of the Search on its first call and does nothing on later calls, for
+        leases that are released from more than one place (see release_after).
+        """
+        lock = threading.Lock()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            with lock:
+                if released:
+                    return
+                released = True
+            self.release(search)
+        return release
+
+    @staticmethod
+    def release_after(release: Callable[[], None], chunks: Iterator) -> Iterator:
+        """
+        Pass the chunks of a streamed response through, and release the lease (a release_once function) once they
+        are sent or the stream is closed early. A stream that never starts (the client disconnected before the
+        body) never gets here, so the response also releases the lease when it is done (see api.ndjson_response).
+        """
+        try:
+            yield from chunks
+        finally:
+            release()
+
+    def retire(self, search: Search) -> None:
+        if self.on_retire is not None:
+            self.on_retire(search)
+        search.close()
+        log.info("Closed the replaced model")
+
+    def upsert_jobs(self, jobs: list[dict]) -> int:
+        """
+        Upsert jobs into the catalog of the current Search (see JobCatalog.upsert).
+        """
+        with self.lock:
+            return self.search.catalog.upsert(jobs)
+
+    def delete_jobs(self, job_ids: list[str]) -> int:
+        """
+        Delete jobs from the catalog of the current Search (see JobCatalog.delete).
+        """
+        with self.lock:
+            return self.search.catalog.delete(job_ids)
+
+    def reload(self) -> bool:
+        """
+        Load the model artifact on disk into a new Search, warm it up and swap it in. Requests keep being served by
+        the current Search meanwhile, job catalog writes only wait for the final copy of the catalog changes.
+        When loading or warming up fails, the current Search stays in place.
+
+        Returns:
+            Whether the model was reloaded (see last_error otherwise).
+        """
+        with self.reload_lock:
+            start = time.perf_counter()
+            signature = artifact_signature(self.artifact_paths)
+            previous = self.search
+            try:
+                search = self.load_search()
+                # The warm-up requests are not counted in the metrics
+                metrics, search.metrics = search.metrics, None
+                warm_up(search, previous)
+                search.metrics = metrics
+                # Copy the job catalog (encoded with the vocabulary of the new model)
+                catalog_state = previous.catalog.state
+                search.catalog.upsert(catalog_state[0])
+            except Exception as error:
+                log.exception("Model reload failed, the current model stays in place")
+                self.last_error = repr(error)
+                self.failed_signature = signature
+                if self.metrics is not None:
+                    self.metrics.inc('model_reloads_total', status='failure')
+                return False
+
+            with self.lock:
+                if previous.catalog.state is not catalog_state:
+                    # Jobs were written during the reload
+                    search.catalog.delete(search.catalog.job_ids())
+                    search.catalog.upsert(previous.catalog.state[0])
+                if self.on_swap is not None:
+                    self.on_swap(previous, search)
+                self.search = search
+                self.version += 1
+                self.loaded_at = time.time()
+                self.signature = signature
+                self.last_error = None
+                retire = previous not in self.leases
+            if retire:
+                self.retire(previous)
+            elapsed = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.inc('model_reloads_total', status='success')
+                self.metrics.observe('model_reload_seconds', elapsed, latency_buckets)
+            log.info(f"Reloaded the model (version {self.version}) in {elapsed:.2f}s")
+            return True
+
+    def reload_in_background(self) -> bool:
+        """
+        Start a reload in a background thread, unless one is running.
+
+        Returns:
+            Whether a reload was started.
+        """
+        if self.reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name="model-reload", daemon=True).start()
+        return True
+
+    def watch(self, interval: float) -> None:
+        """
+        Reload when the artifact files changed, once they stayed unchanged for one interval (so that an artifact
+        that is still being written is not loaded).
+        """
+        pending = None
+        while not self.stopped.wait(interval):
+            signature = artifact_signature(self.artifact_paths)
+            if signature in (self.signature, self.failed_signature) or not signature:
+                pending = None
+            elif signature != pending:
+                pending = signature
+            else:
+                pending = None
+                log.info("The model artifact changed, reloading")
+                self.reload()
+
+    def status(self) -> dict:
+        """
+        The version (number of models loaded), load time, artifact files and last reload error.
+        """
+        return {
+            'version': self.version,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+            'reloading': self.reload_lock.locked(),
+            'artifacts': [{'path': path, 'mtime_ns': mtime, 'size': size} for path, mtime, size in self.signature],
+            'last_error': self.last_error,
+        }
+
+    def close(self) -> None:
+        """
+        Stop the watcher and close the current Search.
+        """
+        self.stopped.set()
+        self.search.close()
@@ -1,10 +1,24 @@
-from pydantic import BaseModel
-from typing import Any
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Literal, Optional
 from src.api.examples import example_talent, example_talent_2, example_job, example_job_2, example_criteria
+from src.api.columns import talent_columns, job_columns
+from src.config.feature_settings import rating_mapping, seniority_mapping
+
+# Values the features look up in the mappings, anything else is rejected with a 422
+Rating = Literal[tuple(rating_mapping)]
+Seniority = Literal[tuple(seniority_mapping)]
+
+class TalentLanguage(BaseModel):
+    title: str
+    rating: Rating
+
+class JobLanguage(TalentLanguage):
+    must_have: bool
 
 class Talent(BaseModel):
     talent_id: str
-    languages: list[dict[str, Any]]
+    languages: list[TalentLanguage]
     job_roles: list[str]
     seniority: str
     salary_expectation: int
@@ -17,9 +31,9 @@ class Talent(BaseModel):
 
 class Job(BaseModel):
     job_id: str
-    languages: list[dict[str, Any]]
+    languages: list[JobLanguage]
     job_roles: list[str]
-    seniorities: list[str]
+    seniorities: list[Seniority]
     max_salary: int
     min_degree: str
 
@@ -42,22 +56,38 @@ class MatchRequest(BaseModel):
 
 class MatchBulkRequest(BaseModel):
     talents: list[Talent]
-    jobs: list[Job]
+    # Either the jobs themselves, or the ids of jobs in the job catalog (all catalog jobs when both are missing)
+    jobs: Optional[list[Job]] = None
+    job_ids: Optional[list[str]] = None
     filter_false_predictions: bool = False
+    top_k: Optional[int] = Field(default=None, gt=0)
+    top_k_per_talent: bool = False
+    # Stream the results as newline-delimited JSON, chunk by chunk, and/or only return talent and job ids
+    stream: bool = False
+    ids_only: bool = False
 
     class Config:
         schema_extra = {
             "example": {
                 "talents": [example_talent, example_talent_2],
                 "jobs": [example_job, example_job_2],
-                "filter_false_predictions": False
+                "filter_false_predictions": False,
+                "top_k": None,
+                "top_k_per_talent": False,
+                "stream": False,
+                "ids_only": False
             }
         }
 
 class RankAndFilterRequest(BaseModel):
     talent: Talent
-    jobs: list[Job]
+    # Either the jobs themselves, or the ids of jobs in the job catalog (all catalog jobs when both are missing)
+    jobs: Optional[list[Job]] = None
+    job_ids: Optional[list[str]] = None
     criteria: dict[str, Any]
+    # Stream the results as newline-delimited JSON, chunk by chunk, and/or only return talent and job ids
+    stream: bool = False
+    ids_only: bool = False
 
     class Config:
         schema_extra = {
@@ -68,9 +98,145 @@ class RankAndFilterRequest(BaseModel):
             }
         }
 
+class JobsUpsertRequest(BaseModel):
+    jobs: list[Job]
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "jobs": [example_job, example_job_2]
+            }
+        }
+
+class JobsDeleteRequest(BaseModel):
+    job_ids: list[str]
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "job_ids": [example_job["job_id"], example_job_2["job_id"]]
+            }
+        }
+
+def check_offsets(offsets: list[int], n_rows: int, n_values: int, name: str) -> None:
+    """
+    Check an offset-encoded list column as a whole: n_rows + 1 non-decreasing offsets from 0 to the number of values.
+    """
+    offsets = np.asarray(offsets)
+    if len(offsets) != n_rows + 1 or offsets[0] != 0 or offsets[-1] != n_values or (np.diff(offsets) < 0).any():
+        raise ValueError(f"{name} needs {n_rows + 1} non-decreasing offsets from 0 to {n_values}.")
+
+def check_lengths(columns: dict[str, list], n_rows: int) -> None:
+    """
+    Check that parallel columns all have n_rows entries.
+    """
+    for name, values in columns.items():
+        if len(values) != n_rows:
+            raise ValueError(f"{name} has {len(values)} entries instead of {n_rows}.")
+
+class ListColumn(BaseModel):
+    # The items of row i are values[offsets[i]:offsets[i + 1]]
+    offsets: list[int]
+    values: list[str]
+
+class SeniorityColumn(ListColumn):
+    values: list[Seniority]
+
+class TalentLanguageColumn(BaseModel):
+    offsets: list[int]
+    title: list[str]
+    rating: list[Rating]
+
+class JobLanguageColumn(TalentLanguageColumn):
+    must_have: list[bool]
+
+class TalentColumns(BaseModel):
+    """
+    Talents as parallel arrays (one entry per talent) with offset-encoded list columns.
+    """
+    talent_id: list[str]
+    salary_expectation: list[int]
+    degree: list[str]
+    seniority: list[str]
+    job_roles: ListColumn
+    languages: TalentLanguageColumn
+
+    @model_validator(mode='after')
+    def check_columns(self):
+        n_rows = len(self.talent_id)
+        check_lengths({"salary_expectation": self.salary_expectation, "degree": self.degree, "seniority": self.seniority}, n_rows)
+        check_lengths({"languages.rating": self.languages.rating}, len(self.languages.title))
+        check_offsets(self.job_roles.offsets, n_rows, len(self.job_roles.values), "job_roles")
+        check_offsets(self.languages.offsets, n_rows, len(self.languages.title), "languages")
+        return self
+
+class JobColumns(BaseModel):
+    """
+    Jobs as parallel arrays (one entry per job) with offset-encoded list columns.
+    """
+    job_id: list[str]
+    max_salary: list[int]
+    min_degree: list[str]
+    seniorities: SeniorityColumn
+    job_roles: ListColumn
+    languages: JobLanguageColumn
+
+    @model_validator(mode='after')
+    def check_columns(self):
+        n_rows = len(self.job_id)
+        check_lengths({"max_salary": self.max_salary, "min_degree": self.min_degree}, n_rows)
+        check_lengths({"languages.rating": self.languages.rating, "languages.must_have": self.languages.must_have},
+                      len(self.languages.title))
+        check_offsets(self.seniorities.offsets, n_rows, len(self.seniorities.values), "seniorities")
+        check_offsets(self.job_roles.offsets, n_rows, len(self.job_roles.values), "job_roles")
+        check_offsets(self.languages.offsets, n_rows, len(self.languages.title), "languages")
+        return self
+
+class ColumnarMatchBulkRequest(BaseModel):
+    talents: TalentColumns
+    # Either the jobs themselves, or the ids of jobs in the job catalog (all catalog jobs when both are missing)
+    jobs: Optional[JobColumns] = None
+    job_ids: Optional[list[str]] = None
+    filter_false_predictions: bool = False
+    top_k: Optional[int] = Field(default=None, gt=0)
+    top_k_per_talent: bool = False
+    stream: bool = False
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "talents": talent_columns([example_talent, example_talent_2]),
+                "jobs": job_columns([example_job, example_job_2]),
+                "filter_false_predictions": False,
+                "top_k": None,
+                "top_k_per_talent": False,
+                "stream": False
+            }
+        }
+
+class ColumnarRankAndFilterRequest(BaseModel):
+    talent: Talent
+    # Either the jobs themselves, or the ids of jobs in the job catalog (all catalog jobs when both are missing)
+    jobs: Optional[JobColumns] = None
+    job_ids: Optional[list[str]] = None
+    criteria: dict[str, Any]
+    stream: bool = False
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "talent": example_talent,
+                "jobs": job_columns([example_job, example_job_2]),
+                "criteria": example_criteria
+            }
+        }
+
 class Criteria(BaseModel):
-    salary_expectation: int
-    seniority: str
+    salary_expectation: Optional[int] = None
+    seniority: Optional[str] = None
+    min_degree: Optional[str] = None
+    must_have_languages: Optional[list[str]] = None
+    job_roles: Optional[list[str]] = None
 
     class Config:
         schema_extra = {
@@ -1,24 +1,143 @@
-import pandas as pd
-import joblib
-from typing import Any
+from __future__ import annotations
+import os
+import time
+import threading
+import numpy as np
+from concurrent.futures import wait
+from typing import Any, Iterable, Iterator, Optional
 from src.data_processing.feature_transformer.main_transformer import FeatureTransformer
-from src.config.feature_settings import selected_features
-from src.utils.config_utils import load_yaml_config
+from src.data_processing.feature_transformer.cross_transformer import CrossFeatureTransformer, slice_encoding, concat_encodings
+from src.data_processing.feature_transformer.encoders import Vocabulary
+from src.data_processing.feature_transformer.feature_graph import model_features
+from src.api.filters import criteria_mask
+from src.api.catalog import JobCatalog
+from src.api.columns import talent_columns, job_columns
+from src.api.cache import LRUCache, content_hash
+from src.models.logistic_regression_scorer import LogisticRegressionScorer
+from src.models.compiled_forest import CompiledForest
+from src.models.score_cache import ScoreCache, score_cache_path
+from src.api.parallel import SharedEncoding, create_pool, score_shard
+from src.api.metrics import MetricsRegistry, pairs_buckets, batch_size_buckets
+from src.config.feature_settings import job_roles_vocabulary_file
+from src.utils.config_utils import load_yaml_config, get_artifact_path
+from src.utils.instrumentation import instrumented, stage
+from src.utils.lazy_imports import LazyModule
+from src.utils.log import log
+
+# Only imported by the paths that need job frames (see serving_mode), or by pickled sklearn models
+pd = LazyModule('pandas')
+serving_modes = ['full', 'slim']
+
+
+def top_k_positions(scores: np.ndarray, pair_index: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k pairs with the highest scores, best first (ties broken by pair index).
+    np.partition narrows the candidates down before the exact sort.
+    """
+    candidates = np.arange(len(scores))
+    if k < len(scores):
+        cutoff = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= cutoff)
+    order = np.lexsort((pair_index[candidates], -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def top_k_per_row(scores: np.ndarray, valid: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row and column indices of the k best valid entries of every row of a (talents x jobs) score matrix
+    (ties broken by column), row by row. np.argpartition finds the k-th best score of every row, so only the
+    valid entries up to it (k per row, plus ties) are sorted instead of whole rows.
+    """
+    keys = np.where(valid, -scores, np.inf)
+    candidates = valid
+    if k < keys.shape[1]:
+        kth = np.take_along_axis(keys, np.argpartition(keys, k - 1, axis=1)[:, k - 1:k], axis=1)
+        candidates = valid & (keys <= kth)
+    rows, cols = np.nonzero(candidates)
+    order = np.lexsort((cols, keys[rows, cols], rows))
+    rows, cols = rows[order], cols[order]
+    # Rank of every candidate within its row
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    return rows[keep], cols[keep]
+
+
+def concat_pairs(groups: Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Concatenate groups of kept (pairs, labels, scores).
+    """
+    groups = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=bool), np.empty(0))] + list(groups)
+    return tuple(np.concatenate([group[i] for group in groups]) for i in range(3))
+
 
 class Search:
-    def __init__(self, model=None, model_config_path=None) -> None:
+    def __init__(self, model=None, model_config_path=None, pair_chunk_size: int = 100000,
+                 talent_cache_size: int = 10000, talent_cache_ttl: Optional[float] = 600,
+                 score_cache_size: int = 1000000, workers: Optional[int] = None,
+                 parallel_pair_threshold: Optional[int] = None, metrics: Optional[MetricsRegistry] = None,
+                 serving_mode: Optional[str] = None) -> None:
+        """
+        Args:
+            model: A trained model object.
+            model_config_path: Path to the model configuration YAML file (used when no model is given).
+            pair_chunk_size: Approximate number of talent/job pairs featurized and scored at once in match_bulk.
+            talent_cache_size: Maximum number of encoded talents kept in the LRU cache (0 disables it).
+            talent_cache_ttl: Time-to-live of a cached talent encoding in seconds (None for no expiry).
+            score_cache_size: Maximum number of memoized feature row scores of the loaded model (0 disables it).
+            workers: Number of worker processes for large match_bulk requests (1 runs everything in this process).
+                Defaults to `serving_workers` of the model config, or 1.
+            parallel_pair_threshold: Minimum number of talent x job pairs of a match_bulk request to use the worker
+                processes. Defaults to `parallel_pair_threshold` of the model config, or 1000000.
+            metrics: Registry for the batch sizes, pairs scored and featurization/inference time (optional).
+            serving_mode: 'full' normalizes the talent and job dicts into frames (missing fields get defaults),
+                'slim' encodes them from columns and passes bare feature matrices to the NumPy serving scorers,
+                without pandas (the payloads need all fields, as the API schemas ensure). Defaults to
+                `serving_mode` of the model config, or 'full'.
+        """
+        job_roles_vocabulary = None
+        config = load_yaml_config(model_config_path) if model_config_path is not None else {}
         if model is not None:
             self.model = model
         elif model_config_path is not None:
             self.model = self.load_model(model_config_path)
+            job_roles_vocabulary = self.load_job_roles_vocabulary(model_config_path)
         else:
             raise ValueError("You need to provide model object or model_config_path.")
         
-        self.transformer = FeatureTransformer()
+        self.serving_mode = serving_mode or config.get('serving_mode', 'full')
+        if self.serving_mode not in serving_modes:
+            raise ValueError(f"Unknown serving mode {self.serving_mode}, use one of {serving_modes}")
+        self.slim = self.serving_mode == 'slim'
+        # Models other than the NumPy serving scorers read feature frames, also in the slim mode
+        self.feature_frames = not (self.slim and hasattr(self.model, 'to_matrix'))
+
+        self.transformer = FeatureTransformer(job_roles_vocabulary=job_roles_vocabulary)
+        self.cross_transformer = CrossFeatureTransformer(job_roles_vocabulary=job_roles_vocabulary,
+                                                         max_languages=config.get('max_language_vocabulary', 1000),
+                                                         max_job_roles=config.get('max_job_roles_vocabulary', 10000))
+        self.pair_chunk_size = pair_chunk_size
+        self.catalog = JobCatalog(self.cross_transformer, frames=not self.slim)
+        self.talent_cache = LRUCache(maxsize=talent_cache_size, ttl=talent_cache_ttl)
+        # Only the features the model reads are computed (e.g. 5 of them for the rule-based model)
+        self.features = model_features(self.model)
+        # With persist_score_cache, the score table is kept next to the model artifact across restarts
+        persist_path = score_cache_path(config['model_save_path'], self.model_artifact_paths(model_config_path)[0]) \
+            if model is None and config.get('persist_score_cache', False) else None
+        self.score_cache = ScoreCache(self.model, max_entries=score_cache_size, feature_names=self.features,
+                                      path=persist_path) if score_cache_size > 0 else None
+        self.score_cache_size = score_cache_size
+        self.workers = workers if workers is not None else config.get('serving_workers', 1)
+        self.parallel_pair_threshold = parallel_pair_threshold if parallel_pair_threshold is not None \
+            else config.get('parallel_pair_threshold', 1000000)
+        # Worker processes, started on the first large request (the lock makes sure only one pool is started)
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        self.metrics = metrics
 
     def load_model(self, model_config_path: str):
         """
-        Load the model from model config
+        Load the model from model config. With `serving_backend: numpy` in the config,
+        the exported NumPy serving artifact is loaded instead of the pickled model.
 
         Args:
             model_config_path: Path to the model configuration YAML file.
@@ -28,9 +147,114 @@ class Search:
         """
         config = load_yaml_config(model_config_path)
         model_path = config['model_save_path']
-        model = joblib.load(model_path)
+        serving_backend = config.get('serving_backend', 'sklearn')
+
+        if serving_backend == 'sklearn':
+            import joblib
+            model = joblib.load(model_path)
+        elif serving_backend == 'numpy' and config['model_type'] == 'logistic_regression':
+            model = LogisticRegressionScorer.load(get_artifact_path(model_path, LogisticRegressionScorer.artifact_file))
+        elif serving_backend == 'numpy' and config['model_type'] == 'random_forest':
+            model = CompiledForest.load(get_artifact_path(model_path, CompiledForest.artifact_file))
+        else:
+            raise ValueError(f"Unsupported serving backend {serving_backend} for model type {config['model_type']}")
         return model
 
+    @staticmethod
+    def model_artifact_paths(model_config_path: str) -> list[str]:
+        """
+        The files load_model and load_job_roles_vocabulary read for a model config (some of them may not exist).
+
+        Args:
+            model_config_path: Path to the model configuration YAML file.
+
+        Returns:
+            The paths of the model artifact and the job roles vocabulary.
+        """
+        config = load_yaml_config(model_config_path)
+        model_path = config['model_save_path']
+        serving_backend = config.get('serving_backend', 'sklearn')
+        if serving_backend == 'numpy' and config['model_type'] == 'logistic_regression':
+            model_path = get_artifact_path(model_path, LogisticRegressionScorer.artifact_file)
+        elif serving_backend == 'numpy' and config['model_type'] == 'random_forest':
+            model_path = get_artifact_path(model_path, CompiledForest.artifact_file)
+        return [model_path, get_artifact_path(config['model_save_path'], job_roles_vocabulary_file)]
+
+    def load_job_roles_vocabulary(self, model_config_path: str) -> Optional[Vocabulary]:
+        """
+        Load the job roles vocabulary saved alongside the model, if there is one.
+
+        Args:
+            model_config_path: Path to the model configuration YAML file.
+
+        Returns:
+            Loaded vocabulary, or None.
+        """
+        config = load_yaml_config(model_config_path)
+        vocabulary_path = get_artifact_path(config['model_save_path'], job_roles_vocabulary_file)
+        if not os.path.exists(vocabulary_path):
+            return None
+        return Vocabulary.load(vocabulary_path)
+
+    @instrumented("Search.predict")
+    def predict(self, X: pd.DataFrame | np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the labels and the scores (probability of a match) of the feature rows.
+
+        Args:
+            X: DataFrame of the selected features (or their matrix, see feature_frames).
+
+        Returns:
+            Predicted labels and scores.
+        """
+        if self.score_cache is not None:
+            return self.score_cache.predict_with_scores(X)
+        if hasattr(self.model, 'predict_with_scores'):
+            # Serving scorers compute both in one pass
+            with stage("model.predict_with_scores", rows=len(X)):
+                return self.model.predict_with_scores(X)
+        with stage("model.predict", rows=len(X)):
+            labels = np.asarray(self.model.predict(X))
+        with stage("model.predict_proba", rows=len(X)):
+            scores = self.model.predict_proba(X)[:, 1]
+        return labels, scores
+
+    @instrumented("Search.encode_talents")
+    def encode_talents(self, talents: list[dict] | dict[str, Any]) -> dict[str, Any]:
+        """
+        Encode talents, reusing cached encodings. The cache is keyed by talent_id and every entry is checked
+        against a content hash of the talent payload, so a talent that changed under the same id is re-encoded.
+        A columnar talent batch (see src/api/columns.py) is encoded directly from the columns, without the cache.
+
+        Args:
+            talents: A list of talent data dict, or a columnar talent batch.
+
+        Returns:
+            The encoded talents (see CrossFeatureTransformer.encode_talents).
+        """
+        if isinstance(talents, dict):
+            return self.cross_transformer.encode_talent_columns(talents)
+        versions = [content_hash(talent) for talent in talents]
+        encodings = [self.talent_cache.get(talent.get('talent_id'), version) for talent, version in zip(talents, versions)]
+        missing = [i for i, encoding in enumerate(encodings) if encoding is None]
+        if not missing:
+            return concat_encodings(encodings)
+
+        if self.slim:
+            missing_encoding = self.cross_transformer.encode_talent_columns(talent_columns([talents[i] for i in missing]))
+        else:
+            with stage("json_normalize", rows=len(missing)):
+                missing_df = pd.json_normalize([{"talent": talents[i]} for i in missing], sep='.')
+            missing_encoding = self.cross_transformer.encode_talents(missing_df)
+        for row, i in enumerate(missing):
+            # Copies, a view would keep the whole encoded batch alive as long as the talent is cached
+            encodings[i] = {name: array.copy() for name, array in slice_encoding(missing_encoding, slice(row, row + 1)).items()}
+            self.talent_cache.put(talents[i].get('talent_id'), encodings[i], versions[i])
+        if len(missing) == len(talents):
+            return missing_encoding
+        return concat_encodings(encodings)
+
+    @instrumented("Search.match")
     def match(self, talent: dict, job: dict) -> dict:
         """
         This method takes a talent and job as input and uses the machine learning
@@ -50,14 +274,15 @@ class Search:
         Returns:
             A dcit with talent, job, predicted label, and score.
         """
-        combined_data = [{"talent": talent, "job": job}]
-        combined_data_df = pd.json_normalize(combined_data, sep='.')
-
-        transformed_data = self.transformer.transform(combined_data_df)
-        X = transformed_data[selected_features]
-
-        label = bool(self.model.predict(X)[0])
-        score = float(self.model.predict_proba(X)[0][1])
+        job_df = None
+        if not self.slim:
+            with stage("json_normalize", rows=1):
+                job_df = pd.json_normalize([{"job": job}], sep='.')
+        job_encoding = self.encode_jobs([job], job_df)
+        self.record_batch("match", 1, 1)
+        labels, scores = self.score(self.encode_talents([talent]), job_encoding)
+        label = bool(labels[0])
+        score = float(scores[0])
 
         return {
             "talent": talent,
@@ -66,7 +291,242 @@ class Search:
             "score": score
         }
 
-    def match_bulk(self, talents: list[dict], jobs: list[dict], filter_false_predictions: bool = False) -> list[dict]:
+    def select_jobs(self, jobs: Optional[list[dict] | dict[str, Any]] = None,
+                    job_ids: Optional[list[str]] = None) -> tuple[list[dict], Optional[pd.DataFrame], Optional[dict[str, Any]]]:
+        """
+        Get the jobs of a request: the given job dicts, or else jobs from the catalog (by id, or all of them).
+        Jobs given as a columnar batch (see src/api/columns.py) are encoded directly from the columns,
+        they are represented by {"job_id": ...} dicts and have no job frame. In the slim serving mode, no job
+        has a job frame.
+
+        Args:
+            jobs: A list of job data dicts, or a columnar job batch (optional).
+            job_ids: The ids of catalog jobs, used when no jobs are given (all catalog jobs when None).
+
+        Returns:
+            The job dicts, the job frame ('job.*' columns) and the precomputed job encoding (None for request jobs).
+        """
+        if isinstance(jobs, dict):
+            return [{"job_id": job_id} for job_id in jobs["job_id"]], None, self.cross_transformer.encode_job_columns(jobs)
+        if jobs is not None and self.slim:
+            return jobs, None, None
+        if jobs is not None:
+            with stage("json_normalize", rows=len(jobs)):
+                jobs_df = pd.json_normalize([{"job": job} for job in jobs], sep='.')
+            return jobs, jobs_df, None
+        return self.catalog.select(job_ids)
+
+    def encode_jobs(self, jobs: list[dict], jobs_df: Optional[pd.DataFrame] = None) -> dict[str, Any]:
+        """
+        Encode job dicts from their job frame, or without one (the slim serving mode) from columns.
+
+        Returns:
+            The encoded jobs (see CrossFeatureTransformer.encode_jobs).
+        """
+        if jobs_df is None:
+            return self.cross_transformer.encode_job_columns(job_columns(jobs))
+        return self.cross_transformer.encode_jobs(jobs_df)
+
+    def score(self, talent_encoding: dict[str, Any], job_encoding: dict[str, Any]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Featurize and score all pairs of encoded talents and jobs (talent-major), recording the pairs
+        and the featurization and inference time in the metrics.
+
+        Returns:
+            The labels and scores of the pairs.
+        """
+        start = time.perf_counter()
+        X = self.cross_transformer.transform(talent_encoding, job_encoding, self.features, as_frame=self.feature_frames)
+        featurized = time.perf_counter()
+        labels, scores = self.predict(X)
+        if self.metrics is not None:
+            self.metrics.inc('search_featurization_seconds_total', featurized - start)
+            self.metrics.inc('search_inference_seconds_total', time.perf_counter() - featurized)
+            self.metrics.inc('search_pairs_scored_total', len(X))
+        return labels, scores
+
+    def record_batch(self, method: str, n_talents: int, n_jobs: int, n_pairs: Optional[int] = None) -> None:
+        """
+        Record the batch size of a request in the metrics, and the pairs it scores (default: all talent x job pairs).
+        """
+        if self.metrics is not None:
+            self.metrics.observe('search_batch_talents', n_talents, batch_size_buckets, method=method)
+            self.metrics.observe('search_batch_jobs', n_jobs, batch_size_buckets, method=method)
+            self.metrics.observe('search_pairs_per_request', n_talents * n_jobs if n_pairs is None else n_pairs,
+                                 pairs_buckets, method=method)
+
+    def score_encoded(self, talent_encoding: dict[str, Any], job_encoding: dict[str, Any]) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        """
+        Featurize and score all pairs of encoded talents and jobs, in blocks of whole talents so that the
+        feature tensor stays at about pair_chunk_size rows. The pair features are computed by broadcasting.
+
+        Args:
+            talent_encoding: The encoded talents (see CrossFeatureTransformer.encode_talents).
+            job_encoding: The encoded jobs (see CrossFeatureTransformer.encode_jobs).
+
+        Yields:
+            The index of the first talent in the block, and the (talents in block x jobs) labels and scores.
+        """
+        n_talents, n_jobs = len(talent_encoding['salary']), len(job_encoding['salary'])
+        talents_per_chunk = max(1, self.pair_chunk_size // n_jobs)
+        for start in range(0, n_talents, talents_per_chunk):
+            talent_block = slice_encoding(talent_encoding, slice(start, start + talents_per_chunk))
+            labels, scores = self.score(talent_block, job_encoding)
+            n_block = len(talent_block['salary'])
+            yield start, labels.reshape(n_block, n_jobs), scores.reshape(n_block, n_jobs)
+
+    @staticmethod
+    def select_pairs(blocks: Iterator[tuple[int, np.ndarray, np.ndarray]], n_jobs: int, filter_false_predictions: bool = False,
+                     top_k: Optional[int] = None, top_k_per_talent: bool = False,
+                     talent_offset: int = 0) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Keep the pairs of scored blocks that match_bulk returns. With top_k only the best pairs seen so far
+        are kept, so the memory stays bounded by the block size plus k instead of all talent x job pairs.
+
+        Args:
+            blocks: Scored blocks (see score_encoded).
+            n_jobs: The number of jobs.
+            filter_false_predictions: Only keep the pairs predicted as a match.
+            top_k: Only keep the k pairs with the highest scores (optional).
+            top_k_per_talent: Apply top_k per talent instead of over all pairs.
+            talent_offset: Index of the first talent of the blocks among all talents of the request.
+
+        Yields:
+            The kept pairs (talent-major index into all talent x job pairs), their labels and scores, block by block
+            (only once at the end when top_k applies to all pairs).
+        """
+        kept = []
+        for talent_start, labels, scores in blocks:
+            with stage("Search.select_pairs", rows=labels.size):
+                pair_index = (talent_offset + talent_start) * n_jobs + np.arange(labels.size).reshape(labels.shape)
+                valid = labels.astype(bool) if filter_false_predictions else np.ones(labels.shape, dtype=bool)
+
+                group = None
+                if top_k is None:
+                    group = pair_index[valid], labels[valid], scores[valid]
+                elif top_k_per_talent:
+                    rows, cols = top_k_per_row(scores, valid, top_k)
+                    group = pair_index[rows, cols], labels[rows, cols], scores[rows, cols]
+                else:
+                    # Merge the block with the best pairs so far and only keep the top k
+                    pairs, pair_labels, pair_scores = concat_pairs(kept + [(pair_index[valid], labels[valid], scores[valid])])
+                    best = top_k_positions(pair_scores, pairs, top_k)
+                    kept = [(pairs[best], pair_labels[best], pair_scores[best])]
+            if group is not None:
+                yield group
+
+        if top_k is not None and not top_k_per_talent:
+            yield concat_pairs(kept)
+
+    def select_pairs_parallel(self, talent_encoding: dict[str, Any], job_encoding: dict[str, Any], filter_false_predictions: bool = False,
+                              top_k: Optional[int] = None, top_k_per_talent: bool = False) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        The same as select_pairs over all encoded talents and jobs, with the talents sharded across the worker
+        processes, yielding shard by shard. The encodings are passed to the workers through shared memory.
+        """
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = create_pool(self.model, self.workers, self.pair_chunk_size, self.score_cache_size, self.serving_mode)
+            pool = self.pool
+
+        n_talents = len(talent_encoding['salary'])
+        if self.metrics is not None:
+            # The workers score the pairs, their featurization and inference time is not recorded here
+            self.metrics.inc('search_pairs_scored_total', n_talents * len(job_encoding['salary']))
+        # A few shards per worker, so that the workers finish at about the same time
+        bounds = np.linspace(0, n_talents, min(n_talents, self.workers * 4) + 1).astype(int)
+        with SharedEncoding(talent_encoding) as shared_talents, SharedEncoding(job_encoding) as shared_jobs:
+            futures = [
+                pool.submit(score_shard, shared_talents.descriptor, shared_jobs.descriptor, start, stop,
+                                 filter_false_predictions, top_k, top_k_per_talent)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            try:
+                if top_k is not None and not top_k_per_talent:
+                    # Every shard kept its own top k, merge them
+                    pairs, labels, scores = concat_pairs(future.result() for future in futures)
+                    best = top_k_positions(scores, pairs, top_k)
+                    yield pairs[best], labels[best], scores[best]
+                else:
+                    for future in futures:
+                        yield future.result()
+            finally:
+                # When the caller stops early, the workers must be done with the shared blocks before they are released
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+
+    def close(self) -> None:
+        """
+        Stop the worker processes, and save the score table (with persist_score_cache).
+        """
+        with self.pool_lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown()
+        if self.score_cache is not None:
+            try:
+                self.score_cache.save()
+            except OSError as e:
+                log.warning(f"Failed to save the score cache: {e}")
+
+    @staticmethod
+    def result(talent: dict, job: dict, label: bool, score: float, ids_only: bool = False) -> dict:
+        """
+        A result dict with the talent and the job (or only their ids), the predicted label and the score.
+        """
+        if ids_only:
+            return {"talent_id": talent["talent_id"], "job_id": job["job_id"], "label": label, "score": score}
+        return {"talent": talent, "job": job, "label": label, "score": score}
+
+    def format_pairs(self, talents: list[dict], jobs: list[dict], pairs: np.ndarray, labels: np.ndarray, scores: np.ndarray,
+                     ids_only: bool = False) -> list[dict]:
+        """
+        Result dicts of kept pairs, sorted descending by score (ties keep the talent x job order).
+        """
+        n_jobs = len(jobs)
+        with stage("Search.sort", rows=len(pairs)):
+            order = np.lexsort((pairs, -scores))
+        with stage("Search.format_results", rows=len(pairs)):
+            return [
+                self.result(talents[pairs[i] // n_jobs], jobs[pairs[i] % n_jobs], bool(labels[i]), float(scores[i]), ids_only)
+                for i in order
+            ]
+
+    def score_pairs(self, talents: list[dict] | dict[str, Any], jobs: Optional[list[dict] | dict[str, Any]] = None,
+                    filter_false_predictions: bool = False, top_k: Optional[int] = None, top_k_per_talent: bool = False,
+                    job_ids: Optional[list[str]] = None) -> tuple[list[dict], list[dict], Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        """
+        Select and encode the jobs and talents of a match_bulk request right away (so that invalid requests fail
+        here), and set up the lazy scoring of the pairs. Requests with at least parallel_pair_threshold pairs
+        are sharded across the worker processes.
+
+        Returns:
+            The talent dicts ({"talent_id": ...} for a columnar batch), the job dicts, and the groups of kept pairs (see select_pairs).
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k needs to be a positive integer.")
+        jobs, jobs_df, job_encoding = self.select_jobs(jobs, job_ids)
+        talent_dicts = [{"talent_id": talent_id} for talent_id in talents["talent_id"]] if isinstance(talents, dict) else talents
+        if not talent_dicts or not jobs:
+            return talent_dicts, jobs, iter(())
+        if job_encoding is None:
+            job_encoding = self.encode_jobs(jobs, jobs_df)
+        talent_encoding = self.encode_talents(talents)
+        talents = talent_dicts
+        self.record_batch("match_bulk", len(talents), len(jobs))
+
+        if self.workers > 1 and len(talents) > 1 and len(talents) * len(jobs) >= self.parallel_pair_threshold:
+            groups = self.select_pairs_parallel(talent_encoding, job_encoding, filter_false_predictions, top_k, top_k_per_talent)
+        else:
+            groups = self.select_pairs(self.score_encoded(talent_encoding, job_encoding), len(jobs),
+                                       filter_false_predictions, top_k, top_k_per_talent)
+        return talents, jobs, groups
+
+    @instrumented("Search.match_bulk")
+    def match_bulk(self, talents: list[dict] | dict[str, Any], jobs: Optional[list[dict] | dict[str, Any]] = None, filter_false_predictions: bool = False,
+                   top_k: Optional[int] = None, top_k_per_talent: bool = False, job_ids: Optional[list[str]] = None,
+                   ids_only: bool = False) -> list[dict]:
         """
         This method takes multiple talents and jobs as input and uses the machine
         learning model to predict the label for each combination. Together with a
@@ -82,81 +542,110 @@ class Search:
           ...
         ]
 
+        Pairs are scored chunk by chunk, and with top_k only the best pairs seen so far are kept,
+        so the memory stays bounded by the chunk size plus k instead of all talent x job pairs.
+        Requests with at least parallel_pair_threshold pairs are sharded across the worker processes.
+
         Args:
-            talents: A list of talent data dict.
-            jobs: A list of job data dict.
+            talents: A list of talent data dict, or a columnar talent batch (see src/api/columns.py).
+            jobs: A list of job data dict, or a columnar job batch. When None, the jobs come from the job catalog.
             filter_false_predictions: A flag indicating whether to filter out false predictions, so that we only return matched pairs.
+            top_k: Only return the k pairs with the highest scores (optional).
+            top_k_per_talent: Apply top_k per talent (the best k jobs of every talent) instead of over all pairs.
+            job_ids: The ids of the catalog jobs to match when no jobs are given (all catalog jobs when None).
+            ids_only: Return talent_id and job_id instead of the talent and job dicts.
 
         Returns:
             A list of dicts, each containing talent, job, predicted label, and score, sorted descending by score.
         """
-        combined_data = [{"talent": talent, "job": job} for talent in talents for job in jobs]
-        combined_data_df = pd.json_normalize(combined_data, sep='.')
+        talents, jobs, groups = self.score_pairs(talents, jobs, filter_false_predictions, top_k, top_k_per_talent, job_ids)
+        return self.format_pairs(talents, jobs, *concat_pairs(groups), ids_only=ids_only)
 
-        transformed_data = self.transformer.transform(combined_data_df)
-        X = transformed_data[selected_features]
+    def match_bulk_chunks(self, talents: list[dict] | dict[str, Any], jobs: Optional[list[dict] | dict[str, Any]] = None, filter_false_predictions: bool = False,
+                          top_k: Optional[int] = None, top_k_per_talent: bool = False, job_ids: Optional[list[str]] = None,
+                          ids_only: bool = False) -> Iterator[list[dict]]:
+        """
+        The results of match_bulk, chunk by chunk as the scoring proceeds, for streaming responses. Every chunk is sorted
+        descending by score, but there is no order across chunks. When top_k applies to all pairs, there is only
+        one chunk once all pairs are scored.
 
-        labels = self.model.predict(X)
-        scores = self.model.predict_proba(X)[:, 1]
+        Args:
+            The same as match_bulk.
 
-        results = []
-        index = 0
-        for talent in talents:
-            for job in jobs:
-                results.append({
-                    "talent": talent,
-                    "job": job,
-                    "label": bool(labels[index]),
-                    "score": float(scores[index])
-                })
-                index += 1
+        Returns:
+            An iterator over lists of result dicts (see match_bulk).
+        """
+        talents, jobs, groups = self.score_pairs(talents, jobs, filter_false_predictions, top_k, top_k_per_talent, job_ids)
+        return (self.format_pairs(talents, jobs, *group, ids_only=ids_only) for group in groups if len(group[0]))
 
-        if filter_false_predictions:
-            results = [result for result in results if result["label"]]
+    def rank_jobs(self, talent: dict, jobs: Optional[list[dict] | dict[str, Any]], criteria: dict[str, Any],
+                  job_ids: Optional[list[str]] = None) -> tuple[list[dict], np.ndarray, np.ndarray]:
+        """
+        Score the jobs that meet the criteria for a talent and rank the matched ones.
+        The criteria only depend on job fields, so they are evaluated first as vectorized masks over the job batch
+        (see src/api/filters.py), and only the jobs that meet them are featurized and scored.
 
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results
+        Returns:
+            The job dicts, and the indices and scores of the matched jobs, sorted descending by score.
+        """
+        columns = jobs if isinstance(jobs, dict) else None
+        jobs, jobs_df, job_encoding = self.select_jobs(jobs, job_ids)
+        if criteria:
+            # The criteria of a columnar batch are evaluated on its arrays
+            batch = columns if columns is not None else jobs if jobs_df is None else jobs_df
+            job_index = np.flatnonzero(criteria_mask(batch, criteria))
+        else:
+            job_index = np.arange(len(jobs))
+        # Only the jobs that meet the criteria are scored
+        self.record_batch("rank_and_filter", 1, len(jobs), n_pairs=len(job_index))
+        if len(job_index) == 0:
+            return jobs, job_index, np.empty(0)
+
+        talent_encoding = self.encode_talents([talent])
+        if job_encoding is None:
+            job_encoding = self.encode_jobs([jobs[i] for i in job_index], None if jobs_df is None else jobs_df.iloc[job_index])
+        else:
+            job_encoding = slice_encoding(job_encoding, job_index)
+        labels, scores = self.score(talent_encoding, job_encoding)
+
+        # Filter out all non-matched jobs, then sort descending by score (ties keep the job order)
+        matched = labels.astype(bool)
+        job_index, scores = job_index[matched], scores[matched]
+        order = np.lexsort((job_index, -scores))
+        return jobs, job_index[order], scores[order]
 
-    def rank_and_filter(self, talent: dict, jobs: list[dict], criteria: dict[str, Any]) -> list[dict]:
+    @instrumented("Search.rank_and_filter")
+    def rank_and_filter(self, talent: dict, jobs: Optional[list[dict] | dict[str, Any]], criteria: dict[str, Any], job_ids: Optional[list[str]] = None,
+                        ids_only: bool = False) -> list[dict]:
         """
         Rank and filter job opportunities for a given talent based on model predictions and specified filtering criteria.
 
         Args:
             talent: Talent data dict.
-            jobs: A list of job data dicts.
+            jobs: A list of job data dicts, or a columnar job batch. When None, the jobs come from the job catalog.
             criteria: A dictionary of criteria to filter jobs, say, {"salary_expectation": 80000, "seniority": "senior"}
+            job_ids: The ids of the catalog jobs to rank when no jobs are given (all catalog jobs when None).
+            ids_only: Return talent_id and job_id instead of the talent and job dicts.
 
         Returns:
             A list of jobs that match the specified criteria for the given talent, sorted by score.
         """
-        combined_data = [{"talent": talent, "job": job} for job in jobs]
-        combined_data_df = pd.json_normalize(combined_data, sep='.')
-
-        transformed_data = self.transformer.transform(combined_data_df)
-        X = transformed_data[selected_features]
-
-        labels = self.model.predict(X)
-        scores = self.model.predict_proba(X)[:, 1]
+        jobs, job_index, scores = self.rank_jobs(talent, jobs, criteria, job_ids)
+        return [self.result(talent, jobs[j], True, float(score), ids_only) for j, score in zip(job_index, scores)]
 
-        results = [
-            {
-                "talent": talent,
-                "job": jobs[i],
-                "label": bool(labels[i]),
-                "score": float(scores[i])
-            }
-            for i in range(len(labels))
-        ]
-
-        # Filter out all non-matched jobs
-        results = [result for result in results if result["label"]]
-
-        # Apply additional filtering criteria
-        filtered_results = [result for result in results if self.filter_criteria(result["job"], criteria)]
+    def rank_and_filter_chunks(self, talent: dict, jobs: Optional[list[dict] | dict[str, Any]], criteria: dict[str, Any], job_ids: Optional[list[str]] = None,
+                               ids_only: bool = False, chunk_size: int = 1000) -> Iterator[list[dict]]:
+        """
+        The results of rank_and_filter in chunks of chunk_size, for streaming responses. The jobs are ranked
+        right away, and the result dicts are only built chunk by chunk.
+        """
+        jobs, job_index, scores = self.rank_jobs(talent, jobs, criteria, job_ids)
+        return (
+            [self.result(talent, jobs[j], True, float(score), ids_only)
+             for j, score in zip(job_index[start:start + chunk_size], scores[start:start + chunk_size])]
+            for start in range(0, len(job_index), chunk_size)
+        )
 
-        filtered_results.sort(key=lambda x: x['score'], reverse=True)
-        return filtered_results
-    
     def filter_criteria(self, job: dict, criteria: dict[str, Any]) -> bool:
         """
         Checks if a given job meets the criteria.
@@ -168,12 +657,6 @@ class Search:
         Returns:
             True if the job meets the criteria, False otherwise.
         """
-        if "salary_expectation" in criteria:
-            if job.get("max_salary", 0) < criteria["salary_expectation"]:
-                return False
-
-        if "seniority" in criteria:
-            if criteria["seniority"] not in job.get("seniorities", []):
-                return False
-
-        return True
\ No newline at end of file
+        if self.slim:
+            return bool(criteria_mask([job], criteria)[0])
+        return bool(criteria_mask(pd.json_normalize([{"job": job}], sep='.'), criteria)[0])
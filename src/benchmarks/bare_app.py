@@ -0,0 +1,11 @@
+"""
+A FastAPI app without any of the API: the time a uvicorn worker of it needs to answer is the floor of the startup
+of an API worker (see src/benchmarks/startup.py).
+"""
+from fastapi import FastAPI
+
+app = FastAPI()
+
+@app.get("/")
+def read_root():
+    return {}
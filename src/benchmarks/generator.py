@@ -0,0 +1,152 @@
+"""
+Seeded synthetic talents and jobs for the benchmarks, following the schemas of src/api/schemas.py.
+
+The distributions roughly follow the raw data (see notebooks/data_insights.ipynb): most talents speak German
+and English at a high level, the roles are mostly tech roles, about a sixth of the talents have no seniority,
+salary expectations are between 25k and 140k, and most jobs require German (often also English) as a must-have.
+"""
+import numpy as np
+import pandas as pd
+
+languages = ['German', 'English', 'French', 'Spanish', 'Italian', 'Polish', 'Russian', 'Turkish', 'Portuguese', 'Dutch']
+ratings = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+# Role -> relative frequency
+job_roles = {
+    'frontend-developer': 10, 'backend-developer': 10, 'full-stack-developer': 9, 'java-developer': 6,
+    'php-developer': 4, 'python-developer': 5, 'mobile-developer': 4, 'devops-engineer': 5, 'data-scientist': 4,
+    'data-engineer': 3, 'database-administrator': 2, 'qa-engineer': 3, 'tech-lead': 3, 'c-level': 1,
+    'product-manager': 4, 'project-manager': 3, 'ui-ux-designer': 3, 'business-analyst': 2,
+    'customer-success-manager': 2, 'business-development-manager': 2, 'marketing-team-lead': 1,
+    'social-media-marketing-manager': 1, 'copywriter': 1, 'sales-manager': 2,
+}
+seniorities = ['none', 'junior', 'midlevel', 'senior']
+talent_seniority_p = [0.17, 0.25, 0.31, 0.27]
+degrees = ['none', 'apprenticeship', 'bachelor', 'master', 'doctorate']
+talent_degree_p = [0.15, 0.15, 0.40, 0.27, 0.03]
+job_degree_p = [0.50, 0.10, 0.30, 0.09, 0.01]
+
+
+def salaries(rng: np.random.Generator, n: int, median: float, low: int, high: int) -> np.ndarray:
+    """
+    Log-normal salaries rounded to thousands, clipped to [low, high].
+    """
+    return np.clip(np.round(rng.lognormal(np.log(median), 0.35, n), -3), low, high).astype(int)
+
+
+def sample_without_replacement(rng: np.random.Generator, p: np.ndarray, counts: np.ndarray) -> list[np.ndarray]:
+    """
+    For every count, that many distinct indices drawn with the probabilities p (all rows at once, by sorting
+    Gumbel-perturbed log probabilities).
+    """
+    keys = np.log(p) + rng.gumbel(size=(len(counts), len(p)))
+    order = np.argsort(-keys, axis=1)
+    return [row[:count] for row, count in zip(order, counts)]
+
+
+class SyntheticDataGenerator:
+    """
+    Generate talents and jobs, and frames of talent/job pairs. Every method draws from its own random stream
+    derived from the seed and the number of records, so the same call always returns the same data.
+    """
+
+    def __init__(self, seed: int = 42):
+        """
+        Args:
+            seed: Seed of the random streams.
+        """
+        self.seed = seed
+        role_weights = np.array(list(job_roles.values()), dtype=float)
+        self.role_names = list(job_roles)
+        self.role_p = role_weights / role_weights.sum()
+
+    def rng(self, stream: int, n: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, stream, n])
+
+    def roles(self, rng: np.random.Generator, n: int, counts_p: list[float]) -> list[list[str]]:
+        """
+        Distinct roles drawn by frequency for n records, 1 to len(counts_p) roles per record.
+        """
+        counts = rng.choice(np.arange(1, len(counts_p) + 1), size=n, p=counts_p)
+        return [[self.role_names[j] for j in row] for row in sample_without_replacement(rng, self.role_p, counts)]
+
+    def talents(self, n: int) -> list[dict]:
+        """
+        Generate n talents with the ids talent_0 ... talent_<n-1>.
+        """
+        rng = self.rng(0, n)
+        salary = salaries(rng, n, 55000, 25000, 140000)
+        seniority = rng.choice(seniorities, size=n, p=talent_seniority_p)
+        degree = rng.choice(degrees, size=n, p=talent_degree_p)
+        roles = self.roles(rng, n, [0.2, 0.25, 0.25, 0.15, 0.15])
+        german = rng.random(n) < 0.85
+        german_rating = rng.choice(ratings, size=n, p=[0.02, 0.03, 0.05, 0.1, 0.2, 0.6])
+        english = rng.random(n) < 0.8
+        english_rating = rng.choice(ratings, size=n, p=[0.02, 0.03, 0.1, 0.25, 0.35, 0.25])
+        others = sample_without_replacement(rng, np.full(len(languages) - 2, 1 / (len(languages) - 2)),
+                                            rng.choice(3, size=n, p=[0.6, 0.3, 0.1]))
+        other_ratings = rng.choice(ratings, size=(n, 2))
+        talents = []
+        for i in range(n):
+            spoken = [{"rating": str(german_rating[i]), "title": "German"}] if german[i] else []
+            if english[i]:
+                spoken.append({"rating": str(english_rating[i]), "title": "English"})
+            spoken += [{"rating": str(other_ratings[i, k]), "title": languages[2 + j]} for k, j in enumerate(others[i])]
+            talents.append({
+                "talent_id": f"talent_{i}",
+                "languages": spoken,
+                "job_roles": roles[i],
+                "seniority": str(seniority[i]),
+                "salary_expectation": int(salary[i]),
+                "degree": str(degree[i]),
+            })
+        return talents
+
+    def jobs(self, n: int) -> list[dict]:
+        """
+        Generate n jobs with the ids job_0 ... job_<n-1>.
+        """
+        rng = self.rng(1, n)
+        max_salary = salaries(rng, n, 62000, 30000, 160000)
+        min_degree = rng.choice(degrees, size=n, p=job_degree_p)
+        roles = self.roles(rng, n, [0.7, 0.3])
+        german = rng.random(n) < 0.9
+        german_rating = rng.choice(['B1', 'B2', 'C1', 'C2'], size=n, p=[0.1, 0.2, 0.6, 0.1])
+        german_must_have = rng.random(n) < 0.9
+        english = rng.random(n) < 0.5
+        english_rating = rng.choice(['B1', 'B2', 'C1'], size=n, p=[0.2, 0.5, 0.3])
+        english_must_have = rng.random(n) < 0.5
+        other = rng.random(n) < 0.1
+        other_title = rng.choice(languages[2:], size=n)
+        other_rating = rng.choice(ratings[2:], size=n)
+        # A contiguous range of accepted seniorities
+        lowest = rng.integers(0, 4, size=n)
+        highest = np.minimum(3, lowest + rng.choice(3, size=n, p=[0.4, 0.4, 0.2]))
+        jobs = []
+        for i in range(n):
+            required = [{"title": "German", "rating": str(german_rating[i]), "must_have": bool(german_must_have[i])}] if german[i] else []
+            if english[i]:
+                required.append({"title": "English", "rating": str(english_rating[i]), "must_have": bool(english_must_have[i])})
+            if other[i]:
+                required.append({"title": str(other_title[i]), "rating": str(other_rating[i]), "must_have": False})
+            jobs.append({
+                "job_id": f"job_{i}",
+                "languages": required,
+                "job_roles": roles[i],
+                "seniorities": seniorities[lowest[i]:highest[i] + 1],
+                "max_salary": int(max_salary[i]),
+                "min_degree": str(min_degree[i]),
+            })
+        return jobs
+
+    def pair_frame(self, n_rows: int, n_talents: int = 10000, n_jobs: int = 10000) -> pd.DataFrame:
+        """
+        A frame of n_rows talent/job pairs with the normalized 'talent.*' and 'job.*' columns (the input of
+        FeatureTransformer.transform). The rows pair up randomly drawn talents and jobs out of n_talents and n_jobs
+        distinct ones, so that millions of rows share their list values and fit into memory.
+        """
+        rng = self.rng(2, n_rows)
+        talents = pd.json_normalize([{"talent": talent} for talent in self.talents(n_talents)], sep='.')
+        jobs = pd.json_normalize([{"job": job} for job in self.jobs(n_jobs)], sep='.')
+        talent_rows = talents.iloc[rng.integers(0, n_talents, n_rows)].reset_index(drop=True)
+        job_rows = jobs.iloc[rng.integers(0, n_jobs, n_rows)].reset_index(drop=True)
+        return pd.concat([talent_rows, job_rows], axis=1)
@@ -0,0 +1,295 @@
+"""
+Load test of the API on one machine: replay recorded request bodies (or synthesized ones) against a locally
+started uvicorn server, and report the latency histogram and percentiles, error rate and throughput per endpoint.
+
+With a rate, requests arrive open loop (Poisson arrivals at that rate, independent of the responses, at most
+`concurrency` of them in flight), and the latency of a request counts from its scheduled arrival, so a server
+that falls behind shows up as growing latencies instead of a slower client. Without a rate, `concurrency`
+connections send requests back to back (closed loop), which measures the maximum throughput.
+"""
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Optional
+import httpx
+import numpy as np
+from src.api.metrics import latency_buckets
+from src.benchmarks.generator import SyntheticDataGenerator
+from src.benchmarks.runner import git_commit
+from src.utils.config_utils import load_yaml_config
+from src.utils.log import log
+
+endpoints = ['/match', '/match_bulk', '/rank_and_filter']
+
+# The client logs every request at INFO level
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def request_endpoint(body: dict) -> Optional[str]:
+    """
+    The endpoint of a request body, by its fields (None when it is no request of a load tested endpoint).
+    """
+    if 'talent' in body and 'job' in body:
+        return '/match'
+    if 'talents' in body:
+        return '/match_bulk'
+    if 'talent' in body and 'criteria' in body:
+        return '/rank_and_filter'
+    return None
+
+
+def load_requests(paths: list[str]) -> list[tuple[str, dict]]:
+    """
+    Load recorded requests: .json files with one request body (like artifacts/api_request_examples/*.json),
+    and .jsonl files with one request per line, either {"endpoint": ..., "body": ...} or a bare request body.
+    The endpoint of a bare body is derived from its fields, lines of other endpoints are skipped.
+
+    Returns:
+        (endpoint, body) pairs in file order.
+    """
+    requests = []
+    for path in paths:
+        with open(path) as file:
+            records = [json.loads(line) for line in file if line.strip()] if path.endswith('.jsonl') else [json.load(file)]
+        for record in records:
+            endpoint, body = (record['endpoint'], record['body']) if 'body' in record else (request_endpoint(record), record)
+            if endpoint in endpoints:
+                requests.append((endpoint, body))
+        log.info(f"Loaded {len(records)} requests from {path}")
+    if not requests:
+        raise ValueError(f"No requests of {endpoints} in {paths}")
+    return requests
+
+
+def synthesize_requests(config: dict) -> list[tuple[str, dict]]:
+    """
+    Synthesize request bodies with talents and jobs of the benchmark data generator, drawn from fixed pools so
+    that talents repeat across requests like in production (and hit the talent cache).
+
+    Returns:
+        (endpoint, body) pairs, with the endpoints in the shares of request_mix.
+    """
+    generator = SyntheticDataGenerator(seed=config['seed'])
+    talents, jobs = generator.talents(config['talent_pool']), generator.jobs(config['job_pool'])
+    rng = np.random.default_rng(config['seed'])
+    mix = config['request_mix']
+    shares = np.array(list(mix.values()), dtype=float)
+    requests = []
+    for endpoint in rng.choice(list(mix), size=config['synthetic_requests'], p=shares / shares.sum()):
+        if endpoint == '/match':
+            body = {"talent": talents[rng.integers(len(talents))], "job": jobs[rng.integers(len(jobs))]}
+        elif endpoint == '/match_bulk':
+            body = {"talents": [talents[i] for i in rng.choice(len(talents), config['match_bulk_talents'], replace=False)],
+                    "jobs": [jobs[i] for i in rng.choice(len(jobs), config['match_bulk_jobs'], replace=False)]}
+        else:
+            body = {"talent": talents[rng.integers(len(talents))],
+                    "jobs": [jobs[i] for i in rng.choice(len(jobs), config['rank_and_filter_jobs'], replace=False)],
+                    "criteria": config['rank_and_filter_criteria']}
+        requests.append((str(endpoint), body))
+    return requests
+
+
+class LocalServer:
+    """
+    A uvicorn server of the API in a subprocess, as a context manager that waits until it serves requests.
+    """
+
+    def __init__(self, host: str, port: int, workers: int = 1, startup_timeout: float = 120, poll_interval: float = 0.2,
+                 env: Optional[dict] = None, app: str = 'src.api.api:app'):
+        """
+        Args:
+            host: Host to bind.
+            port: Port to bind.
+            workers: Number of uvicorn worker processes.
+            startup_timeout: Seconds to wait for the server to answer.
+            poll_interval: Seconds between the checks whether the server answers.
+            env: Environment of the server process (default: the environment of this process).
+            app: The ASGI app to serve, as module:attribute.
+        """
+        self.url = f"http://{host}:{port}"
+        self.command = [sys.executable, '-m', 'uvicorn', app, '--host', host, '--port', str(port),
+                        '--workers', str(workers), '--log-level', 'warning']
+        self.startup_timeout = startup_timeout
+        self.poll_interval = poll_interval
+        self.env = env
+        self.process = None
+        # Seconds from starting the process to its first response
+        self.ready_seconds = None
+
+    def __enter__(self) -> "LocalServer":
+        start = time.perf_counter()
+        self.process = subprocess.Popen(self.command, env=self.env)
+        deadline = time.monotonic() + self.startup_timeout
+        # One client for all checks, creating one per check takes CPU time away from the starting server
+        with httpx.Client(timeout=1) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"The API server exited with code {self.process.returncode}")
+                try:
+                    if client.get(self.url + "/").status_code == 200:
+                        self.ready_seconds = time.perf_counter() - start
+                        log.info(f"API server ready at {self.url} after {self.ready_seconds:.2f}s")
+                        return self
+                except httpx.HTTPError:
+                    pass
+                time.sleep(self.poll_interval)
+        self.__exit__()
+        raise TimeoutError(f"The API server did not start within {self.startup_timeout} seconds")
+
+    def __exit__(self, *args) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+async def send(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, endpoint: str, content: bytes,
+               scheduled: Optional[float] = None) -> dict:
+    """
+    Send one request once a connection is free.
+
+    Returns:
+        The endpoint, status (None for a transport error), error, latency (from the scheduled arrival, or from
+        the start of the request) and service time (from the start of the request) in seconds.
+    """
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            response = await client.post(endpoint, content=content, headers={"content-type": "application/json"})
+            status, error = response.status_code, None if response.status_code < 400 else f"HTTP {response.status_code}"
+        except httpx.HTTPError as exception:
+            status, error = None, type(exception).__name__
+    end = time.perf_counter()
+    return {'endpoint': endpoint, 'status': status, 'error': error,
+            'latency': end - (scheduled if scheduled is not None else started), 'service_time': end - started}
+
+
+async def drive(url: str, requests: list[tuple[str, bytes]], rate: Optional[float], concurrency: int, duration: float,
+                timeout: float, seed: int) -> tuple[list[dict], float]:
+    """
+    Send the requests (cycling through them) for duration seconds, open loop at rate requests per second, or
+    closed loop from `concurrency` connections when rate is None.
+
+    Returns:
+        The records of all requests (see send), and the elapsed time until the last response.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        if rate is not None:
+            arrivals = np.cumsum(np.random.default_rng(seed).exponential(1 / rate, int(rate * duration)))
+            tasks = []
+            for i, arrival in enumerate(arrivals):
+                delay = start + arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(send(client, semaphore, *requests[i % len(requests)], start + arrival)))
+            records = await asyncio.gather(*tasks)
+        else:
+            counter = iter(range(sys.maxsize))
+
+            async def connection() -> list[dict]:
+                connection_records = []
+                while time.perf_counter() - start < duration:
+                    connection_records.append(await send(client, semaphore, *requests[next(counter) % len(requests)]))
+                return connection_records
+
+            records = [record for records in await asyncio.gather(*(connection() for _ in range(concurrency))) for record in records]
+        return list(records), time.perf_counter() - start
+
+
+def summarize(records: list[dict], elapsed: float) -> dict:
+    """
+    Requests, errors, error rate, throughput (successful requests per second), latency percentiles and latency
+    histogram (cumulative counts per bucket of src/api/metrics.py) of request records.
+    """
+    latencies = np.array([record['latency'] for record in records if record['error'] is None])
+    errors = [record['error'] for record in records if record['error'] is not None]
+    summary = {
+        'requests': len(records),
+        'errors': len(errors),
+        'error_rate': len(errors) / len(records) if records else 0.0,
+        'error_types': {error: errors.count(error) for error in sorted(set(errors))},
+        'throughput': len(latencies) / elapsed,
+    }
+    if len(latencies):
+        summary['latency_seconds'] = {
+            'mean': float(latencies.mean()),
+            **{f'p{q}': float(np.percentile(latencies, q)) for q in [50, 90, 99]},
+            'max': float(latencies.max()),
+        }
+        summary['latency_histogram'] = {str(bound): int((latencies <= bound).sum()) for bound in latency_buckets}
+        summary['latency_histogram']['+Inf'] = len(latencies)
+    return summary
+
+
+def run_load_test(config_path: str, request_files: Optional[list[str]] = None, url: Optional[str] = None,
+                  rate: Optional[float] = None, concurrency: Optional[int] = None, duration: Optional[float] = None,
+                  output_path: Optional[str] = None) -> dict:
+    """
+    Run a load test and save the report as JSON. The arguments that are None default to the load test config.
+
+    Args:
+        config_path: Path to the load test config YAML file.
+        request_files: Recorded requests to replay (see load_requests), synthesized requests when None.
+        url: URL of a running API server, a local uvicorn server is started when None.
+        rate: Open loop arrivals per second (rate 0 for a closed loop).
+        concurrency: Maximum number of requests in flight.
+        duration: Seconds to send requests for.
+        output_path: Path of the report file.
+
+    Returns:
+        The report: the settings and the summary of all requests and of every endpoint.
+    """
+    config = load_yaml_config(config_path)
+    rate = rate if rate is not None else config['rate']
+    rate = rate or None
+    concurrency = concurrency or config['concurrency']
+    duration = duration or config['duration']
+    request_files = request_files or config.get('request_files')
+    requests = load_requests(request_files) if request_files else synthesize_requests(config)
+    # Serialized once, so that the client spends its time on sending
+    payloads = [(endpoint, json.dumps(body).encode()) for endpoint, body in requests]
+
+    def load(server_url: str) -> tuple[list[dict], float]:
+        # Warm up every endpoint before the measurement
+        for endpoint in sorted({endpoint for endpoint, _ in payloads}):
+            for _, content in [payload for payload in payloads if payload[0] == endpoint][:config['warmup_requests']]:
+                httpx.post(server_url + endpoint, content=content, headers={"content-type": "application/json"},
+                           timeout=config['timeout'])
+        log.info(f"Sending {'closed loop' if rate is None else f'{rate} requests/s'} for {duration}s with concurrency {concurrency}")
+        return asyncio.run(drive(server_url, payloads, rate, concurrency, duration, config['timeout'], config['seed']))
+
+    if url is not None:
+        records, elapsed = load(url)
+    else:
+        with LocalServer(config['host'], config['port'], config['server_workers'], config['startup_timeout']) as server:
+            records, elapsed = load(server.url)
+
+    report = {
+        'commit': git_commit(),
+        'settings': {'rate': rate, 'concurrency': concurrency, 'duration': duration, 'url': url,
+                     'server_workers': None if url else config['server_workers'],
+                     'requests': request_files or f"{len(requests)} synthesized"},
+        'elapsed_seconds': elapsed,
+        'all': summarize(records, elapsed),
+        'endpoints': {endpoint: summarize([record for record in records if record['endpoint'] == endpoint], elapsed)
+                      for endpoint in endpoints if any(record['endpoint'] == endpoint for record in records)},
+    }
+    for name, summary in [('all', report['all']), *report['endpoints'].items()]:
+        latency = summary.get('latency_seconds', {})
+        log.info(f"{name}: {summary['requests']} requests, {summary['throughput']:.1f}/s, error rate {summary['error_rate']:.2%}, "
+                 f"p50 {latency.get('p50', float('nan')) * 1000:.1f}ms, p99 {latency.get('p99', float('nan')) * 1000:.1f}ms")
+
+    output_path = output_path or config['output_path']
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump(report, file, indent=2)
+    log.info(f"Load test report saved to {output_path}")
+    return report
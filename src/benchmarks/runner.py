@@ -0,0 +1,159 @@
+"""
+Run the benchmark scenarios and compare benchmark results of two commits.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Optional
+import numpy as np
+import pandas as pd
+import sklearn
+from src.api.search import Search
+from src.benchmarks.generator import SyntheticDataGenerator
+from src.benchmarks.scenarios import scenarios as benchmark_scenarios
+from src.models.rule_based_model import RuleBasedModel
+from src.utils.config_utils import load_yaml_config
+from src.utils.log import log
+
+
+def git_commit() -> Optional[str]:
+    """
+    The current commit (with a '-dirty' suffix for uncommitted changes), None outside of a git checkout.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty.strip() else '')
+
+
+def environment() -> dict:
+    """
+    The machine and library versions the benchmarks ran with.
+    """
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def load_searches(config: dict, models: Optional[list[str]] = None) -> dict[str, Search]:
+    """
+    A Search for every benchmarked model, loaded from its model config like the API does. The rule-based model
+    needs no training, so it is created directly when it has not been saved. Models without a trained artifact
+    are skipped.
+
+    Args:
+        config: The benchmark config.
+        models: The names of the models to load (default: all models of the config).
+
+    Returns:
+        Model name -> Search.
+    """
+    searches = {}
+    for name in models or list(config['models']):
+        model_config_path = config['models'][name]
+        model_config = load_yaml_config(model_config_path)
+        if model_config['model_type'] == 'rule_based' and not os.path.exists(model_config['model_save_path']):
+            searches[name] = Search(model=RuleBasedModel(), **config['search'])
+            continue
+        try:
+            searches[name] = Search(model_config_path=model_config_path, **config['search'])
+        except FileNotFoundError as error:
+            log.warning(f"Skipping the {name} model, it has not been trained: {error}")
+    return searches
+
+
+def run_benchmarks(config_path: str, scenarios: Optional[list[str]] = None, models: Optional[list[str]] = None,
+                   output_path: Optional[str] = None) -> dict:
+    """
+    Run benchmark scenarios and save the results as JSON.
+
+    Args:
+        config_path: Path to the benchmark config YAML file.
+        scenarios: The names of the scenarios to run (default: all, see src/benchmarks/scenarios.py).
+        models: The names of the models to benchmark (default: all models of the config).
+        output_path: Path of the results file (default: output_path of the config).
+
+    Returns:
+        The results: the commit, environment, config and the result of every case.
+    """
+    config = load_yaml_config(config_path)
+    generator = SyntheticDataGenerator(seed=config['seed'])
+    searches = load_searches(config, models)
+    started = time.time()
+    results = []
+    for name in scenarios or list(benchmark_scenarios):
+        if name not in benchmark_scenarios:
+            raise ValueError(f"Unknown scenario: {name}")
+        log.info(f"Running the {name} benchmarks")
+        results += benchmark_scenarios[name](config, generator, searches)
+    for search in searches.values():
+        search.close()
+
+    report = {
+        'commit': git_commit(),
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+        'duration_seconds': time.time() - started,
+        'environment': environment(),
+        'config': config,
+        'results': results,
+    }
+    output_path = output_path or config['output_path']
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump(report, file, indent=2)
+    log.info(f"Benchmark results saved to {output_path}")
+    return report
+
+
+def case_key(result: dict) -> str:
+    """
+    The identity of a benchmark case across runs: scenario, model and parameters.
+    """
+    return json.dumps([result['scenario'], result['model'], result['params']], sort_keys=True)
+
+
+def compare_results(baseline_path: str, current_path: str, tolerance: float = 0.1) -> list[dict]:
+    """
+    Compare the fastest timings of the cases two benchmark runs have in common, and log them.
+
+    Args:
+        baseline_path: Results file of the baseline (e.g. the main branch).
+        current_path: Results file to compare against the baseline.
+        tolerance: Relative slowdown above which a case counts as a regression.
+
+    Returns:
+        For every common case: scenario, model, params, both timings, the ratio current / baseline and
+        whether it is a regression.
+    """
+    with open(baseline_path) as file:
+        baseline = {case_key(result): result for result in json.load(file)['results']}
+    with open(current_path) as file:
+        current = json.load(file)['results']
+
+    comparison = []
+    for result in current:
+        base = baseline.get(case_key(result))
+        if base is None:
+            continue
+        ratio = result['min_seconds'] / base['min_seconds']
+        comparison.append({
+            'scenario': result['scenario'],
+            'model': result['model'],
+            'params': result['params'],
+            'baseline_seconds': base['min_seconds'],
+            'current_seconds': result['min_seconds'],
+            'ratio': ratio,
+            'regression': ratio > 1 + tolerance,
+        })
+        log.info(f"{'REGRESSION ' if ratio > 1 + tolerance else ''}{result['scenario']} {result['model'] or ''} "
+                 f"{result['params']}: {base['min_seconds']:.4f}s -> {result['min_seconds']:.4f}s ({ratio:.2f}x)")
+    return comparison
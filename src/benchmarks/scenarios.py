@@ -0,0 +1,186 @@
+"""
+Benchmark scenarios. Every scenario takes the benchmark config, the data generator and the loaded Search objects
+(model name -> Search), and returns one result per case (model and size), see measure.
+"""
+import gc
+import statistics
+import time
+from typing import Callable, Optional
+from src.api.search import Search
+from src.benchmarks.generator import SyntheticDataGenerator
+from src.data_processing.feature_transformer.main_transformer import FeatureTransformer
+from src.utils.log import log
+
+
+def measure(fn: Callable[..., object], repeats: int, time_budget: Optional[float] = None,
+            setup: Optional[Callable[[], object]] = None) -> dict:
+    """
+    Time repeated calls of fn, after one untimed warm-up call. Once the calls took time_budget seconds in total,
+    no more calls are made, so that the largest cases stay affordable: when the warm-up call alone exceeds the
+    budget, it is the only timing.
+
+    Args:
+        fn: The timed function.
+        repeats: Number of timed calls.
+        time_budget: Seconds after which no more calls are made (None for no limit).
+        setup: Untimed function called before every call of fn, fn is called with its result (e.g. a fresh copy
+            of the input).
+
+    Returns:
+        The number of calls, and the min, median, mean and all timings in seconds.
+    """
+    def timed_call() -> float:
+        args = () if setup is None else (setup(),)
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start
+
+    timings = [timed_call()]
+    if time_budget is None or timings[0] < time_budget:
+        timings = []
+    for _ in range(repeats - len(timings)):
+        timings.append(timed_call())
+        if time_budget is not None and sum(timings) >= time_budget:
+            break
+    return summarize_timings(timings)
+
+
+def summarize_timings(timings: list[float]) -> dict:
+    """
+    The number of timings, and their min, median, mean and all of them in seconds.
+    """
+    return {
+        'calls': len(timings),
+        'min_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'mean_seconds': statistics.mean(timings),
+        'seconds': timings,
+    }
+
+
+def result(scenario: str, model: Optional[str], params: dict, timing: dict, items: int, unit: str) -> dict:
+    """
+    A benchmark result with the throughput (items per second of the fastest call).
+    """
+    log.info(f"{scenario} {model or ''} {params}: {timing['min_seconds']:.4f}s ({items / timing['min_seconds']:.0f} {unit}/s)")
+    return {
+        'scenario': scenario,
+        'model': model,
+        'params': params,
+        **timing,
+        'items': items,
+        'unit': unit,
+        'throughput': items / timing['min_seconds'],
+    }
+
+
+def transform_scenario(config: dict, generator: SyntheticDataGenerator, searches: dict[str, Search]) -> list[dict]:
+    """
+    FeatureTransformer.transform (the frame with all selected features added, model independent), and
+    FeatureTransformer.transform_features with the features of every model, on frames of the configured row counts.
+    """
+    results = []
+    transformer = FeatureTransformer()
+    for rows in config['transform_rows']:
+        df = generator.pair_frame(rows, config['distinct_records'], config['distinct_records'])
+        timing = measure(transformer.transform, config['repeats'], config.get('time_budget'), setup=df.copy)
+        results.append(result('transform', None, {'rows': rows}, timing, rows, 'rows'))
+        for name, search in searches.items():
+            timing = measure(lambda: transformer.transform_features(df, search.features), config['repeats'], config.get('time_budget'))
+            results.append(result('transform_features', name, {'rows': rows}, timing, rows, 'rows'))
+        del df
+    return results
+
+
+def match_scenario(config: dict, generator: SyntheticDataGenerator, searches: dict[str, Search]) -> list[dict]:
+    """
+    Search.match, one call per talent/job pair of the configured number of pairs.
+    """
+    calls = config['match_calls']
+    talents, jobs = generator.talents(calls), generator.jobs(calls)
+    results = []
+    for name, search in searches.items():
+        timing = measure(lambda: [search.match(talent, job) for talent, job in zip(talents, jobs)],
+                         config['repeats'], config.get('time_budget'))
+        results.append(result('match', name, {'calls': calls}, timing, calls, 'requests'))
+    return results
+
+
+def match_bulk_scenario(config: dict, generator: SyntheticDataGenerator, searches: dict[str, Search]) -> list[dict]:
+    """
+    Search.match_bulk on talents x jobs of the configured sizes, once for every configured set of request options
+    (e.g. all pairs as ids, or the top k jobs per talent).
+    """
+    results = []
+    for n_talents, n_jobs in config['match_bulk_sizes']:
+        talents, jobs = generator.talents(n_talents), generator.jobs(n_jobs)
+        for options in config['match_bulk_options']:
+            for name, search in searches.items():
+                timing = measure(lambda: search.match_bulk(talents, jobs, **options), config['repeats'], config.get('time_budget'))
+                params = {'talents': n_talents, 'jobs': n_jobs, **options}
+                results.append(result('match_bulk', name, params, timing, n_talents * n_jobs, 'pairs'))
+    return results
+
+
+def rank_and_filter_scenario(config: dict, generator: SyntheticDataGenerator, searches: dict[str, Search]) -> list[dict]:
+    """
+    Search.rank_and_filter of one talent over the configured number of jobs, with the jobs in the request and
+    with the jobs in the job catalog, for every configured criteria.
+    """
+    n_jobs = config['rank_and_filter_jobs']
+    talent, jobs = generator.talents(1)[0], generator.jobs(n_jobs)
+    results = []
+    for name, search in searches.items():
+        search.catalog.upsert(jobs)
+        for criteria in config['rank_and_filter_criteria']:
+            timing = measure(lambda: search.rank_and_filter(talent, jobs, criteria), config['repeats'], config.get('time_budget'))
+            results.append(result('rank_and_filter', name, {'jobs': n_jobs, 'source': 'request', 'criteria': criteria},
+                                  timing, n_jobs, 'jobs'))
+            timing = measure(lambda: search.rank_and_filter(talent, None, criteria), config['repeats'], config.get('time_budget'))
+            results.append(result('rank_and_filter', name, {'jobs': n_jobs, 'source': 'catalog', 'criteria': criteria},
+                                  timing, n_jobs, 'jobs'))
+        search.catalog.delete(search.catalog.job_ids())
+    return results
+
+
+def startup_scenario(config: dict, generator: SyntheticDataGenerator, searches: dict[str, Search]) -> list[dict]:
+    """
+    Cold start of an API worker (see src/benchmarks/startup.py) with every model of startup_models and every serving
+    mode of startup_serving_modes: the import of the API, the time until a new uvicorn worker answers, and the
+    first request of every endpoint. The ready cases also list the heavy libraries the worker imported, and how much
+    longer the worker took than one of a bare FastAPI app (the startup_framework case), which is what
+    startup_target_seconds applies to.
+    """
+    # Imported here, src/benchmarks/startup.py imports the runner (through the load test)
+    from src.benchmarks.startup import measure_startup, framework_ready_seconds
+    framework = summarize_timings(framework_ready_seconds(config['repeats'], config['startup_host'], config['startup_port']))
+    results = [result('startup_framework', None, {}, framework, 1, 'workers')]
+    for name in [name for name in config['startup_models'] if name in searches]:
+        for serving_mode in config['startup_serving_modes']:
+            startup = measure_startup(config['models'][name], serving_mode, config['repeats'], config['startup_host'],
+                                      config['startup_port'])
+            params = {'serving_mode': serving_mode}
+            results.append(result('startup_import', name, params, summarize_timings(startup['import_seconds']), 1, 'workers'))
+            ready = result('startup_ready', name, params, summarize_timings(startup['ready_seconds']), 1, 'workers')
+            ready['heavy_modules'] = {'after_import': startup['modules_after_import'],
+                                      'after_requests': startup['modules_after_requests']}
+            ready['framework_overhead_seconds'] = ready['median_seconds'] - framework['median_seconds']
+            results.append(ready)
+            if ready['framework_overhead_seconds'] > config['startup_target_seconds']:
+                log.warning(f"A {serving_mode} {name} worker took {ready['framework_overhead_seconds']:.2f}s longer to "
+                            f"start than a bare FastAPI worker, above the target of {config['startup_target_seconds']}s")
+            for endpoint, timings in startup['first_request_seconds'].items():
+                results.append(result('startup_first_request', name, {**params, 'endpoint': endpoint},
+                                      summarize_timings(timings), 1, 'requests'))
+    return results
+
+
+# Name -> scenario, in the order they run
+scenarios = {
+    'transform': transform_scenario,
+    'match': match_scenario,
+    'match_bulk': match_bulk_scenario,
+    'rank_and_filter': rank_and_filter_scenario,
+    'startup': startup_scenario,
+}
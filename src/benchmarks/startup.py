@@ -0,0 +1,129 @@
+"""
+Cold start of an API worker: how long a new uvicorn worker takes until it serves requests, how long its first
+request of every endpoint takes, and which heavy libraries it imports, per model and serving mode.
+
+Every measurement starts a fresh Python process, with the model config (serving_mode overridden) passed through
+the MODEL_CONFIG_PATH environment variable of the API. The same is measured for a bare FastAPI app
+(src/benchmarks/bare_app.py): importing FastAPI alone takes most of a second, so the startup of the API is also
+reported as the overhead above that floor.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import yaml
+from src.api.examples import example_talent, example_talent_2, example_job, example_job_2, example_criteria
+from src.benchmarks.load_test import LocalServer
+
+# The libraries the slim serving mode does not need
+heavy_modules = ['pandas', 'scipy', 'sklearn', 'joblib']
+
+# The first request of every endpoint
+first_requests = {
+    '/match': {"talent": example_talent, "job": example_job},
+    '/match_bulk': {"talents": [example_talent, example_talent_2], "jobs": [example_job, example_job_2]},
+    '/rank_and_filter': {"talent": example_talent, "jobs": [example_job, example_job_2], "criteria": example_criteria},
+}
+
+# Run in a fresh process: import the API, serve the first requests and report the import time and the heavy
+# modules (the arguments) imported after the import and after the requests
+probe = """
+import json, sys, time
+start = time.perf_counter()
+from src.api import api
+imported = time.perf_counter() - start
+modules = sorted(name for name in sys.argv[1:] if name in sys.modules)
+from src.api.examples import example_talent, example_talent_2, example_job, example_job_2, example_criteria
+search = api.reloader.search
+search.match(example_talent, example_job)
+search.match_bulk([example_talent, example_talent_2], [example_job, example_job_2])
+search.rank_and_filter(example_talent, [example_job, example_job_2], example_criteria)
+print(json.dumps({'import_seconds': imported, 'modules_after_import': modules,
+                  'modules_after_requests': sorted(name for name in sys.argv[1:] if name in sys.modules)}))
+"""
+
+def serving_config(model_config_path: str, serving_mode: str, directory: str) -> str:
+    """
+    Write a copy of a model config with the serving mode set into the directory.
+
+    Returns:
+        The path of the copy.
+    """
+    with open(model_config_path) as file:
+        config = yaml.safe_load(file)
+    config['serving_mode'] = serving_mode
+    path = os.path.join(directory, f"{serving_mode}_{os.path.basename(model_config_path)}")
+    with open(path, 'w') as file:
+        yaml.safe_dump(config, file)
+    return path
+
+
+def probe_imports(model_config_path: str) -> dict:
+    """
+    Import the API in a fresh process and serve the first request of every endpoint in process.
+
+    Returns:
+        The import time in seconds, and the heavy modules imported by then and after the requests.
+    """
+    output = subprocess.run([sys.executable, '-c', probe, *heavy_modules], capture_output=True, text=True, check=True,
+                            env={**os.environ, 'MODEL_CONFIG_PATH': model_config_path}).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def framework_ready_seconds(repeats: int, host: str, port: int, startup_timeout: float = 120) -> list[float]:
+    """
+    The seconds a uvicorn worker of the bare FastAPI app takes to answer, repeats times after one warm-up start.
+    """
+    ready_seconds = []
+    for _ in range(repeats + 1):
+        with LocalServer(host, port, startup_timeout=startup_timeout, poll_interval=0.01, app='src.benchmarks.bare_app:app') as server:
+            ready_seconds.append(server.ready_seconds)
+    return ready_seconds[1:]
+
+
+def time_to_ready(model_config_path: str, host: str, port: int, startup_timeout: float = 120) -> dict:
+    """
+    Start a uvicorn worker of the API and send the first request of every endpoint once it answers.
+
+    Returns:
+        The seconds from starting the process to the first response, and the seconds of the first request
+        of every endpoint.
+    """
+    server = LocalServer(host, port, startup_timeout=startup_timeout, poll_interval=0.01,
+                         env={**os.environ, 'MODEL_CONFIG_PATH': model_config_path})
+    with server:
+        ready = server.ready_seconds
+        first_request_seconds = {}
+        for endpoint, body in first_requests.items():
+            start = time.perf_counter()
+            httpx.post(server.url + endpoint, json=body, timeout=startup_timeout).raise_for_status()
+            first_request_seconds[endpoint] = time.perf_counter() - start
+    return {'ready_seconds': ready, 'first_request_seconds': first_request_seconds}
+
+
+def measure_startup(model_config_path: str, serving_mode: str, repeats: int, host: str, port: int,
+                    startup_timeout: float = 120) -> dict:
+    """
+    Measure the cold start of the API with a model config in a serving mode, repeats times after one warm-up
+    start (which fills the file system cache, like a worker that is not the first on its machine).
+
+    Returns:
+        The probe of the last start (see probe_imports), and the import times, ready times and first request
+        times per endpoint of all timed starts.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = serving_config(model_config_path, serving_mode, directory)
+        probe_imports(config_path)
+        runs = [(probe_imports(config_path), time_to_ready(config_path, host, port, startup_timeout))
+                for _ in range(repeats)]
+    return {
+        **runs[-1][0],
+        'import_seconds': [probed['import_seconds'] for probed, _ in runs],
+        'ready_seconds': [started['ready_seconds'] for _, started in runs],
+        'first_request_seconds': {endpoint: [started['first_request_seconds'][endpoint] for _, started in runs]
+                                  for endpoint in first_requests},
+    }
+
@@ -36,5 +36,24 @@ selected_features = [
     'job_roles_match_binary', 'language_must_have_match_binary', 'language_good2have_count'
 ]
 
+# Quantization of the selected features to pack a feature row into one integer key for score memoization:
+# feature -> (scale, lowest value, bits). round(value * scale) - lowest value needs to fit into the bits
+# (at most 63 bits in total), rows that do not fit are scored without memoization.
+feature_quantization = {
+    'salary_match_binary': (1, 0, 1),
+    'salary_diff': (100, -2**31, 32),
+    'talent_salary_bin': (1, 0, 4),
+    'job_max_salary_bin': (1, 0, 4),
+    'degree_match_binary': (1, 0, 1),
+    'seniority_match_binary': (1, 0, 1),
+    'seniority_exceed_binary': (1, 0, 1),
+    'job_roles_match_binary': (1, 0, 1),
+    'language_must_have_match_binary': (1, 0, 1),
+    'language_good2have_count': (1, 0, 8)
+}
+
+# File name of the job roles vocabulary, saved with the processed data and next to the trained models
+job_roles_vocabulary_file = 'job_roles_vocabulary.json'
+
 # Label column name
 label_column = 'label'
\ No newline at end of file
@@ -1,6 +1,8 @@
 import json
+import os
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Iterator, Optional
 from src.utils.log import log
 
 class BaseDataLoader:
@@ -70,6 +72,131 @@ class JSONDataLoader(BaseDataLoader):
             log.error(f"Error converting data to DataFrame: {e}")
             return None
         
+class StreamingJSONDataLoader(BaseDataLoader):
+    """
+    Streaming data loader for a JSON array of records or JSON lines (one record per line).
+    Records are parsed incrementally and handed out in bounded chunks, so the whole file is never in memory.
+    """
+
+    def __init__(self, file_path: str, chunk_size: int = 100000, block_size: int = 1 << 20):
+        """
+        Init StreamingJSONDataLoader
+
+        Args:
+            file_path (str): The path to the data file.
+            chunk_size (int): Number of records per chunk.
+            block_size (int): Number of characters read from the file at once.
+        """
+        super().__init__(file_path)
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+
+    def is_json_lines(self) -> bool:
+        """
+        Whether the file holds JSON lines rather than a JSON array (it does not start with '[').
+        """
+        with open(self.file_path, 'r') as file:
+            while True:
+                block = file.read(self.block_size)
+                if not block:
+                    return True
+                stripped = block.lstrip()
+                if stripped:
+                    return not stripped.startswith('[')
+
+    def iter_json_lines(self, file) -> Iterator[dict]:
+        """
+        Parse JSON lines, skipping blank lines.
+        """
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+    def iter_json_array(self, file) -> Iterator[dict]:
+        """
+        Parse the elements of a JSON array one by one, reading the file block by block.
+        """
+        decoder = json.JSONDecoder()
+        buffer, position, eof = '', 0, False
+        started = False
+        while True:
+            # Skip whitespace, the opening bracket and the commas between elements
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ',' or
+                                               (not started and buffer[position] == '[')):
+                started = started or buffer[position] == '['
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            if position < len(buffer):
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                    # A value that ends with the buffer might continue in the next block
+                    if end < len(buffer) or eof:
+                        yield record
+                        position = end
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                raise ValueError("Unexpected end of the JSON array.")
+
+            block = file.read(self.block_size)
+            eof = not block
+            buffer = buffer[position:] + block
+            position = 0
+
+    def iter_records(self) -> Iterator[dict]:
+        """
+        Yield the records of the file one by one.
+        """
+        json_lines = self.is_json_lines()
+        with open(self.file_path, 'r') as file:
+            yield from self.iter_json_lines(file) if json_lines else self.iter_json_array(file)
+
+    def iter_record_chunks(self) -> Iterator[list[dict]]:
+        """
+        Yield the records in lists of chunk_size.
+        """
+        chunk = []
+        for record in self.iter_records():
+            chunk.append(record)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        Yield the records in chunks of chunk_size, each normalized into a Pandas DataFrame.
+        """
+        for chunk in self.iter_record_chunks():
+            yield pd.json_normalize(chunk)
+
+    def load_data(self) -> None:
+        """
+        Loads all records (prefer iter_chunks for large files).
+        """
+        try:
+            self.data = list(self.iter_records())
+            log.info("JSON data loaded.")
+        except Exception as e:
+            log.error(f"Error loading JSON data: {e}")
+
+    def to_pandas(self) -> Optional[pd.DataFrame]:
+        """
+        Converts the loaded records to a Pandas DataFrame.
+
+        Returns:
+            Optional[pd.DataFrame]: The converted Pandas DataFrame, or None.
+        """
+        if self.data is None:
+            log.warning("Data not loaded. Please call load_data() first.")
+            return None
+        return pd.json_normalize(self.data)
+
+
 class CSVDataLoader(BaseDataLoader):
     """
     Data loader for CSV files.
@@ -95,4 +222,88 @@ class CSVDataLoader(BaseDataLoader):
         if self.data is None:
             log.warning("Data not loaded. Please call load_data() first.")
             return None
-        return self.data
\ No newline at end of file
+        return self.data
+
+
+class NpyDataLoader(BaseDataLoader):
+    """
+    Data loader for a directory with one .npy file per column (see NpyDataWriter). The columns are
+    memory-mapped, so nothing is parsed and only the pages that are used are read.
+    """
+
+    def __init__(self, file_path: str, mmap: bool = True):
+        """
+        Init NpyDataLoader
+
+        Args:
+            file_path (str): The path to the dataset directory.
+            mmap (bool): Whether to memory-map the columns instead of reading them into memory.
+        """
+        super().__init__(file_path)
+        self.mmap = mmap
+
+    def load_data(self) -> None:
+        """
+        Loads the columns of the dataset.
+        """
+        try:
+            with open(os.path.join(self.file_path, 'schema.json'), 'r') as file:
+                schema = json.load(file)
+            self.data = {}
+            for i, column in enumerate(schema['columns']):
+                values = np.load(os.path.join(self.file_path, f'{i}.npy'), mmap_mode='r' if self.mmap else None)
+                if column['dtype'] == 'category':
+                    values = pd.Categorical.from_codes(values, categories=column['categories'], ordered=column['ordered'])
+                self.data[column['name']] = values
+            log.info("Npy data loaded.")
+        except Exception as e:
+            log.error(f"Error loading npy data: {e}")
+
+    def to_pandas(self) -> Optional[pd.DataFrame]:
+        """
+        Converts the loaded columns to a Pandas DataFrame without copying them: the frame is put together column
+        by column, one block per column, so the memory-mapped columns are not consolidated into new arrays.
+
+        Returns:
+            Optional[pd.DataFrame]: The converted Pandas DataFrame, or None.
+        """
+        if self.data is None:
+            log.warning("Data not loaded. Please call load_data() first.")
+            return None
+        return pd.concat([pd.Series(values, name=name, copy=False) for name, values in self.data.items()], axis=1, copy=False)
+
+
+class ParquetDataLoader(BaseDataLoader):
+    """
+    Data loader for Parquet files (needs pyarrow).
+    """
+
+    def load_data(self) -> None:
+        """
+        Loads data from a Parquet file.
+        """
+        try:
+            self.data = pd.read_parquet(self.file_path, memory_map=True)
+            log.info("Parquet data loaded.")
+        except Exception as e:
+            log.error(f"Error loading Parquet data: {e}")
+
+    def to_pandas(self) -> Optional[pd.DataFrame]:
+        """
+        Returns the loaded Pandas DataFrame.
+
+        Returns:
+            Optional[pd.DataFrame]: The loaded Pandas DataFrame, or None.
+        """
+        if self.data is None:
+            log.warning("Data not loaded. Please call load_data() first.")
+            return None
+        return self.data
+
+
+# Processed data file type -> loader
+data_loaders = {
+    'csv': CSVDataLoader,
+    'npy': NpyDataLoader,
+    'parquet': ParquetDataLoader,
+}
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src.utils.log import log
+
+
+def dataset_path(directory: str, name: str, file_type: str) -> str:
+    """
+    Path of a processed dataset (e.g. X_train) in the given format. The npy format is a directory.
+    """
+    return os.path.join(directory, name if file_type == 'npy' else f'{name}.{file_type}')
+
+
+class BaseDataWriter:
+    """
+    Base class for data writers. Data frames are appended chunk by chunk and the file is finished on close.
+    """
+    def __init__(self, file_path: str):
+        """
+        Init BaseDataWriter
+
+        Args:
+            file_path (str): The path to the data file.
+        """
+        self.file_path = file_path
+        self.rows = 0
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Method to append a chunk.
+
+        Raises:
+            NotImplementedError
+        """
+        raise NotImplementedError("Method not implemented")
+
+    def close(self) -> None:
+        """
+        Finish the file.
+        """
+        log.info(f"{self.rows} rows written to {self.file_path}")
+
+    def __enter__(self) -> "BaseDataWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class CSVDataWriter(BaseDataWriter):
+    """
+    Data writer for CSV files.
+    """
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self.started = False
+
+    def append(self, df: pd.DataFrame) -> None:
+        # The first chunk starts a new file with the header
+        df.to_csv(self.file_path, mode='a' if self.started else 'w', header=not self.started, index=False)
+        self.started = True
+        self.rows += len(df)
+
+
+class NpyDataWriter(BaseDataWriter):
+    """
+    Data writer for a directory with one .npy file per column plus a schema.json with the column order
+    and dtypes. Categorical columns are stored as integer codes with their categories in the schema.
+    The columns can be memory-mapped when loaded (see NpyDataLoader).
+    """
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self.columns = None
+        self.files = {}
+
+    def column_file(self, index: int) -> str:
+        return os.path.join(self.file_path, f'{index}.npy')
+
+    def append(self, df: pd.DataFrame) -> None:
+        if self.columns is None:
+            if os.path.isdir(self.file_path):
+                shutil.rmtree(self.file_path)
+            os.makedirs(self.file_path)
+            self.columns = []
+            for column, dtype in df.dtypes.items():
+                if isinstance(dtype, pd.CategoricalDtype):
+                    self.columns.append({'name': column, 'dtype': 'category', 'categories': dtype.categories.tolist(),
+                                         'ordered': bool(dtype.ordered)})
+                else:
+                    self.columns.append({'name': column, 'dtype': np.dtype(dtype).str})
+            # The column data is appended to raw files, the .npy headers are written on close
+            self.files = {i: open(self.column_file(i) + '.part', 'wb') for i in range(len(self.columns))}
+
+        for i, column in enumerate(self.columns):
+            values = df[column['name']]
+            if column['dtype'] == 'category':
+                # Codes against the categories of the first chunk (new categories are appended)
+                new_categories = [value for value in values.cat.categories.tolist() if value not in column['categories']]
+                column['categories'].extend(new_categories)
+                codes = pd.Categorical(values, categories=column['categories']).codes.astype(np.int32)
+                self.files[i].write(codes.tobytes())
+            else:
+                self.files[i].write(np.ascontiguousarray(values.to_numpy(dtype=np.dtype(column['dtype']))).tobytes())
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self.columns is None:
+            return
+        for i, column in enumerate(self.columns):
+            self.files[i].close()
+            # Categorical codes are stored in the dtype pandas keeps them in, so that they can be used memory-mapped
+            dtype = pd.Categorical([], categories=column['categories']).codes.dtype if column['dtype'] == 'category' \
+                else np.dtype(column['dtype'])
+            with open(self.column_file(i), 'wb') as file, open(self.column_file(i) + '.part', 'rb') as part:
+                np.lib.format.write_array_header_1_0(file, {'descr': dtype.str, 'fortran_order': False, 'shape': (self.rows,)})
+                if column['dtype'] == 'category':
+                    while block := part.read(1 << 22):
+                        file.write(np.frombuffer(block, dtype=np.int32).astype(dtype).tobytes())
+                else:
+                    shutil.copyfileobj(part, file)
+            os.remove(self.column_file(i) + '.part')
+        with open(os.path.join(self.file_path, 'schema.json'), 'w') as file:
+            json.dump({'rows': self.rows, 'columns': self.columns}, file, indent=4)
+        super().close()
+
+
+class ParquetDataWriter(BaseDataWriter):
+    """
+    Data writer for Parquet files (needs pyarrow), every chunk is a row group.
+    """
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self.writer = None
+
+    def append(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.file_path, table.schema)
+        self.writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        super().close()
+
+
+data_writers = {
+    'csv': CSVDataWriter,
+    'npy': NpyDataWriter,
+    'parquet': ParquetDataWriter,
+}
@@ -0,0 +1,166 @@
+"""
+Content-addressed on-disk cache of transformed feature rows for incremental data preparation.
+
+Every raw record is fingerprinted (a hash of its JSON content), and the selected features of the record are
+stored under the fingerprint. On the next run only the records with unknown fingerprints are normalized
+and transformed. The cache lives in a directory named after a hash of feature_settings.py and the
+feature transformer code, so any change there starts a fresh cache.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+from typing import Any
+import numpy as np
+import pandas as pd
+from src.config.feature_settings import selected_features
+from src.data_processing.data_loader import NpyDataLoader
+from src.data_processing.data_writer import NpyDataWriter
+from src.data_processing.feature_transformer.main_transformer import FeatureTransformer
+from src.data_processing.feature_transformer.feature_graph import feature_frame
+from src.utils.log import log
+from src.utils.instrumentation import instrumented, stage
+
+fingerprint_column = 'fingerprint'
+
+
+def feature_code_version() -> str:
+    """
+    A hash of feature_settings.py and of the feature transformer source files.
+    """
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    files = [os.path.join(src_dir, 'config', 'feature_settings.py')]
+    files += sorted(glob.glob(os.path.join(src_dir, 'data_processing', 'feature_transformer', '*.py')))
+    digest = hashlib.blake2b(digest_size=8)
+    for file_path in files:
+        with open(file_path, 'rb') as file:
+            digest.update(os.path.basename(file_path).encode() + b'\0' + file.read())
+    return digest.hexdigest()
+
+
+def record_fingerprints(records: list[dict]) -> np.ndarray:
+    """
+    Fingerprint every record by a hash of its JSON content (dict key order does not matter).
+    """
+    return np.array([
+        hashlib.blake2b(json.dumps(record, sort_keys=True).encode(), digest_size=16).hexdigest().encode()
+        for record in records
+    ], dtype='S32')
+
+
+class FeatureCache:
+    """
+    Cache of the selected features of raw records, keyed by record fingerprint.
+
+    Records are transformed batch by batch with FeatureCache.transform, and all of them (cached or new) are
+    written into a new version of the cache, which replaces the old one on close. So the cache always
+    holds exactly the records of the last complete run: when the run fails (an exception in the with block),
+    the new version is dropped instead.
+    """
+
+    def __init__(self, cache_path: str):
+        """
+        Args:
+            cache_path: Directory of the cache.
+        """
+        self.cache_path = cache_path
+        self.version_path = os.path.join(cache_path, feature_code_version())
+        self.hits = 0
+        self.misses = 0
+
+        # Feature name -> memory-mapped column of the cache, only the rows that are looked up are read
+        self.cached, self.sorted_fingerprints, self.order = None, np.array([], dtype='S32'), np.array([], dtype=np.int64)
+        if os.path.isdir(self.version_path):
+            loader = NpyDataLoader(self.version_path)
+            loader.load_data()
+            if loader.data is not None:
+                fingerprints = np.asarray(loader.data[fingerprint_column])
+                self.order = np.argsort(fingerprints)
+                self.sorted_fingerprints = fingerprints[self.order]
+                self.cached = {feature: loader.data[feature] for feature in selected_features}
+        else:
+            log.info(f"No feature cache for this feature code version at {self.version_path}")
+        self.writer = NpyDataWriter(self.version_path + '.new')
+
+    def lookup(self, fingerprints: np.ndarray) -> np.ndarray:
+        """
+        Row of every fingerprint in the cached features, -1 when it is not cached.
+        """
+        if len(self.sorted_fingerprints) == 0:
+            return np.full(len(fingerprints), -1)
+        position = np.searchsorted(self.sorted_fingerprints, fingerprints).clip(0, len(self.sorted_fingerprints) - 1)
+        found = self.sorted_fingerprints[position] == fingerprints
+        return np.where(found, self.order[position], -1)
+
+    def cached_rows(self, rows: np.ndarray, index: np.ndarray) -> pd.DataFrame:
+        """
+        The cached features at the given rows of the cache, read from the memory-mapped columns.
+        """
+        return pd.DataFrame({feature: values[rows] for feature, values in self.cached.items()}, index=index)
+
+    @instrumented("FeatureCache.transform")
+    def transform(self, records: list[dict[str, Any]], transformer: FeatureTransformer) -> pd.DataFrame:
+        """
+        The selected features of the records, only normalizing and transforming the records that are not cached.
+
+        Args:
+            records: Raw records.
+            transformer: The feature transformer for the new records.
+
+        Returns:
+            DataFrame of the selected features, one row per record in the original order.
+        """
+        fingerprints = record_fingerprints(records)
+        rows = self.lookup(fingerprints)
+        missing = np.flatnonzero(rows < 0)
+        cached = np.flatnonzero(rows >= 0)
+        self.hits += len(cached)
+        self.misses += len(missing)
+
+        parts = []
+        if len(cached):
+            parts.append(self.cached_rows(rows[cached], cached))
+        if len(missing):
+            with stage("json_normalize", rows=len(missing)):
+                new_df = pd.json_normalize([records[i] for i in missing])
+            parts.append(transformer.transform_features(new_df, selected_features).set_axis(missing))
+        if not parts:
+            # No records
+            return feature_frame(np.empty((0, len(selected_features))), selected_features)
+        X = pd.concat(parts).sort_index() if len(parts) > 1 else parts[0]
+        X = X.reset_index(drop=True)
+
+        self.writer.append(X.assign(**{fingerprint_column: fingerprints}))
+        return X
+
+    def close(self) -> None:
+        """
+        Replace the cache by the records of this run, and drop caches of other feature code versions.
+        """
+        self.writer.close()
+        for path in glob.glob(os.path.join(self.cache_path, '*')):
+            if path != self.version_path + '.new' and os.path.isdir(path):
+                shutil.rmtree(path)
+        if os.path.isdir(self.version_path + '.new'):
+            os.rename(self.version_path + '.new', self.version_path)
+        log.info(f"Feature cache: {self.hits} records reused, {self.misses} records transformed")
+
+    def abort(self) -> None:
+        """
+        Drop the new version of the cache after a failed run, the cache of the last complete run is kept.
+        """
+        for file in self.writer.files.values():
+            file.close()
+        shutil.rmtree(self.version_path + '.new', ignore_errors=True)
+        log.warning(f"Feature cache not updated, the run failed: {self.version_path} is kept")
+
+    def __enter__(self) -> "FeatureCache":
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        # Only a complete run replaces the cache
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
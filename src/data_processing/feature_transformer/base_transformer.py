@@ -1,5 +1,8 @@
+from __future__ import annotations
 from abc import abstractmethod
-import pandas as pd
+from src.utils.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
 
 class BaseTransformer:
     """
@@ -0,0 +1,399 @@
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Iterable, Optional
+import numpy as np
+from src.config.feature_settings import selected_features, rating_mapping
+from src.data_processing.feature_transformer.salary_transformer import SalaryTransformer
+from src.data_processing.feature_transformer.degree_transformer import DegreeTransformer
+from src.data_processing.feature_transformer.seniority_transformer import SeniorityTransformer
+from src.data_processing.feature_transformer.job_roles_transformer import JobRolesTransformer
+from src.data_processing.feature_transformer.language_transformer import LanguageTransformer
+from src.data_processing.feature_transformer.encoders import Vocabulary, bitsets_to_csr, pad_columns, offsets_to_rows, issparse, \
+    flatten_lists, encode_unknown_tokens
+from src.data_processing.feature_transformer.feature_graph import FeatureNode, FeaturePlan, output
+from src.utils.instrumentation import instrumented, stage
+from src.utils.log import log
+from src.utils.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+sparse = LazyModule('scipy.sparse')
+
+default_language = [{'title': 'none', 'rating': 'none', 'must_have': False}]
+
+
+def fill_lists(values: pd.Series, default: list) -> list:
+    """
+    Turn a list column into a python list, replacing missing lists with the default.
+    """
+    return [default if value is None else value for value in values]
+
+
+def slice_encoding(encoding: dict[str, Any], index) -> dict[str, Any]:
+    """
+    Select rows (a slice or an index array) from every array of an encoding.
+    """
+    return {name: array[index] for name, array in encoding.items()}
+
+
+def concat_encodings(encodings: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Stack encodings of the same kind (talents or jobs) row-wise. Matrices encoded with older,
+    shorter versions of the shared vocabularies are padded first.
+    """
+    result = {}
+    for name in encodings[0]:
+        arrays = [encoding[name] for encoding in encodings]
+        if arrays[0].ndim == 1:
+            result[name] = np.concatenate(arrays)
+            continue
+        if any(issparse(array) for array in arrays):
+            arrays = [array if issparse(array) else bitsets_to_csr(array) for array in arrays]
+        width = max(array.shape[1] for array in arrays)
+        arrays = [pad_columns(array, width) for array in arrays]
+        result[name] = sparse.vstack(arrays, format='csr') if issparse(arrays[0]) else np.vstack(arrays)
+    return result
+
+
+class CrossFeatureTransformer:
+    """
+    Factorized feature transformation for talent x job cross products.
+
+    Instead of normalizing and transforming every talent/job pair, the talents and the jobs are encoded
+    separately into compact arrays (one row per talent or job), and the pair features are computed by
+    broadcasting talent arrays against job arrays. The features are the same as FeatureTransformer's.
+    """
+
+    def __init__(self, job_roles_vocabulary: Optional[Vocabulary] = None, max_languages: int = 1000,
+                 max_job_roles: int = 10000):
+        """
+        Args:
+            job_roles_vocabulary: The role vocabulary saved with the trained model (optional).
+            max_languages: Maximum size of the shared language vocabulary.
+            max_job_roles: Maximum size of the shared role vocabulary (at least the saved vocabulary).
+        """
+        self.job_roles_transformer = JobRolesTransformer(vocabulary=job_roles_vocabulary)
+        # Append-only vocabularies shared by all encodings, so encodings from different calls can be combined.
+        # Every new token widens the language and role matrices of all later encodings, so the vocabularies are
+        # capped. The languages and roles outside of a full vocabulary are kept with the rows that have them
+        # (the '*_unknown' arrays) and matched by title, so they mean the same as inside it. A full vocabulary
+        # never grows again, so a token is either always or never in it
+        self.language_vocabulary = Vocabulary(max_size=max_languages)
+        job_roles_tokens = self.job_roles_transformer.vocabulary.token_to_index
+        self.job_roles_vocabulary = Vocabulary(job_roles_tokens, max_size=max(max_job_roles, len(job_roles_tokens)))
+        self.lock = threading.Lock()
+        # Feature plans by feature list
+        self.plans = {}
+
+    def update_vocabularies(self, language_titles: Iterable[str], job_roles: Iterable[str]) -> None:
+        """
+        Add the language titles and roles of a batch to the shared vocabularies.
+        """
+        with self.lock:
+            for name, vocabulary, tokens in [('language', self.language_vocabulary, language_titles),
+                                             ('role', self.job_roles_vocabulary, job_roles)]:
+                full = vocabulary.full
+                vocabulary.update(tokens)
+                if vocabulary.full and not full:
+                    log.warning(f"The {name} vocabulary reached its maximum size of {vocabulary.max_size}, "
+                                f"new {name}s are matched by title (slower)")
+
+    def encode_role_lists(self, rows: np.ndarray, roles: list[str], n_rows: int) -> dict[str, Any]:
+        """
+        The role arrays of an encoding from flattened role lists: the role sets over the shared vocabulary, and
+        the roles outside of it.
+        """
+        return {
+            'job_roles': self.job_roles_transformer.encode_job_roles_flat(rows, roles, n_rows, self.job_roles_vocabulary),
+            'job_roles_unknown': encode_unknown_tokens(rows, roles, n_rows, self.job_roles_vocabulary)[0],
+        }
+
+    def encode_talent_language_lists(self, rows: np.ndarray, titles: list[str], ratings: list[str], n_rows: int) -> dict[str, Any]:
+        """
+        The language arrays of a talent encoding from flattened language lists: the rating matrix over the shared
+        vocabulary, and the titles and ratings outside of it.
+        """
+        unknown_titles, unknown_ratings = encode_unknown_tokens(
+            rows, titles, n_rows, self.language_vocabulary, np.array([rating_mapping[rating] for rating in ratings], dtype=np.int8)
+        )
+        return {
+            'languages': LanguageTransformer.encode_talent_languages_flat(rows, titles, ratings, n_rows, self.language_vocabulary),
+            'languages_unknown': unknown_titles,
+            'languages_unknown_rating': unknown_ratings,
+        }
+
+    def encode_job_language_lists(self, rows: np.ndarray, titles: list[str], ratings: list[str], must_have: list[bool],
+                                  n_rows: int) -> dict[str, Any]:
+        """
+        The language arrays of a job encoding from flattened language lists: the required rating matrices over the
+        shared vocabulary, and the titles, ratings and must_have flags outside of it.
+        """
+        must_have_languages, good2have_languages = LanguageTransformer.encode_job_languages_flat(
+            rows, titles, ratings, must_have, n_rows, self.language_vocabulary
+        )
+        unknown_titles, unknown_ratings, unknown_must_have = encode_unknown_tokens(
+            rows, titles, n_rows, self.language_vocabulary, np.array([rating_mapping[rating] for rating in ratings], dtype=np.int8),
+            np.fromiter((bool(value) for value in must_have), dtype=bool, count=len(must_have))
+        )
+        return {
+            'must_have_languages': must_have_languages,
+            'good2have_languages': good2have_languages,
+            'languages_unknown': unknown_titles,
+            'languages_unknown_rating': unknown_ratings,
+            'languages_unknown_must_have': unknown_must_have,
+        }
+
+    @instrumented("CrossFeatureTransformer.encode_talents")
+    def encode_talents(self, df: pd.DataFrame) -> dict[str, Any]:
+        """
+        Encode talents into arrays with one row per talent.
+
+        Args:
+            df: DataFrame of talents with 'talent.*' columns (e.g. pd.json_normalize([{"talent": talent}, ...])).
+
+        Returns:
+            A dict of encoded talent arrays.
+        """
+        salary = df['talent.salary_expectation'].fillna(0).to_numpy(dtype=float)
+        languages = fill_lists(df['talent.languages'], default_language)
+        job_roles = fill_lists(df['talent.job_roles'], ['none'])
+
+        role_rows, roles = flatten_lists(job_roles)
+        language_rows, language_items = flatten_lists(languages)
+        titles = [lang['title'] for lang in language_items]
+
+        self.update_vocabularies(titles, roles)
+        return {
+            'salary': salary,
+            'salary_bin': SalaryTransformer.bin_salaries(salary),
+            'degree': DegreeTransformer.encode_degree(df['talent.degree'].fillna("none")),
+            'seniority': SeniorityTransformer.encode_talent_seniority(df['talent.seniority'].fillna("none")),
+            **self.encode_role_lists(role_rows, roles, len(df)),
+            **self.encode_talent_language_lists(language_rows, titles, [lang['rating'] for lang in language_items], len(df)),
+        }
+
+    @instrumented("CrossFeatureTransformer.encode_jobs")
+    def encode_jobs(self, df: pd.DataFrame) -> dict[str, Any]:
+        """
+        Encode jobs into arrays with one row per job.
+
+        Args:
+            df: DataFrame of jobs with 'job.*' columns (e.g. pd.json_normalize([{"job": job}, ...])).
+
+        Returns:
+            A dict of encoded job arrays.
+        """
+        salary = df['job.max_salary'].fillna(0).to_numpy(dtype=float)
+        languages = fill_lists(df['job.languages'], default_language)
+        job_roles = fill_lists(df['job.job_roles'], ['none'])
+
+        role_rows, roles = flatten_lists(job_roles)
+        language_rows, language_items = flatten_lists(languages)
+        titles = [lang['title'] for lang in language_items]
+
+        self.update_vocabularies(titles, roles)
+        return {
+            'salary': salary,
+            'salary_bin': SalaryTransformer.bin_salaries(salary),
+            'degree': DegreeTransformer.encode_degree(df['job.min_degree'].fillna("none")),
+            'seniority': SeniorityTransformer.encode_job_seniorities(fill_lists(df['job.seniorities'], ['none'])),
+            **self.encode_role_lists(role_rows, roles, len(df)),
+            **self.encode_job_language_lists(language_rows, titles, [lang['rating'] for lang in language_items],
+                                             [lang['must_have'] for lang in language_items], len(df)),
+        }
+
+    @instrumented("CrossFeatureTransformer.encode_talent_columns")
+    def encode_talent_columns(self, columns: dict[str, Any]) -> dict[str, Any]:
+        """
+        Encode talents given as parallel columns (see schemas.TalentColumns), without building a dict per talent.
+
+        Args:
+            columns: talent_id, salary_expectation, degree and seniority lists, plus the offset-encoded list columns
+                job_roles ({"offsets", "values"}) and languages ({"offsets", "title", "rating"}).
+
+        Returns:
+            A dict of encoded talent arrays, the same as encode_talents.
+        """
+        n_rows = len(columns['talent_id'])
+        salary = np.asarray(columns['salary_expectation'], dtype=float)
+        job_roles, languages = columns['job_roles'], columns['languages']
+        role_rows, language_rows = offsets_to_rows(job_roles['offsets']), offsets_to_rows(languages['offsets'])
+
+        self.update_vocabularies(languages['title'], job_roles['values'])
+        return {
+            'salary': salary,
+            'salary_bin': SalaryTransformer.bin_salaries(salary),
+            'degree': DegreeTransformer.encode_degree(columns['degree']),
+            'seniority': SeniorityTransformer.encode_talent_seniority(columns['seniority']),
+            **self.encode_role_lists(role_rows, job_roles['values'], n_rows),
+            **self.encode_talent_language_lists(language_rows, languages['title'], languages['rating'], n_rows),
+        }
+
+    @instrumented("CrossFeatureTransformer.encode_job_columns")
+    def encode_job_columns(self, columns: dict[str, Any]) -> dict[str, Any]:
+        """
+        Encode jobs given as parallel columns (see schemas.JobColumns), without building a dict per job.
+
+        Args:
+            columns: job_id, max_salary and min_degree lists, plus the offset-encoded list columns seniorities and
+                job_roles ({"offsets", "values"}) and languages ({"offsets", "title", "rating", "must_have"}).
+
+        Returns:
+            A dict of encoded job arrays, the same as encode_jobs.
+        """
+        n_rows = len(columns['job_id'])
+        salary = np.asarray(columns['max_salary'], dtype=float)
+        seniorities, job_roles, languages = columns['seniorities'], columns['job_roles'], columns['languages']
+        role_rows, language_rows = offsets_to_rows(job_roles['offsets']), offsets_to_rows(languages['offsets'])
+
+        self.update_vocabularies(languages['title'], job_roles['values'])
+        return {
+            'salary': salary,
+            'salary_bin': SalaryTransformer.bin_salaries(salary),
+            'degree': DegreeTransformer.encode_degree(columns['min_degree']),
+            'seniority': SeniorityTransformer.encode_job_seniorities_flat(
+                offsets_to_rows(seniorities['offsets']), seniorities['values'], n_rows
+            ),
+            **self.encode_role_lists(role_rows, job_roles['values'], n_rows),
+            **self.encode_job_language_lists(language_rows, languages['title'], languages['rating'], languages['must_have'], n_rows),
+        }
+
+    @staticmethod
+    def align_job_roles(talent_roles, job_roles):
+        """
+        Bring talent and job role encodings to the same type and width. They can differ when they were
+        encoded at different times, while the shared vocabulary grew.
+        """
+        if issparse(talent_roles) != issparse(job_roles):
+            talent_roles = talent_roles if issparse(talent_roles) else bitsets_to_csr(talent_roles)
+            job_roles = job_roles if issparse(job_roles) else bitsets_to_csr(job_roles)
+        width = max(talent_roles.shape[1], job_roles.shape[1])
+        return pad_columns(talent_roles, width), pad_columns(job_roles, width)
+
+    def plan(self, features: list[str]) -> FeaturePlan:
+        """
+        The (cached) plan of cross_feature_registry nodes needed for the features.
+        """
+        key = tuple(features)
+        if key not in self.plans:
+            self.plans[key] = FeaturePlan(cross_feature_registry, features)
+        return self.plans[key]
+
+    @staticmethod
+    def sources(talents: dict[str, Any], jobs: dict[str, Any]) -> dict[str, Any]:
+        """
+        The encoded arrays by source name ('talent.*' and 'job.*'), the inputs of cross_feature_registry.
+        """
+        sources = {f'talent.{name}': array for name, array in talents.items()}
+        sources.update((f'job.{name}', array) for name, array in jobs.items())
+        return sources
+
+    def cross_features(self, talents: dict[str, Any], jobs: dict[str, Any], features: list[str] = selected_features) -> dict[str, np.ndarray]:
+        """
+        Compute pair features as (talents x jobs) matrices by broadcasting.
+
+        Args:
+            talents: Encoded talents (see encode_talents).
+            jobs: Encoded jobs (see encode_jobs).
+            features: The features to compute.
+
+        Returns:
+            A dict of feature name -> (talents x jobs) matrix.
+        """
+        values = self.plan(features).compute(self.sources(talents, jobs))
+        return {feature: values[feature] for feature in features}
+
+    def transform(self, talents: dict[str, Any], jobs: dict[str, Any], features: list[str] = selected_features,
+                  as_frame: bool = True) -> pd.DataFrame | np.ndarray:
+        """
+        Build the model input for all talent x job pairs, in talent-major order
+        (the same order as [(talent, job) for talent in talents for job in jobs]).
+        Only the features the model reads (see feature_graph.model_features) need to be computed.
+
+        Args:
+            talents: Encoded talents (see encode_talents).
+            jobs: Encoded jobs (see encode_jobs).
+            features: The features to compute, in model column order.
+            as_frame: Return a DataFrame, or else the bare feature matrix (for the NumPy serving scorers).
+
+        Returns:
+            DataFrame (or matrix) of the features, one row per pair.
+        """
+        n_pairs = len(talents['salary']) * len(jobs['salary'])
+        with stage("CrossFeatureTransformer.transform", rows=n_pairs):
+            X = self.plan(features).matrix(self.sources(talents, jobs), n_pairs)
+        return pd.DataFrame(X, columns=list(features), copy=False) if as_frame else X
+
+
+def outer(pair_fn: Callable) -> Callable:
+    """
+    Apply a vectorized pair function to all talent x job pairs, by broadcasting talent rows against job rows.
+    """
+    def outer_fn(talent_values: np.ndarray, job_values: np.ndarray):
+        return pair_fn(talent_values[:, None], job_values[None, :])
+    return outer_fn
+
+
+def talent_salary_bins(salary_bin: np.ndarray, job_salary: np.ndarray) -> np.ndarray:
+    """
+    The talent salary bins of all talent x job pairs.
+    """
+    return np.broadcast_to(salary_bin[:, None], (len(salary_bin), len(job_salary)))
+
+
+def job_salary_bins(talent_salary: np.ndarray, salary_bin: np.ndarray) -> np.ndarray:
+    """
+    The job salary bins of all talent x job pairs.
+    """
+    return np.broadcast_to(salary_bin[None, :], (len(talent_salary), len(salary_bin)))
+
+
+def job_roles_match(talent_roles, job_roles, talent_unknown: np.ndarray, job_unknown: np.ndarray) -> np.ndarray:
+    """
+    job_roles_match_cross on role encodings brought to the same type and width, plus the matches of the roles
+    outside of the vocabulary.
+    """
+    match = JobRolesTransformer.job_roles_match_cross(*CrossFeatureTransformer.align_job_roles(talent_roles, job_roles))
+    if talent_unknown.size and job_unknown.size:
+        match |= JobRolesTransformer.unknown_roles_match_cross(talent_unknown, job_unknown)
+    return match
+
+
+def language_match(talent_ratings: np.ndarray, must_have: np.ndarray, good2have: np.ndarray, talent_unknown: np.ndarray,
+                   talent_unknown_ratings: np.ndarray, job_unknown: np.ndarray, job_unknown_ratings: np.ndarray,
+                   job_unknown_must_have: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    language_match_cross on rating matrices padded to the same vocabulary width, combined with the languages outside
+    of the vocabulary.
+    """
+    width = max(talent_ratings.shape[1], must_have.shape[1])
+    must_have_match, good2have_count = LanguageTransformer.language_match_cross(
+        pad_columns(talent_ratings, width), pad_columns(must_have, width), pad_columns(good2have, width)
+    )
+    if job_unknown.size:
+        unknown_must_have_match, unknown_good2have_count = LanguageTransformer.unknown_language_match_cross(
+            talent_unknown, talent_unknown_ratings, job_unknown, job_unknown_ratings, job_unknown_must_have
+        )
+        must_have_match &= unknown_must_have_match
+        good2have_count += unknown_good2have_count
+    return must_have_match, good2have_count
+
+
+# The pair features computed from talent and job encodings (see FeaturePlan), the same as FeatureTransformer's
+cross_feature_registry = {
+    'salary_match': FeatureNode(['talent.salary', 'job.salary'], outer(SalaryTransformer.salary_match_arrays)),
+    'salary_match_binary': output('salary_match', 0),
+    'salary_diff': output('salary_match', 1),
+    'talent_salary_bin': FeatureNode(['talent.salary_bin', 'job.salary'], talent_salary_bins),
+    'job_max_salary_bin': FeatureNode(['talent.salary', 'job.salary_bin'], job_salary_bins),
+    'degree_match_binary': FeatureNode(['talent.degree', 'job.degree'], outer(DegreeTransformer.degree_match_arrays)),
+    'seniority_match': FeatureNode(['talent.seniority', 'job.seniority'], outer(SeniorityTransformer.seniority_match_arrays)),
+    'seniority_match_binary': output('seniority_match', 0),
+    'seniority_exceed_binary': output('seniority_match', 1),
+    'job_roles_match_binary': FeatureNode(['talent.job_roles', 'job.job_roles', 'talent.job_roles_unknown', 'job.job_roles_unknown'],
+                                          job_roles_match),
+    'language_match': FeatureNode(['talent.languages', 'job.must_have_languages', 'job.good2have_languages',
+                                   'talent.languages_unknown', 'talent.languages_unknown_rating', 'job.languages_unknown',
+                                   'job.languages_unknown_rating', 'job.languages_unknown_must_have'], language_match),
+    'language_must_have_match_binary': output('language_match', 0),
+    'language_good2have_count': output('language_match', 1),
+}
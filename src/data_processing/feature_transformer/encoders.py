@@ -0,0 +1,245 @@
+"""
+Helpers to encode list-valued raw columns (languages, job roles, ...) into compact NumPy arrays,
+so that the transformers can compute features with whole-column operations instead of row-wise apply.
+"""
+from __future__ import annotations
+import json
+from itertools import chain
+from typing import Iterable, Optional
+import numpy as np
+from src.utils.lazy_imports import LazyModule, is_loaded
+
+pd = LazyModule('pandas')
+sparse = LazyModule('scipy.sparse')
+
+
+class Vocabulary:
+    """
+    A stable token -> index lookup used to encode list columns into arrays.
+    """
+
+    def __init__(self, tokens: Iterable[str] = (), max_size: Optional[int] = None):
+        """
+        Args:
+            tokens: The initial tokens, in index order.
+            max_size: Once the vocabulary has this many tokens, unseen tokens are no longer added (None for no
+                limit), e.g. for a vocabulary that grows with the requests of a server.
+        """
+        self.token_to_index = {}
+        self.max_size = None
+        self.update(tokens)
+        self.max_size = max_size
+
+    def __len__(self) -> int:
+        return len(self.token_to_index)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.token_to_index
+
+    def update(self, tokens: Iterable[str]) -> None:
+        """
+        Add unseen tokens to the end of the vocabulary, existing indices never change. Tokens beyond max_size
+        are not added.
+        """
+        token_to_index = self.token_to_index
+        for token in tokens:
+            if token not in token_to_index:
+                if self.max_size is not None and len(token_to_index) >= self.max_size:
+                    return
+                token_to_index[token] = len(token_to_index)
+
+    @property
+    def full(self) -> bool:
+        return self.max_size is not None and len(self.token_to_index) >= self.max_size
+
+    def extended(self, tokens: Iterable[str]) -> "Vocabulary":
+        """
+        Return a vocabulary that also covers the given tokens. The vocabulary itself is returned when
+        nothing is missing, otherwise a copy is extended, so a persisted vocabulary is never modified.
+        """
+        missing = [token for token in tokens if token not in self.token_to_index]
+        if not missing:
+            return self
+        vocabulary = Vocabulary(self.token_to_index)
+        vocabulary.update(missing)
+        return vocabulary
+
+    def save(self, path: str) -> None:
+        """
+        Save the tokens (in index order) to a JSON file.
+        """
+        with open(path, 'w') as file:
+            json.dump(list(self.token_to_index), file, indent=4)
+
+    @classmethod
+    def load(cls, path: str) -> "Vocabulary":
+        """
+        Load a vocabulary saved by Vocabulary.save.
+        """
+        with open(path, 'r') as file:
+            return cls(json.load(file))
+
+    def indices(self, tokens: list[str], missing: Optional[int] = None) -> np.ndarray:
+        """
+        Look up the indices of the given tokens. Without missing, all of them need to be in the vocabulary,
+        otherwise the tokens that are not get the missing index (e.g. -1).
+        """
+        token_to_index = self.token_to_index
+        if missing is None:
+            return np.fromiter((token_to_index[token] for token in tokens), dtype=np.int64, count=len(tokens))
+        return np.fromiter((token_to_index.get(token, missing) for token in tokens), dtype=np.int64, count=len(tokens))
+
+
+def flatten_lists(column: Iterable[list]) -> tuple[np.ndarray, list]:
+    """
+    Flatten a list-valued column into the row index of every item and the items themselves.
+
+    Args:
+        column: A Series (or any iterable) of lists.
+
+    Returns:
+        The row index of each item and the flat list of items, in the original order.
+    """
+    column = list(column)
+    lengths = np.fromiter((len(items) for items in column), dtype=np.int64, count=len(column))
+    rows = np.repeat(np.arange(len(column)), lengths)
+    return rows, list(chain.from_iterable(column))
+
+
+def offsets_to_rows(offsets) -> np.ndarray:
+    """
+    The row index of every item of an offset-encoded list column, where the items of row i
+    are items[offsets[i]:offsets[i + 1]] (the flat counterpart of flatten_lists).
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def ragged_matrix(rows: np.ndarray, values: np.ndarray, n_rows: int) -> np.ndarray:
+    """
+    Row-aligned (rows x longest row) matrix of the values of every row, padded with zeros ('' for strings).
+    The row indices need to be sorted, as flatten_lists and offsets_to_rows return them.
+    """
+    counts = np.bincount(rows, minlength=n_rows)
+    out = np.zeros((n_rows, counts.max(initial=0)), dtype=values.dtype)
+    positions = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    out[rows, positions] = values
+    return out
+
+
+def encode_unknown_tokens(rows: np.ndarray, tokens: list[str], n_rows: int, vocabulary: Vocabulary,
+                          *values: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    The items of flattened lists whose token is not in a (capped) vocabulary, as ragged matrices (see
+    ragged_matrix), so that they can still be matched exactly: the tokens, each with a leading '+' so that no
+    token equals the '' padding, and the given values of the same items (e.g. language ratings).
+    """
+    unknown = np.fromiter((token not in vocabulary for token in tokens), dtype=bool, count=len(tokens))
+    rows = rows[unknown]
+    unknown_tokens = np.array(['+' + token for token, is_unknown in zip(tokens, unknown) if is_unknown], dtype=str)
+    return (ragged_matrix(rows, unknown_tokens, n_rows),
+            *(ragged_matrix(rows, np.asarray(item_values)[unknown], n_rows) for item_values in values))
+
+
+def scatter_last(shape: tuple[int, int], rows: np.ndarray, cols: np.ndarray, values: np.ndarray, dtype) -> np.ndarray:
+    """
+    Scatter values into a dense zero matrix. When the same (row, col) cell is written several times,
+    the last write wins, the same as building a dict from a list.
+    """
+    out = np.zeros(shape, dtype=dtype)
+    if len(rows) == 0:
+        return out
+    keys = rows * shape[1] + cols
+    _, reversed_first = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - reversed_first
+    out[rows[last], cols[last]] = values[last]
+    return out
+
+
+def encode_bitsets(rows: np.ndarray, cols: np.ndarray, n_rows: int, n_bits: int) -> np.ndarray:
+    """
+    Encode (row, col) memberships into packed bitsets, one row of uint64 words per row.
+    """
+    out = np.zeros((n_rows, max(1, -(-n_bits // 64))), dtype=np.uint64)
+    bits = np.left_shift(np.uint64(1), (cols & 63).astype(np.uint64))
+    np.bitwise_or.at(out, (rows, cols >> 6), bits)
+    return out
+
+
+def encode_csr(rows: np.ndarray, cols: np.ndarray, n_rows: int, n_cols: int) -> sparse.csr_matrix:
+    """
+    Encode (row, col) memberships into a sparse CSR matrix (duplicates are summed).
+    """
+    data = np.ones(len(rows), dtype=np.int32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(n_rows, n_cols))
+
+
+def issparse(matrix) -> bool:
+    """
+    Whether a matrix is a SciPy sparse matrix, without importing SciPy: nothing is sparse before it is loaded.
+    """
+    return is_loaded('scipy.sparse') and sparse.issparse(matrix)
+
+
+def factorize(values: np.ndarray) -> tuple[np.ndarray, list]:
+    """
+    The code of every value and the distinct values: with pandas when it is loaded anyway (the fastest for large
+    columns), else with a dict lookup per value (fine for the request-sized batches of the slim serving path).
+    """
+    if is_loaded('pandas'):
+        codes, uniques = pd.factorize(values)
+        return codes, list(uniques)
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.intp, count=len(values))
+    return codes, list(index)
+
+
+def encode_labels(values, mapping: dict) -> np.ndarray:
+    """
+    Map a column of strings to their integer labels. The column is factorized once, so the mapping is
+    only looked up per distinct value. Values that are not in the mapping get -1.
+    """
+    codes, uniques = factorize(np.asarray(values, dtype=object))
+    table = np.array([mapping.get(value, -1) for value in uniques] + [-1], dtype=np.int8)
+    return table[codes]
+
+
+def encode_label_masks(label_lists, mapping: dict) -> np.ndarray:
+    """
+    Encode lists of strings from a small mapping (at most 8 labels) into uint8 bitmasks, bit i is set
+    when the list contains the value with label i.
+    """
+    rows, items = flatten_lists(label_lists)
+    return encode_label_masks_flat(rows, items, len(label_lists), mapping)
+
+
+def encode_label_masks_flat(rows: np.ndarray, items: list[str], n_rows: int, mapping: dict) -> np.ndarray:
+    """
+    encode_label_masks on flattened lists (the row index of every item and the items).
+    """
+    labels = np.fromiter((mapping[item] for item in items), dtype=np.uint8, count=len(items))
+    masks = np.zeros(n_rows, dtype=np.uint8)
+    np.bitwise_or.at(masks, rows, np.left_shift(np.uint8(1), labels))
+    return masks
+
+
+def bitsets_to_csr(bitsets: np.ndarray) -> sparse.csr_matrix:
+    """
+    Convert packed uint64 bitsets (rows x words) into a CSR matrix (rows x words * 64).
+    """
+    bits = np.unpackbits(np.ascontiguousarray(bitsets, dtype='<u8').view(np.uint8), axis=1, bitorder='little')
+    return sparse.csr_matrix(bits, dtype=np.int32)
+
+
+def pad_columns(matrix, width: int):
+    """
+    Pad a dense or CSR matrix with zero columns ('' for strings) up to the given width, e.g. when it was encoded
+    with an older (shorter) version of an append-only vocabulary.
+    """
+    if matrix.shape[1] >= width:
+        return matrix
+    if issparse(matrix):
+        return sparse.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], width))
+    padded = np.zeros((matrix.shape[0], width), dtype=matrix.dtype)
+    padded[:, :matrix.shape[1]] = matrix
+    return padded
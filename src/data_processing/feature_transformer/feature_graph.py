@@ -0,0 +1,150 @@
+"""
+Declarative feature registry and lazy feature planning.
+
+A registry maps a name to a FeatureNode: the names of its inputs (source columns, or other nodes) and the
+function that computes it from them. A FeaturePlan resolves the nodes a list of features depends on, and
+computes only those, once each, straight into a preallocated (rows x features) matrix. Intermediate
+encodings (e.g. the degree labels) are nodes as well, so they are shared by the features that need them.
+"""
+from __future__ import annotations
+from operator import itemgetter
+from typing import Any, Callable, Mapping, Optional
+import numpy as np
+from src.config.feature_settings import selected_features, salary_labels
+from src.utils.instrumentation import stage
+from src.utils.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+
+# Output dtypes of the features, the same as the columns FeatureTransformer.transform adds
+# (the salary bins are ordered categoricals of salary_labels)
+feature_dtypes = {
+    'salary_diff': np.dtype(float),
+}
+categorical_features = ['talent_salary_bin', 'job_max_salary_bin']
+
+
+class FeatureNode:
+    """
+    A feature (or intermediate encoding) computed from named inputs.
+    """
+
+    def __init__(self, inputs: list[str], compute: Callable):
+        """
+        Args:
+            inputs: Names of the source columns or registry nodes the node is computed from.
+            compute: Function of the input values (in the order of inputs) that returns the node value.
+        """
+        self.inputs = inputs
+        self.compute = compute
+
+
+def output(node: str, index: int) -> FeatureNode:
+    """
+    A node that picks one output of a node that computes several at once (e.g. a match and a diff).
+    """
+    return FeatureNode([node], itemgetter(index))
+
+
+def model_features(model) -> list[str]:
+    """
+    The feature columns a model reads, in model order: the features of a RuleBasedModel, the feature_names
+    of the serving scorers, or the fitted column names of an sklearn estimator. Defaults to all selected features.
+    """
+    for attribute in ['features', 'feature_names', 'feature_names_in_']:
+        features = getattr(model, attribute, None)
+        if features is not None:
+            return list(features)
+    return list(selected_features)
+
+
+def feature_frame(X: np.ndarray, features: list[str], index: Optional[pd.Index] = None) -> pd.DataFrame:
+    """
+    A (rows x features) matrix as a DataFrame with the feature dtypes (int, unless listed in feature_dtypes
+    or categorical_features).
+    """
+    salary_bin_dtype = pd.CategoricalDtype(categories=salary_labels, ordered=True)
+    return pd.DataFrame({
+        feature: pd.Categorical(X[:, i], dtype=salary_bin_dtype)
+        if feature in categorical_features
+        else X[:, i].astype(feature_dtypes.get(feature, np.dtype(int)))
+        for i, feature in enumerate(features)
+    }, index=index)
+
+
+class FeaturePlan:
+    """
+    The nodes of a registry needed for some features, in dependency order.
+    """
+
+    def __init__(self, registry: Mapping[str, FeatureNode], features: list[str]):
+        """
+        Args:
+            registry: Name -> FeatureNode, names that are not in the registry are source columns.
+            features: The features to compute, in output column order.
+        """
+        self.registry = registry
+        self.features = list(features)
+        self.steps = []
+        self.sources = []
+        for feature in self.features:
+            if feature not in registry:
+                raise KeyError(f"Unknown feature: {feature}")
+            self.visit(feature, set())
+
+    def visit(self, name: str, visiting: set) -> None:
+        """
+        Add a node after everything it depends on (depth-first).
+        """
+        if name in self.steps or name in self.sources:
+            return
+        if name not in self.registry:
+            self.sources.append(name)
+            return
+        if name in visiting:
+            raise ValueError(f"Cyclic feature dependency at {name}")
+        visiting.add(name)
+        for input_name in self.registry[name].inputs:
+            self.visit(input_name, visiting)
+        self.steps.append(name)
+
+    def compute(self, sources: Mapping[str, Any]) -> dict[str, Any]:
+        """
+        Compute the planned nodes.
+
+        Args:
+            sources: Source column name -> values (e.g. a DataFrame, or a dict of encoded arrays).
+
+        Returns:
+            A dict of node name -> value, for every planned node.
+        """
+        values = {}
+        for name in self.steps:
+            node = self.registry[name]
+            with stage(f"feature.{name}"):
+                values[name] = node.compute(*(values[i] if i in values else sources[i] for i in node.inputs))
+        return values
+
+    def matrix(self, sources: Mapping[str, Any], n_rows: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Compute the features into a (rows x features) float matrix.
+
+        Args:
+            sources: Source column name -> values.
+            n_rows: Number of output rows, every feature value is flattened to this length.
+            out: Preallocated matrix to fill (optional).
+
+        Returns:
+            The feature matrix.
+        """
+        values = self.compute(sources)
+        X = out if out is not None else np.empty((n_rows, len(self.features)))
+        for i, feature in enumerate(self.features):
+            X[:, i] = np.ravel(values[feature])
+        return X
+
+    def frame(self, sources: Mapping[str, Any], n_rows: int, index: Optional[pd.Index] = None) -> pd.DataFrame:
+        """
+        Compute the features into a DataFrame with the feature dtypes (see feature_frame).
+        """
+        return feature_frame(self.matrix(sources, n_rows), self.features, index)
@@ -1,48 +1,113 @@
-import pandas as pd
+from __future__ import annotations
+from typing import Optional
+import numpy as np
 from src.data_processing.feature_transformer.base_transformer import BaseTransformer
+from src.data_processing.feature_transformer.encoders import Vocabulary, flatten_lists, encode_bitsets, encode_csr, issparse
+from src.utils.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
 
 class JobRolesTransformer(BaseTransformer):
     """
     Job roles-related transformations.
     """
 
+    def __init__(self, vocabulary: Optional[Vocabulary] = None, max_bitset_size: int = 1024):
+        """
+        Args:
+            vocabulary: Role vocabulary persisted with the trained model, so role encodings stay stable
+                between training and serving. Roles that are not in it are appended per batch.
+            max_bitset_size: Largest vocabulary that is encoded as packed uint64 bitsets, larger
+                vocabularies are encoded as CSR sparse matrices.
+        """
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.max_bitset_size = max_bitset_size
+
     @staticmethod
     def job_roles_match(talent_roles, job_roles):
         """
-        Check if there are intersections between talent and job roles.
+        job_roles_match_binary of one talent and job: whether any of the job roles is in the talent's interested
+        job roles (the reference for the encoded versions below).
         """
         return int(bool(set(talent_roles) & set(job_roles)))
-    
-    def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
+
+    @staticmethod
+    def build_vocabulary(df: pd.DataFrame) -> Vocabulary:
         """
-        Handle missing values in roles by filling them with ['none']
+        Build the role vocabulary from both talent and job roles of a (raw) DataFrame.
         """
-        df['talent.job_roles'] = df['talent.job_roles'].apply(lambda x: ['none'] if x is None else x)
-        df['job.job_roles'] = df['job.job_roles'].apply(lambda x: ['none'] if x is None else x)
-        return df
+        vocabulary = Vocabulary(['none'])
+        for column in ['talent.job_roles', 'job.job_roles']:
+            vocabulary.update(role for roles in df[column] if roles is not None for role in roles)
+        return vocabulary
 
-    def transform_job_roles(self, df: pd.DataFrame) -> pd.DataFrame:
+    def batch_vocabulary(self, *role_lists) -> Vocabulary:
+        """
+        The persisted vocabulary, extended with the roles in this batch it has not seen yet.
         """
-        One role feature transformation is made here:
-        1. job_roles_match_binary: see if any of the job roles in the job is in talent's interested job roles.
+        return self.vocabulary.extended(role for roles_list in role_lists for roles in roles_list for role in roles)
 
-        Args:
-            df: DataFrame with the original features to be transformed
+    def encode_job_roles(self, roles, vocabulary: Vocabulary):
+        """
+        Encode role lists into packed uint64 bitsets (rows x words), or into a CSR sparse
+        matrix (rows x vocabulary) when the vocabulary is larger than max_bitset_size.
+        """
+        rows, items = flatten_lists(roles)
+        return self.encode_job_roles_flat(rows, items, len(roles), vocabulary)
+
+    def encode_job_roles_flat(self, rows: np.ndarray, roles: list[str], n_rows: int, vocabulary: Vocabulary):
+        """
+        encode_job_roles on flattened role lists (the row index of every role and the roles). Roles that are not
+        in a (capped) vocabulary are left out (see encoders.encode_unknown_tokens).
+        """
+        cols = vocabulary.indices(roles, missing=-1)
+        if (cols < 0).any():
+            rows, cols = rows[cols >= 0], cols[cols >= 0]
+        if len(vocabulary) > self.max_bitset_size:
+            return encode_csr(rows, cols, n_rows, len(vocabulary))
+        return encode_bitsets(rows, cols, n_rows, len(vocabulary))
+
+    @staticmethod
+    def job_roles_match_arrays(talent_roles, job_roles) -> np.ndarray:
+        """
+        Row-aligned vectorized version of job_roles_match on encoded role sets.
+        """
+        if issparse(talent_roles):
+            return (np.asarray(talent_roles.multiply(job_roles).sum(axis=1)).ravel() > 0).astype(int)
+        return (talent_roles & job_roles).any(axis=1).astype(int)
 
-        Returns:
-            DataFrame with added role-related features.
+    def job_roles_match_lists(self, talent_roles: list[list[str]], job_roles: list[list[str]]) -> np.ndarray:
         """
-        df = df.assign(
-            job_roles_match_binary=lambda df: df.apply(
-                lambda row: self.job_roles_match(row['talent.job_roles'], row['job.job_roles']), axis=1
-            )
-        )
-        return df
+        Row-aligned job_roles_match on role lists: both sides are encoded over the batch vocabulary and intersected.
+        """
+        vocabulary = self.batch_vocabulary(talent_roles, job_roles)
+        return self.job_roles_match_arrays(self.encode_job_roles(talent_roles, vocabulary), self.encode_job_roles(job_roles, vocabulary))
+
+    @staticmethod
+    def job_roles_match_cross(talent_roles, job_roles) -> np.ndarray:
+        """
+        Cross-product version of job_roles_match: a (talents x jobs) matrix of role intersections.
+        Sparse encodings are matched with a single sparse talent x job product, bitsets are
+        AND-ed word by word with broadcasting.
+        """
+        if issparse(talent_roles):
+            return ((talent_roles @ job_roles.T).toarray() > 0).astype(int)
+        match = np.zeros((talent_roles.shape[0], job_roles.shape[0]), dtype=bool)
+        for word in range(talent_roles.shape[1]):
+            match |= (talent_roles[:, word, None] & job_roles[None, :, word]) != 0
+        return match.astype(int)
 
-    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def unknown_roles_match_cross(talent_roles: np.ndarray, job_roles: np.ndarray) -> np.ndarray:
         """
-        Apply all transformations to the DataFrame.
+        job_roles_match_cross for the roles outside of a (capped) vocabulary, given as ragged role matrices
+        (see encoders.encode_unknown_tokens): the roles are compared one job role at a time.
         """
-        df = self.apply_transformation(df, self.handle_missing_values)
-        df = self.apply_transformation(df, self.transform_job_roles)
-        return df
\ No newline at end of file
+        match = np.zeros((talent_roles.shape[0], job_roles.shape[0]), dtype=bool)
+        if talent_roles.size == 0:
+            return match
+        for role in np.unique(job_roles[job_roles != '']):
+            talents = (talent_roles == role).any(axis=1)
+            if talents.any():
+                match |= talents[:, None] & (job_roles == role).any(axis=1)[None, :]
+        return match
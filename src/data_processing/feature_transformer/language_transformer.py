@@ -1,6 +1,9 @@
-import pandas as pd
+from __future__ import annotations
+from typing import Optional
+import numpy as np
 from src.config.feature_settings import rating_mapping
 from src.data_processing.feature_transformer.base_transformer import BaseTransformer
+from src.data_processing.feature_transformer.encoders import Vocabulary, flatten_lists, scatter_last
 
 class LanguageTransformer(BaseTransformer):
     """
@@ -10,7 +13,8 @@ class LanguageTransformer(BaseTransformer):
     @staticmethod
     def must_have_languages_match(talent_languages, job_languages):
         """
-        Check if the must-have languages in the job are in the talent's language pool.
+        language_must_have_match_binary of one talent and job: whether the talent meets the must-have language
+        requirements of the job (the reference for the encoded versions below).
         """
         must_have_dict = {lang['title']: rating_mapping[lang['rating']] for lang in job_languages if lang['must_have']}
         talent_language_dict = {lang['title']: rating_mapping[lang['rating']] for lang in talent_languages}
@@ -23,7 +27,8 @@ class LanguageTransformer(BaseTransformer):
     @staticmethod
     def count_good2have_languages(talent_languages, job_languages):
         """
-        Count how many non-must-have languages are in the talent's language pool.
+        language_good2have_count of one talent and job: how many of the job languages that are not must-have
+        are in the talent's language pool (and meet the requirements).
         """
         good2have_dict = {lang['title']: rating_mapping[lang['rating']] for lang in job_languages if not lang['must_have']}
         talent_language_dict = {lang['title']: rating_mapping[lang['rating']] for lang in talent_languages}
@@ -34,42 +39,132 @@ class LanguageTransformer(BaseTransformer):
                 count += 1
         
         return count
-    
-    def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
+
+    @staticmethod
+    def encode_talent_languages(languages, vocabulary: Vocabulary) -> np.ndarray:
         """
-        Handle missing values in the language lists by filling them with a default dict.
+        Encode the talent language lists into a (rows x vocabulary) rating matrix, 0 means the language is not spoken.
         """
-        default_language = [{'title': 'none', 'rating': 'none', 'must_have': False}]
-        df['talent.languages'] = df['talent.languages'].apply(lambda x: default_language if x is None else x)
-        df['job.languages'] = df['job.languages'].apply(lambda x: default_language if x is None else x)
-        return df
+        rows, items = flatten_lists(languages)
+        return LanguageTransformer.encode_talent_languages_flat(
+            rows, [lang['title'] for lang in items], [lang['rating'] for lang in items], len(languages), vocabulary
+        )
 
-    def transform_language_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def encode_talent_languages_flat(rows: np.ndarray, titles: list[str], ratings: list[str], n_rows: int,
+                                     vocabulary: Vocabulary) -> np.ndarray:
         """
-        Two language feature transformations are made here:
-        1. language_must_have_match_binary: see if the talent meets the must have language requirements in jobs
-        2. language_good2have_count: for those languages in job that are not must have, count how many of them are in talent's language pool (and meet requirements)
-
-        Args:
-            df: DataFrame with the original features to be transformed
+        encode_talent_languages on flattened language lists (row index, title and rating of every language).
+        Languages that are not in a (capped) vocabulary are left out (see encoders.encode_unknown_tokens).
+        """
+        cols = vocabulary.indices(titles, missing=-1)
+        ratings = np.array([rating_mapping[rating] for rating in ratings], dtype=np.int8)
+        known = cols >= 0
+        return scatter_last((n_rows, len(vocabulary)), rows[known], cols[known], ratings[known], np.int8)
 
-        Returns:
-            DataFrame with added language-related features.
-        """
-        df = df.assign(
-            language_must_have_match_binary=lambda df: df.apply(
-                lambda row: self.must_have_languages_match(row['talent.languages'], row['job.languages']), axis=1
-            ),
-            language_good2have_count=lambda df: df.apply(
-                lambda row: self.count_good2have_languages(row['talent.languages'], row['job.languages']), axis=1
-            )
+    @staticmethod
+    def encode_job_languages(languages, vocabulary: Vocabulary) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Encode the job language lists into two (rows x vocabulary) required rating matrices,
+        one for the must-have languages and one for the good-to-have languages, 0 means not required.
+        """
+        rows, items = flatten_lists(languages)
+        return LanguageTransformer.encode_job_languages_flat(
+            rows, [lang['title'] for lang in items], [lang['rating'] for lang in items],
+            [lang['must_have'] for lang in items], len(languages), vocabulary
         )
-        return df
 
-    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def encode_job_languages_flat(rows: np.ndarray, titles: list[str], ratings: list[str], must_have: list[bool], n_rows: int,
+                                  vocabulary: Vocabulary) -> tuple[np.ndarray, np.ndarray]:
+        """
+        encode_job_languages on flattened language lists (row index, title, rating and must_have of every language).
+        Languages that are not in a (capped) vocabulary are left out (see encoders.encode_unknown_tokens).
+        """
+        cols = vocabulary.indices(titles, missing=-1)
+        ratings = np.array([rating_mapping[rating] for rating in ratings], dtype=np.int8)
+        must_have_mask = np.fromiter((bool(value) for value in must_have), dtype=bool, count=len(must_have))
+        known = cols >= 0
+        rows, cols, ratings, must_have_mask = rows[known], cols[known], ratings[known], must_have_mask[known]
+
+        shape = (n_rows, len(vocabulary))
+        must_have = scatter_last(shape, rows[must_have_mask], cols[must_have_mask], ratings[must_have_mask], np.int8)
+        good2have = scatter_last(shape, rows[~must_have_mask], cols[~must_have_mask], ratings[~must_have_mask], np.int8)
+        return must_have, good2have
+
+    @staticmethod
+    def language_match_arrays(talent_ratings: np.ndarray, must_have: np.ndarray, good2have: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized version of must_have_languages_match and count_good2have_languages on encoded rating matrices.
+        The last axis is the language vocabulary, the leading axes broadcast.
+        """
+        must_have_match = ((must_have == 0) | (talent_ratings >= must_have)).all(axis=-1).astype(int)
+        good2have_count = ((good2have > 0) & (talent_ratings >= good2have)).sum(axis=-1).astype(int)
+        return must_have_match, good2have_count
+
+    @staticmethod
+    def language_match_lists(talent_languages: list[list[dict]], job_languages: list[list[dict]]) -> tuple[np.ndarray, np.ndarray]:
         """
-        Apply all transformations to the DataFrame.
+        Row-aligned language_match_arrays on language lists, encoded over a vocabulary of the batch.
+        """
+        vocabulary = Vocabulary(lang['title'] for languages in talent_languages + job_languages for lang in languages)
+        talent_ratings = LanguageTransformer.encode_talent_languages(talent_languages, vocabulary)
+        must_have, good2have = LanguageTransformer.encode_job_languages(job_languages, vocabulary)
+        return LanguageTransformer.language_match_arrays(talent_ratings, must_have, good2have)
+
+    @staticmethod
+    def language_match_cross(talent_ratings: np.ndarray, must_have: np.ndarray, good2have: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Cross-product version of language_match_arrays: (talents x jobs) matrices of the two language features.
+        It loops over the languages that any job requires instead of broadcasting over the whole
+        vocabulary, so memory stays at talents x jobs.
+        """
+        shape = (talent_ratings.shape[0], must_have.shape[0])
+        must_have_match = np.ones(shape, dtype=bool)
+        good2have_count = np.zeros(shape, dtype=int)
+        for language in np.flatnonzero(must_have.any(axis=0)):
+            required = must_have[:, language]
+            must_have_match &= (required == 0) | (talent_ratings[:, language, None] >= required)
+        for language in np.flatnonzero(good2have.any(axis=0)):
+            required = good2have[:, language]
+            good2have_count += (required > 0) & (talent_ratings[:, language, None] >= required)
+        return must_have_match.astype(int), good2have_count
+
+    @staticmethod
+    def last_ratings(titles: np.ndarray, ratings: np.ndarray, title: str, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        The rating of a title in every row of ragged title and rating matrices (the last one when a row has the
+        title several times, the same as building a dict from the list), 0 when a row does not have it.
+        """
+        out = np.zeros(len(titles), dtype=np.int8)
+        for col in range(titles.shape[1]):
+            hit = titles[:, col] == title
+            if mask is not None:
+                hit &= mask[:, col]
+            out[hit] = ratings[hit, col]
+        return out
+
+    @staticmethod
+    def unknown_language_match_cross(talent_titles: np.ndarray, talent_ratings: np.ndarray, job_titles: np.ndarray,
+                                     job_ratings: np.ndarray, job_must_have: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        language_match_cross for the languages outside of a (capped) vocabulary, given as ragged title, rating (and
+        must_have) matrices (see encoders.encode_unknown_tokens): the titles are compared one job language at a time.
+
+        Returns:
+            (talents x jobs) matrices of whether the unknown must-have languages are met, and of the number of
+            unknown good-to-have languages met.
         """
-        df = self.apply_transformation(df, self.handle_missing_values)
-        df = self.apply_transformation(df, self.transform_language_features)
-        return df
\ No newline at end of file
+        shape = (talent_titles.shape[0], job_titles.shape[0])
+        must_have_match = np.ones(shape, dtype=bool)
+        good2have_count = np.zeros(shape, dtype=int)
+        for must_have in [True, False]:
+            selected = (job_must_have == must_have) & (job_titles != '')
+            for title in np.unique(job_titles[selected]):
+                required = LanguageTransformer.last_ratings(job_titles, job_ratings, title, selected)
+                spoken = LanguageTransformer.last_ratings(talent_titles, talent_ratings, title)[:, None]
+                if must_have:
+                    must_have_match &= (required == 0) | (spoken >= required)
+                else:
+                    good2have_count += (required > 0) & (spoken >= required)
+        return must_have_match.astype(int), good2have_count
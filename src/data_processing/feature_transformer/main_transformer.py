@@ -1,26 +1,146 @@
-import pandas as pd
+from __future__ import annotations
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+from src.config.feature_settings import selected_features
 from src.data_processing.feature_transformer.salary_transformer import SalaryTransformer
 from src.data_processing.feature_transformer.degree_transformer import DegreeTransformer
 from src.data_processing.feature_transformer.seniority_transformer import SeniorityTransformer
 from src.data_processing.feature_transformer.job_roles_transformer import JobRolesTransformer
 from src.data_processing.feature_transformer.language_transformer import LanguageTransformer
+from src.data_processing.feature_transformer.cross_transformer import fill_lists, default_language
+from src.data_processing.feature_transformer.encoders import Vocabulary
+from src.data_processing.feature_transformer.feature_graph import FeatureNode, FeaturePlan, output
+from src.utils.instrumentation import instrumented
+from src.utils.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+
+
+def fill_salaries(salary: pd.Series) -> np.ndarray:
+    """
+    Salaries as floats, missing salaries are 0.
+    """
+    return salary.fillna(0).to_numpy(dtype=float)
+
+
+def encode_degrees(degree: pd.Series) -> np.ndarray:
+    """
+    Degree labels (see DegreeTransformer.encode_degree), missing degrees are "none".
+    """
+    return DegreeTransformer.encode_degree(degree.fillna("none"))
+
+
+def encode_talent_seniorities(seniority: pd.Series) -> np.ndarray:
+    """
+    Talent seniority bits (see SeniorityTransformer.encode_talent_seniority), missing seniorities are "none".
+    """
+    return SeniorityTransformer.encode_talent_seniority(seniority.fillna("none"))
+
+
+def encode_job_seniorities(seniorities: pd.Series) -> np.ndarray:
+    """
+    Job seniority masks (see SeniorityTransformer.encode_job_seniorities), missing lists are ["none"].
+    """
+    return SeniorityTransformer.encode_job_seniorities(fill_lists(seniorities, ['none']))
+
+
+def row_feature_registry(job_roles_transformer: JobRolesTransformer) -> dict[str, FeatureNode]:
+    """
+    The features of row-aligned talent/job pairs, computed from the raw 'talent.*' and 'job.*' columns
+    (see FeaturePlan). FeatureTransformer.transform and transform_features compute the features through it.
+    """
+    return {
+        'talent_salary': FeatureNode(['talent.salary_expectation'], fill_salaries),
+        'job_salary': FeatureNode(['job.max_salary'], fill_salaries),
+        'salary_match': FeatureNode(['talent_salary', 'job_salary'], SalaryTransformer.salary_match_arrays),
+        'salary_match_binary': output('salary_match', 0),
+        'salary_diff': output('salary_match', 1),
+        'talent_salary_bin': FeatureNode(['talent_salary'], SalaryTransformer.bin_salaries),
+        'job_max_salary_bin': FeatureNode(['job_salary'], SalaryTransformer.bin_salaries),
+        'talent_degree': FeatureNode(['talent.degree'], encode_degrees),
+        'job_degree': FeatureNode(['job.min_degree'], encode_degrees),
+        'degree_match_binary': FeatureNode(['talent_degree', 'job_degree'], DegreeTransformer.degree_match_arrays),
+        'talent_seniority': FeatureNode(['talent.seniority'], encode_talent_seniorities),
+        'job_seniority': FeatureNode(['job.seniorities'], encode_job_seniorities),
+        'seniority_match': FeatureNode(['talent_seniority', 'job_seniority'], SeniorityTransformer.seniority_match_arrays),
+        'seniority_match_binary': output('seniority_match', 0),
+        'seniority_exceed_binary': output('seniority_match', 1),
+        'talent_job_roles': FeatureNode(['talent.job_roles'], partial(fill_lists, default=['none'])),
+        'job_job_roles': FeatureNode(['job.job_roles'], partial(fill_lists, default=['none'])),
+        'job_roles_match_binary': FeatureNode(['talent_job_roles', 'job_job_roles'], job_roles_transformer.job_roles_match_lists),
+        'talent_languages': FeatureNode(['talent.languages'], partial(fill_lists, default=default_language)),
+        'job_languages': FeatureNode(['job.languages'], partial(fill_lists, default=default_language)),
+        'language_match': FeatureNode(['talent_languages', 'job_languages'], LanguageTransformer.language_match_lists),
+        'language_must_have_match_binary': output('language_match', 0),
+        'language_good2have_count': output('language_match', 1),
+    }
+
 
 class FeatureTransformer:
     """
     Apply all feature transformations.
     """
 
-    def __init__(self):
-        self.salary_transformer = SalaryTransformer()
-        self.degree_transformer = DegreeTransformer()
-        self.seniority_transformer = SeniorityTransformer()
-        self.job_roles_transformer = JobRolesTransformer()
-        self.language_transformer = LanguageTransformer()
+    def __init__(self, job_roles_vocabulary: Optional[Vocabulary] = None, workers: int = 1, min_partition_size: int = 10000):
+        """
+        Args:
+            job_roles_vocabulary: The role vocabulary saved with the processed data / trained model (optional).
+            workers: Number of worker processes, frames are split into row partitions that are transformed in parallel.
+            min_partition_size: Minimum number of rows per partition, smaller frames are transformed in this process.
+        """
+        self.workers = workers
+        self.min_partition_size = min_partition_size
+        self.job_roles_transformer = JobRolesTransformer(vocabulary=job_roles_vocabulary)
+        self.feature_registry = row_feature_registry(self.job_roles_transformer)
 
+    @instrumented("FeatureTransformer.transform")
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = self.salary_transformer.transform(df)
-        df = self.degree_transformer.transform(df)
-        df = self.seniority_transformer.transform(df)
-        df = self.job_roles_transformer.transform(df)
-        df = self.language_transformer.transform(df)
-        return df
\ No newline at end of file
+        """
+        Apply all feature transformations: df with the selected features added, computed through the feature
+        registry (see transform_features).
+        """
+        return pd.concat([df, self.transform_features(df, selected_features)], axis=1)
+
+    def transform_parallel(self, df: pd.DataFrame, transform_fn: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Split the frame into contiguous row partitions, transform them in a process pool and concatenate the
+        results in the original order. Every feature only depends on its own row (the salary bins are fixed,
+        and the job roles match does not depend on the vocabulary order), so the result is identical to
+        transform_fn on the whole frame.
+
+        Args:
+            df: DataFrame with the original features.
+            transform_fn: The transformation of every partition.
+        """
+        n_partitions = min(self.workers, len(df) // self.min_partition_size)
+        bounds = np.linspace(0, len(df), n_partitions + 1).astype(int)
+        partitions = [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=n_partitions) as executor:
+            return pd.concat(list(executor.map(transform_fn, partitions)))
+
+    @instrumented("FeatureTransformer.transform_features")
+    def transform_features(self, df: pd.DataFrame, features: list[str] = selected_features) -> pd.DataFrame:
+        """
+        Compute only the given features (e.g. model_features of the model that is trained or served), in parallel
+        row partitions when there are enough rows for several workers.
+
+        Args:
+            df: DataFrame with the original features, it is not changed.
+            features: The features to compute, in output column order.
+
+        Returns:
+            DataFrame of the features, with the index of df.
+        """
+        if self.workers > 1 and len(df) >= 2 * self.min_partition_size:
+            return self.transform_parallel(df, partial(self.transform_features_partition, features=features))
+        return self.transform_features_partition(df, features)
+
+    def transform_features_partition(self, df: pd.DataFrame, features: list[str] = selected_features) -> pd.DataFrame:
+        """
+        Compute the given features in this process: only the nodes of the feature registry they depend on are
+        computed, from the raw columns into one preallocated matrix, without widening or copying df.
+        """
+        plan = FeaturePlan(self.feature_registry, features)
+        return plan.frame(df, len(df), index=df.index)
@@ -1,4 +1,4 @@
-import pandas as pd
+from __future__ import annotations
 import numpy as np
 from src.config.feature_settings import salary_bins, salary_labels
 from src.data_processing.feature_transformer.base_transformer import BaseTransformer
@@ -8,57 +8,24 @@ class SalaryTransformer(BaseTransformer):
     Salary-related transformations.
     """
 
-    def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def salary_match_arrays(talent_salary: np.ndarray, job_salary: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """
-        Handle missing values in salary by filling them with 0
+        salary_match_binary (the talent's expected salary is at most the max salary of the job) and salary_diff
+        (the +- difference percentage of them) on salary arrays (the arrays broadcast).
         """
-        df['job.max_salary'] = df['job.max_salary'].fillna(0)
-        df['talent.salary_expectation'] = df['talent.salary_expectation'].fillna(0)
-        return df
+        salary_match = (talent_salary <= job_salary).astype(int)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            salary_diff = np.where(job_salary == 0, 0, np.round((job_salary - talent_salary) / job_salary, 2))
+        return salary_match, salary_diff
 
-    def transform_salary_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def bin_salaries(salary: np.ndarray) -> np.ndarray:
         """
-        Two salary feature transformations are made here:
-        1. salary_match_binary: see whether talent's expected salary is below the max salary from the job side
-        2. salary_diff: the +- difference percentage of them
-
-        Args:
-            df: DataFrame with the original features to be transformed
-
-        Returns:
-            DataFrame with added salary-related features.
-        """
-        df = df.assign(
-            salary_match_binary=lambda df: (df['talent.salary_expectation'] <= df['job.max_salary']).astype(int),
-            salary_diff=lambda df: np.where(
-                df['job.max_salary'] == 0,
-                0,
-                round((df['job.max_salary'] - df['talent.salary_expectation']) / df['job.max_salary'], 2)
-            )
-        )
-        return df
-
-    def bin_salary_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Bin salary features into predefined categories for less noise.
-
-        Args:
-            df: DataFrame with the original features to be transformed
-
-        Returns:
-            DataFrame with binned salary features.
-        """
-        df = df.assign(
-            talent_salary_bin=lambda df: pd.cut(df['talent.salary_expectation'], bins=salary_bins, labels=salary_labels, right=False),
-            job_max_salary_bin=lambda df: pd.cut(df['job.max_salary'], bins=salary_bins, labels=salary_labels, right=False)
-        )
-        return df
-
-    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Apply all transformations to the DataFrame.
+        The salary bins of a salary array, the same as pd.cut(salary, bins=salary_bins, labels=salary_labels,
+        right=False): NaN when out of range.
         """
-        df = self.apply_transformation(df, self.handle_missing_values)
-        df = self.apply_transformation(df, self.transform_salary_features)
-        df = self.apply_transformation(df, self.bin_salary_features)
-        return df
\ No newline at end of file
+        bin_index = np.searchsorted(salary_bins, salary, side='right') - 1
+        in_range = (bin_index >= 0) & (bin_index < len(salary_labels))
+        labels = np.asarray(salary_labels, dtype=float)
+        return np.where(in_range, labels[bin_index.clip(0, len(salary_labels) - 1)], np.nan)
@@ -1,65 +1,43 @@
-import pandas as pd
+from __future__ import annotations
+import numpy as np
 from src.config.feature_settings import seniority_mapping
 from src.data_processing.feature_transformer.base_transformer import BaseTransformer
+from src.data_processing.feature_transformer.encoders import encode_labels, encode_label_masks, encode_label_masks_flat
 
 class SeniorityTransformer(BaseTransformer):
     """
     Seniority-related transformations.
     """
 
-    def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def encode_talent_seniority(seniority) -> np.ndarray:
         """
-        Handle missing values in seniority by filling them with "none" or ["none"]
+        Encode the talent seniority as a one-hot bit (1 << label), 0 for an unknown seniority.
         """
-        df['talent.seniority'] = df['talent.seniority'].fillna("none")
-        df['job.seniorities'] = df['job.seniorities'].apply(lambda x: ['none'] if x is None else x)
-        return df
+        labels = encode_labels(seniority, seniority_mapping)
+        return np.where(labels >= 0, np.left_shift(1, labels.clip(0)), 0).astype(np.uint8)
 
-    def transform_seniority_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def encode_job_seniorities(seniorities) -> np.ndarray:
         """
-        Map seniority string to labels to easier processing.
-
-        Args:
-            df: DataFrame with the original features to be transformed
-
-        Returns:
-            DataFrame with transformed seniority labels.
+        Encode the job seniority lists as bitmasks, bit i is set when the job accepts seniority label i.
         """
-        df = df.assign(
-            talent_seniority_label=lambda df: df['talent.seniority'].map(seniority_mapping),
-            job_seniority_labels=lambda df: df['job.seniorities'].apply(
-                lambda x: [seniority_mapping[seniority] for seniority in x]
-            )
-        )
-        return df
+        return encode_label_masks(seniorities, seniority_mapping)
 
-    def transform_seniority_match(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def encode_job_seniorities_flat(rows: np.ndarray, seniorities: list[str], n_rows: int) -> np.ndarray:
         """
-        Two seniority feature transformations are made here:
-        1. seniority_match_binary: see whether the talent's seniority is with the job seniority
-        2. seniority_exceed_binary: see whether the talent's seniority is above the job seniority
-
-        Args:
-            df: DataFrame with the original features to be transformed
-
-        Returns:
-            DataFrame with added seniority-related features.
+        encode_job_seniorities on flattened seniority lists (the row index of every seniority and the seniorities).
         """
-        df = df.assign(
-            seniority_match_binary=lambda df: df.apply(
-                lambda row: int(row['talent_seniority_label'] in row['job_seniority_labels']), axis=1
-            ),
-            seniority_exceed_binary=lambda df: df.apply(
-                lambda row: int(all(row['talent_seniority_label'] > label for label in row['job_seniority_labels'])), axis=1
-            )
-        )
-        return df
+        return encode_label_masks_flat(rows, seniorities, n_rows, seniority_mapping)
 
-    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def seniority_match_arrays(talent_bits: np.ndarray, job_masks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """
-        Apply all transformations to the DataFrame.
+        seniority_match_binary and seniority_exceed_binary on encoded bits and masks (the arrays broadcast):
+        the talent matches when its bit is in the job mask, and exceeds when its bit is above
+        the highest bit of the job mask (trivially true for an empty job mask).
         """
-        df = self.apply_transformation(df, self.handle_missing_values)
-        df = self.apply_transformation(df, self.transform_seniority_features)
-        df = self.apply_transformation(df, self.transform_seniority_match)
-        return df
\ No newline at end of file
+        seniority_match = ((talent_bits & job_masks) != 0).astype(int)
+        seniority_exceed = ((talent_bits > job_masks) | (job_masks == 0)).astype(int)
+        return seniority_match, seniority_exceed
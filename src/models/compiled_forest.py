@@ -0,0 +1,215 @@
+import json
+import math
+import os
+import numpy as np
+from src.utils.lazy_imports import LazyModule, is_loaded
+from src.utils.log import log
+
+pd = LazyModule('pandas')
+
+
+class CompiledForest:
+    """
+    Array-backed inference engine for a trained random forest.
+
+    All trees are flattened into contiguous node arrays (split feature, threshold, children and
+    leaf class probabilities) and a batch of rows is pushed through all trees at once, level by level,
+    so labels and scores come from a single vectorized pass. The arrays are saved as one .npy file each,
+    so they can be memory-mapped when loaded.
+
+    Rows are only compared with the split thresholds, so two rows whose values fall between the same
+    thresholds of every feature end in the same leaves. Large batches are reduced to one row per such
+    threshold bin before the traversal, and the probabilities are copied back to all rows.
+    """
+
+    # Artifact directory name, saved alongside the trained model
+    artifact_file = 'compiled_forest'
+    array_names = ['feature', 'threshold', 'children', 'value', 'roots', 'classes', 'missing_go_right']
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray, value: np.ndarray,
+                 roots: np.ndarray, classes: np.ndarray, feature_names: list[str], max_depth: int,
+                 missing_go_right: np.ndarray, batch_size: int = 2048):
+        """
+        Args:
+            feature: Split feature of every node (0 for leaves).
+            threshold: float32 split threshold of every node, rows with feature <= threshold go left.
+            children: Left and right child of every node, interleaved (node * 2 + go_right), leaves point to themselves.
+            value: Class probabilities of every node (n_nodes x n_classes).
+            roots: Root node of every tree.
+            classes: The class labels.
+            feature_names: The trained feature order.
+            max_depth: Depth of the deepest tree.
+            missing_go_right: Whether rows with a NaN split feature go right at every node (sklearn stores where
+                the missing values went in training, or the child with more samples if there were none).
+            batch_size: Number of rows pushed through the trees at once.
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.feature_names = list(feature_names)
+        self.max_depth = max_depth
+        self.missing_go_right = missing_go_right
+        self.batch_size = batch_size
+        # The distinct split thresholds of every feature, and the stride of every feature in the bin keys
+        # (None when the number of bins of all features does not fit into an int64 key)
+        is_leaf = children[0::2] == np.arange(len(feature))
+        self.split_values = [np.unique(threshold[(feature == index) & ~is_leaf]) for index in range(len(self.feature_names))]
+        # A bin per interval between the thresholds, and one for NaN
+        bins = [len(values) + 2 for values in self.split_values]
+        self.bin_strides = np.cumprod([1] + bins[:-1], dtype=np.int64) if math.prod(bins) < 2 ** 63 else None
+
+    @classmethod
+    def from_model(cls, model) -> "CompiledForest":
+        """
+        Compile a trained RandomForestModel (or a fitted sklearn RandomForestClassifier).
+        """
+        # sklearn is only needed to compile a model, not to serve a compiled forest
+        from sklearn.ensemble import RandomForestClassifier
+        from .base_model import BaseModel
+        estimator = model.model if isinstance(model, BaseModel) else model
+        if not isinstance(estimator, RandomForestClassifier):
+            raise ValueError("Only random forest models can be compiled.")
+
+        feature, threshold, children, value, roots, missing_go_right = [], [], [], [], [], []
+        offset = 0
+        for tree_estimator in estimator.estimators_:
+            tree = tree_estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            children.append(np.column_stack([
+                np.where(is_leaf, node_ids, tree.children_left),
+                np.where(is_leaf, node_ids, tree.children_right)
+            ]).ravel() + offset)
+            missing_go_right.append(~is_leaf & (tree.missing_go_to_left == 0))
+            # Same leaf probabilities as DecisionTreeClassifier.predict_proba
+            node_value = tree.value[:, 0, :]
+            normalizer = node_value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value.append(node_value / normalizer)
+            offset += tree.node_count
+
+        # sklearn compares float32 features with float64 thresholds. For a float32 x, x <= t holds exactly
+        # when x <= the largest float32 not above t, so the thresholds can be stored as float32
+        threshold = np.concatenate(threshold)
+        threshold32 = threshold.astype(np.float32)
+        threshold32 = np.where(threshold32 > threshold, np.nextafter(threshold32, np.float32(-np.inf)), threshold32)
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=threshold32.astype(np.float32),
+            children=np.concatenate(children).astype(np.int32),
+            value=np.concatenate(value).astype(np.float64),
+            roots=np.array(roots, dtype=np.int32),
+            classes=np.asarray(estimator.classes_),
+            feature_names=estimator.feature_names_in_,
+            max_depth=max(tree_estimator.tree_.max_depth for tree_estimator in estimator.estimators_),
+            missing_go_right=np.concatenate(missing_go_right)
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Save the compiled forest into a directory, one .npy file per array plus a small json with the metadata.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in self.array_names:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'metadata.json'), 'w') as file:
+            json.dump({'feature_names': self.feature_names, 'max_depth': self.max_depth}, file, indent=4)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledForest":
+        """
+        Load a compiled forest saved by CompiledForest.save.
+
+        Args:
+            path: The artifact directory.
+            mmap: Whether to memory-map the arrays instead of reading them into memory.
+        """
+        names = cls.array_names
+        if not os.path.exists(os.path.join(path, 'missing_go_right.npy')):
+            # Exported before the NaN directions were, NaN values go left at every node
+            log.warning(f"The compiled forest at {path} has no NaN split directions, export it again")
+            names = [name for name in names if name != 'missing_go_right']
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None) for name in names}
+        arrays.setdefault('missing_go_right', np.zeros(len(arrays['feature']), dtype=bool))
+        with open(os.path.join(path, 'metadata.json'), 'r') as file:
+            metadata = json.load(file)
+        return cls(**arrays, **metadata)
+
+    def to_matrix(self, X) -> np.ndarray:
+        """
+        Feature matrix in the trained feature order, as float32 like the sklearn trees use.
+        """
+        if is_loaded('pandas') and isinstance(X, pd.DataFrame):
+            X = X[self.feature_names].to_numpy(dtype=np.float32)
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Leaf node of every row in every tree (rows x trees), traversing all trees at once.
+
+        Args:
+            X: float32 feature matrix in the trained feature order.
+        """
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.int32) * n_features, n_trees)
+        has_nan = np.isnan(X).any()
+        X = X.ravel()
+        for _ in range(self.max_depth):
+            values = X[row_offsets + self.feature[nodes]]
+            go_right = values > self.threshold[nodes]
+            if has_nan:
+                go_right |= np.isnan(values) & self.missing_go_right[nodes]
+            nodes = self.children[(nodes << 1) + go_right]
+        return nodes.reshape(n_rows, n_trees)
+
+    def bin_keys(self, X: np.ndarray) -> np.ndarray:
+        """
+        Threshold bin of every row (see the class docstring), as one int64 key per row.
+
+        Args:
+            X: float32 feature matrix in the trained feature order.
+        """
+        keys = np.zeros(len(X), dtype=np.int64)
+        for index, (values, stride) in enumerate(zip(self.split_values, self.bin_strides)):
+            column = X[:, index]
+            # Number of thresholds below the value: the row goes right at exactly these splits
+            bins = np.searchsorted(values, column)
+            bins[np.isnan(column)] = len(values) + 1
+            keys += bins * stride
+        return keys
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Class probabilities, averaged over the trees (summed in tree order, the same as sklearn).
+        """
+        X = self.to_matrix(X)
+        if self.bin_strides is not None and len(X) > self.batch_size:
+            _, first, inverse = np.unique(self.bin_keys(X), return_index=True, return_inverse=True)
+            if len(first) < len(X):
+                return self.predict_proba(X[first])[inverse]
+        proba = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), self.batch_size):
+            leaves = self.apply(X[start:start + self.batch_size])
+            # Reducing over the leading (tree) axis adds the trees one after another
+            proba[start:start + len(leaves)] = np.add.reduce(self.value[leaves.T], axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict_with_scores(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the labels and the scores (probability of the positive class) in one pass.
+        """
+        proba = self.predict_proba(X)
+        return self.classes[proba.argmax(axis=1)], proba[:, 1]
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_with_scores(X)[0]
@@ -0,0 +1,83 @@
+import numpy as np
+from src.utils.lazy_imports import LazyModule, is_loaded
+
+pd = LazyModule('pandas')
+
+
+class LogisticRegressionScorer:
+    """
+    NumPy serving scorer for a trained logistic regression.
+
+    Only the coefficients, the intercept, the feature order and the classes are kept (in a small .npz artifact),
+    and labels and scores come from a single X @ w + b on a contiguous float64 matrix, instead of evaluating
+    the sklearn model twice (predict and predict_proba) with its input validation. Like sklearn, the labels come
+    from the sign of the decision function and the scores from its sigmoid, in float64, so both are the same
+    as sklearn's.
+    """
+
+    # Artifact file name, saved alongside the trained model
+    artifact_file = 'numpy_scorer.npz'
+
+    def __init__(self, coef: np.ndarray, intercept: float, feature_names: list[str], classes: np.ndarray, threshold: float = 0.5):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = np.float64(intercept)
+        self.feature_names = list(feature_names)
+        self.classes = np.asarray(classes)
+        self.threshold = threshold
+        # The decision value of the score threshold (0 for 0.5, as in sklearn's predict)
+        self.decision_threshold = np.log(threshold / (1 - threshold))
+
+    @classmethod
+    def from_model(cls, model) -> "LogisticRegressionScorer":
+        """
+        Build the scorer from a trained LogisticRegressionModel (or a fitted sklearn LogisticRegression).
+        """
+        # sklearn is only needed to export a model, not to serve the scorer
+        from sklearn.linear_model import LogisticRegression
+        from .base_model import BaseModel
+        estimator = model.model if isinstance(model, BaseModel) else model
+        if not isinstance(estimator, LogisticRegression) or len(estimator.classes_) != 2:
+            raise ValueError("Only binary logistic regression models can be exported.")
+        return cls(estimator.coef_[0], estimator.intercept_[0], estimator.feature_names_in_, estimator.classes_)
+
+    def save(self, path: str) -> None:
+        """
+        Save the scorer as a compact .npz artifact.
+        """
+        np.savez(path, coef=self.coef, intercept=self.intercept, feature_names=np.array(self.feature_names),
+                 classes=self.classes, threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path: str) -> "LogisticRegressionScorer":
+        """
+        Load a scorer saved by LogisticRegressionScorer.save.
+        """
+        with np.load(path) as artifact:
+            return cls(artifact['coef'], artifact['intercept'], artifact['feature_names'].tolist(),
+                       artifact['classes'], float(artifact['threshold']))
+
+    def to_matrix(self, X) -> np.ndarray:
+        """
+        Contiguous float64 feature matrix in the trained feature order.
+        """
+        if is_loaded('pandas') and isinstance(X, pd.DataFrame):
+            X = X[self.feature_names].to_numpy(dtype=np.float64)
+        return np.ascontiguousarray(X, dtype=np.float64)
+
+    def predict_with_scores(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the labels and the scores (probability of the positive class) in one pass.
+        """
+        decision = self.to_matrix(X) @ self.coef + self.intercept
+        with np.errstate(over='ignore'):
+            scores = 1 / (1 + np.exp(-decision))
+        # Not from the scores: near the threshold, the sigmoid can round to it
+        labels = self.classes[(decision > self.decision_threshold).astype(int)]
+        return labels, scores
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_with_scores(X)[0]
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores = self.predict_with_scores(X)[1]
+        return np.column_stack([1 - scores, scores])
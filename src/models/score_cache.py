@@ -0,0 +1,255 @@
+import glob
+import hashlib
+import os
+import threading
+from typing import Optional
+import numpy as np
+from src.config.feature_settings import selected_features, feature_quantization
+from src.utils.config_utils import get_artifact_path
+from src.utils.instrumentation import stage
+from src.utils.lazy_imports import LazyModule, is_loaded
+from src.utils.log import log
+
+pd = LazyModule('pandas')
+
+
+def artifact_hash(path: str) -> Optional[str]:
+    """
+    A hash of the content of a model artifact (a file, or all files of a directory), None when it does not exist.
+    """
+    files = [os.path.join(root, name) for root, _, names in sorted(os.walk(path)) for name in sorted(names)] \
+        if os.path.isdir(path) else [path]
+    digest = hashlib.blake2b(digest_size=8)
+    try:
+        for file_path in files:
+            with open(file_path, 'rb') as file:
+                digest.update(os.path.relpath(file_path, path).encode() + b'\0' + file.read())
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def score_cache_path(model_save_path: str, artifact_path: str) -> Optional[str]:
+    """
+    Where the score table of a model artifact is saved: next to the model, named after the artifact hash
+    (e.g. artifacts/trained_models/xxx_model_score_cache_<hash>.npz), None when the artifact does not exist.
+    """
+    digest = artifact_hash(artifact_path)
+    return get_artifact_path(model_save_path, f'score_cache_{digest}.npz') if digest is not None else None
+
+
+class ScoreCache:
+    """
+    Score memoization between the feature transformation and a loaded model.
+
+    The selected features are binary flags, small bins and counts, and a salary_diff rounded to 2 decimals,
+    so only few distinct feature rows show up in practice. Every row is packed into one integer key, the batch
+    is deduplicated with np.unique, only unseen rows are scored by the model, and the results are scattered back.
+    Scores are kept in a key -> (label, score) table for as long as the model is loaded. With a path (see
+    score_cache_path), the table is loaded from there and saved back when the model is unloaded, so it outlives
+    restarts. The path is keyed by the hash of the model artifact, so a retrained model starts a new table.
+    """
+
+    def __init__(self, model, max_entries: int = 1000000, feature_names: list[str] = selected_features,
+                 quantization: dict[str, tuple[int, int, int]] = feature_quantization, path: Optional[str] = None):
+        """
+        Args:
+            model: The loaded model.
+            max_entries: Maximum size of the key -> score table, it is cleared when it gets full.
+            feature_names: The feature columns, in model order.
+            quantization: feature -> (scale, lowest value, bits), see feature_settings.feature_quantization.
+            path: File the table is loaded from and saved to (None keeps it in memory only).
+        """
+        self.model = model
+        self.max_entries = max_entries
+        self.feature_names = list(feature_names)
+        self.scales = np.array([quantization[name][0] for name in self.feature_names], dtype=float)
+        self.lows = np.array([quantization[name][1] for name in self.feature_names], dtype=np.int64)
+        bits = np.array([quantization[name][2] for name in self.feature_names], dtype=np.int64)
+        if bits.sum() > 63:
+            raise ValueError("The feature quantization needs more than 63 bits.")
+        self.limits = np.left_shift(1, bits)
+        self.shifts = np.concatenate([[0], np.cumsum(bits)[:-1]])
+        self.table = {}
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.scored_rows = 0
+        self.path = path
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def pack(self, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Pack feature rows into integer keys.
+
+        Args:
+            values: Feature matrix (rows x features) in feature_names order.
+
+        Returns:
+            The keys, and a mask of the rows that could be packed exactly.
+        """
+        with np.errstate(invalid='ignore'):
+            scaled = values * self.scales
+            quantized = np.round(scaled)
+            packable = (quantized / self.scales == values).all(axis=1)
+            codes = np.where(packable[:, None], quantized, 0).astype(np.int64) - self.lows
+        packable &= ((codes >= 0) & (codes < self.limits)).all(axis=1)
+        keys = (np.where(packable[:, None], codes, 0) << self.shifts).sum(axis=1)
+        return keys, packable
+
+    def unpack(self, keys: np.ndarray) -> np.ndarray:
+        """
+        The feature rows (rows x features) of packed keys, the inverse of pack.
+        """
+        codes = (keys[:, None] >> self.shifts) & (self.limits - 1)
+        return (codes + self.lows) / self.scales
+
+    def layout(self) -> dict[str, np.ndarray]:
+        """
+        How the keys are packed, saved with the table and compared when it is loaded.
+        """
+        return {'feature_names': np.array(self.feature_names), 'scales': self.scales, 'lows': self.lows, 'limits': self.limits}
+
+    def load(self) -> None:
+        """
+        Load the table saved at path, unless its keys are packed differently.
+        """
+        try:
+            with np.load(self.path) as saved:
+                if not all(np.array_equal(saved[name], value) for name, value in self.layout().items()):
+                    log.warning(f"Score cache at {self.path} has a different feature quantization, not loaded")
+                    return
+                keys, labels, scores = saved['keys'], saved['labels'], saved['scores']
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Failed to load the score cache at {self.path}: {e}")
+            return
+        n = min(len(keys), self.max_entries)
+        with self.lock:
+            self.table.update(zip(keys[:n].tolist(), zip(labels[:n].tolist(), scores[:n].tolist())))
+        log.info(f"Loaded {n} score cache entries from {self.path}")
+
+    def save(self) -> None:
+        """
+        Save the table to path (replacing it atomically), and remove the tables of other artifacts of the model.
+        """
+        if self.path is None:
+            return
+        with self.lock:
+            keys = np.fromiter(self.table, dtype=np.int64, count=len(self.table))
+            values = list(self.table.values())
+        labels = np.array([label for label, _ in values])
+        scores = np.array([score for _, score in values], dtype=float)
+        temporary_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, keys=keys, labels=labels, scores=scores, **self.layout())
+        os.replace(temporary_path, self.path)
+        prefix = self.path[:self.path.rindex('score_cache_')]
+        for path in glob.glob(f'{prefix}score_cache_*.npz'):
+            if path != self.path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    # Removed by another process saving its table at the same time
+                    pass
+
+    def warm(self, other: "ScoreCache") -> int:
+        """
+        Score the feature rows in the table of another score cache (e.g. of the model this one replaces) with this
+        model, so that the rows seen so far are hits right away. The hit counters are not changed.
+
+        Returns:
+            The number of rows scored, 0 when the caches pack their keys differently.
+        """
+        if other.feature_names != self.feature_names or not (
+                np.array_equal(other.scales, self.scales) and np.array_equal(other.lows, self.lows)
+                and np.array_equal(other.limits, self.limits)):
+            return 0
+        with other.lock:
+            keys = np.fromiter(other.table, dtype=np.int64, count=len(other.table))
+        keys = keys[:self.max_entries]
+        if len(keys) == 0:
+            return 0
+        X = self.unpack(keys)
+        if not hasattr(self.model, 'to_matrix'):
+            # Only the NumPy serving scorers take bare feature matrices
+            X = pd.DataFrame(X, columns=self.feature_names)
+        labels, scores = self.score_rows(X, np.arange(len(keys)))
+        with self.lock:
+            self.table.update(zip(keys.tolist(), zip(labels.tolist(), scores.tolist())))
+        return len(keys)
+
+    def score_rows(self, X, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score some rows of X with the model.
+        """
+        X_rows = X.iloc[rows] if is_loaded('pandas') and isinstance(X, pd.DataFrame) else X[rows]
+        if hasattr(self.model, 'predict_with_scores'):
+            with stage("model.predict_with_scores", rows=len(rows)):
+                return self.model.predict_with_scores(X_rows)
+        with stage("model.predict", rows=len(rows)):
+            labels = np.asarray(self.model.predict(X_rows))
+        with stage("model.predict_proba", rows=len(rows)):
+            scores = self.model.predict_proba(X_rows)[:, 1]
+        return labels, scores
+
+    def predict_with_scores(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the labels and the scores, only scoring the distinct rows that are not in the table yet.
+        """
+        values = X[self.feature_names].to_numpy(dtype=float) if is_loaded('pandas') and isinstance(X, pd.DataFrame) \
+            else np.asarray(X, dtype=float)
+        keys, packable = self.pack(values)
+        packable_rows = np.flatnonzero(packable)
+        unique_keys, first, inverse = np.unique(keys[packable_rows], return_index=True, return_inverse=True)
+
+        unique_labels, unique_scores, missing = [None] * len(unique_keys), np.empty(len(unique_keys)), []
+        for i, key in enumerate(unique_keys.tolist()):
+            hit = self.table.get(key)
+            if hit is None:
+                missing.append(i)
+            else:
+                unique_labels[i], unique_scores[i] = hit
+        if missing:
+            missing_labels, missing_scores = self.score_rows(X, packable_rows[first[missing]])
+            with self.lock:
+                if len(self.table) + len(missing) > self.max_entries:
+                    self.table.clear()
+                for i, label, score in zip(missing, missing_labels.tolist(), missing_scores.tolist()):
+                    unique_labels[i], unique_scores[i] = label, score
+                    self.table[unique_keys[i].item()] = (label, score)
+
+        self.rows += len(values)
+        self.scored_rows += len(missing)
+        labels = np.asarray(unique_labels)[inverse]
+        scores = unique_scores[inverse]
+        if len(packable_rows) == len(values):
+            return labels, scores
+
+        # Rows that do not fit the quantization are scored directly
+        other_rows = np.flatnonzero(~packable)
+        other_labels, other_scores = self.score_rows(X, other_rows)
+        self.scored_rows += len(other_rows)
+        all_labels = np.empty(len(values), dtype=np.result_type(labels, other_labels))
+        all_scores = np.empty(len(values))
+        all_labels[packable_rows], all_scores[packable_rows] = labels, scores
+        all_labels[other_rows], all_scores[other_rows] = other_labels, other_scores
+        return all_labels, all_scores
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_with_scores(X)[0]
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores = self.predict_with_scores(X)[1]
+        return np.column_stack([1 - scores, scores])
+
+    def stats(self) -> dict:
+        """
+        Table size and how many of the rows had to be scored by the model.
+        """
+        return {
+            "size": len(self.table),
+            "max_entries": self.max_entries,
+            "rows": self.rows,
+            "scored_rows": self.scored_rows,
+            "hit_ratio": 1 - self.scored_rows / self.rows if self.rows else 0.0
+        }
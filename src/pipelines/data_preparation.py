@@ -1,54 +1,214 @@
 """
 This pipeline defines how we read the raw data and transform features and then split it into training and testing dataset.
 """
+from contextlib import nullcontext
 import os
+from typing import Optional
+import numpy as np
+import pandas as pd
 from sklearn.model_selection import train_test_split
-from src.data_processing.data_loader import JSONDataLoader
+from src.data_processing.data_loader import JSONDataLoader, StreamingJSONDataLoader
+from src.data_processing.data_writer import data_writers, dataset_path
+from src.data_processing.feature_cache import FeatureCache
 from src.data_processing.feature_transformer.main_transformer import FeatureTransformer
-from src.config.feature_settings import selected_features, label_column
+from src.data_processing.feature_transformer.job_roles_transformer import JobRolesTransformer
+from src.data_processing.feature_transformer.encoders import Vocabulary
+from src.config.feature_settings import selected_features, label_column, job_roles_vocabulary_file
 from src.utils.log import log
+from src.utils import instrumentation
+from src.utils.instrumentation import stage, traced
 from src.utils.config_utils import load_yaml_config
 
 
-def prepare_data(config_path: str) -> None:
+def job_roles_frame(records: list[dict]) -> pd.DataFrame:
+    """
+    The talent and job roles of raw records, enough to build the job roles vocabulary without normalizing the records.
+    """
+    return pd.DataFrame({
+        f'{side}.job_roles': [record.get(side, {}).get('job_roles') for record in records]
+        for side in ['talent', 'job']
+    })
+
+
+def record_labels(records: list[dict]) -> pd.Series:
+    """
+    The labels of raw records (label_column is a dotted path into the record, as after json_normalize).
+    """
+    labels = []
+    for record in records:
+        value = record
+        for key in label_column.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        labels.append(value)
+    return pd.Series(labels, name=label_column)
+
+
+def prepare_data(config_path: str, workers: Optional[int] = None) -> None:
     """Prepare data for training and testing. First load the raw data, then apply feture transformation,
     then split it into training and testing, and save them.
 
+    With feature_cache_path in the config, the selected features of every record are cached on disk by
+    record content (see FeatureCache), and a rerun only transforms the new or changed records. With
+    instrumentation in the config, the time (and with trace_memory the allocated memory) of every stage is logged.
+
     Args:
         config_path: Path to the configuration YAML file.
+        workers: Number of processes for the feature transformation (default: transform_workers of the config, or 1).
     """
     data_config = load_yaml_config(config_path)
     raw_data_path = data_config['raw_data_path']
     processed_data_save_path = data_config['processed_data_save_path']
-    
+    file_type = data_config.get('processed_data_format', 'csv')
+    workers = workers or data_config.get('transform_workers', 1)
+    feature_cache_path = data_config.get('feature_cache_path')
+    if file_type not in data_writers:
+        raise ValueError(f"Unsupported processed data format: {file_type}")
+    instrumentation.configure(data_config.get('instrumentation', False), memory=data_config.get('trace_memory', False))
+    if data_config.get('chunk_size'):
+        prepare_data_in_chunks(raw_data_path, processed_data_save_path, data_config['chunk_size'], file_type, workers,
+                               feature_cache_path)
+    else:
+        prepare_data_at_once(raw_data_path, processed_data_save_path, file_type, workers, feature_cache_path)
+
+
+@traced("prepare_data")
+def prepare_data_at_once(raw_data_path: str, processed_data_save_path: str, file_type: str = 'csv', workers: int = 1,
+                         feature_cache_path: Optional[str] = None) -> None:
+    """
+    Prepare data for training and testing with all records in memory (see prepare_data).
+
+    Args:
+        raw_data_path: Path to the raw data file.
+        processed_data_save_path: Directory of the prepared datasets.
+        file_type: Format of the prepared datasets (see data_writer.data_writers).
+        workers: Number of processes for the feature transformation.
+        feature_cache_path: Directory of the feature cache (see FeatureCache), only new or changed records are transformed.
+    """
     log.info(f"Loading data from {raw_data_path}")
     json_data_loader = JSONDataLoader(raw_data_path)
-    json_data_loader.load_data()
+    with stage("load_data"):
+        json_data_loader.load_data()
     log.info("Data loaded successfully")
-    log.info(f"Converting it to pandas")
-    raw_data_df = json_data_loader.to_pandas()
-    
-    if raw_data_df is not None:
-        transformer = FeatureTransformer()
-        log.info("Transform features")
-        transformed_data = transformer.transform(raw_data_df)
+
+    if feature_cache_path and json_data_loader.data is not None:
+        records = json_data_loader.data
+        log.info("Building job roles vocabulary")
+        job_roles_vocabulary = JobRolesTransformer.build_vocabulary(job_roles_frame(records))
+        log.info(f"Job roles vocabulary size: {len(job_roles_vocabulary)}")
+
+        transformer = FeatureTransformer(job_roles_vocabulary=job_roles_vocabulary, workers=workers)
+        log.info(f"Transform features of new records with {workers} worker(s), cache at {feature_cache_path}")
+        with FeatureCache(feature_cache_path) as feature_cache:
+            X = feature_cache.transform(records, transformer)
+        Y = record_labels(records)
+    else:
+        log.info(f"Converting it to pandas")
+        with stage("json_normalize"):
+            raw_data_df = json_data_loader.to_pandas()
+        if raw_data_df is None:
+            log.error("Failed to load data")
+            return
+
+        log.info("Building job roles vocabulary")
+        job_roles_vocabulary = JobRolesTransformer.build_vocabulary(raw_data_df)
+        log.info(f"Job roles vocabulary size: {len(job_roles_vocabulary)}")
+
+        transformer = FeatureTransformer(job_roles_vocabulary=job_roles_vocabulary, workers=workers)
+        log.info(f"Transform features with {workers} worker(s)")
+        X = transformer.transform_features(raw_data_df, selected_features)
         log.info("Feature transformation done")
-        log.info(f"Transformed data shape: {transformed_data.shape}")
-        
-        X = transformed_data[selected_features]
         Y = raw_data_df[label_column]
-        log.info(f"Selected features shape: {X.shape}")
-        log.info(f"Label shape: {Y.shape}")
-        
-        log.info("Splitting the data into training and testing")
+    log.info(f"Selected features shape: {X.shape}")
+    log.info(f"Label shape: {Y.shape}")
+
+    log.info("Splitting the data into training and testing")
+    with stage("train_test_split", rows=len(X)):
         X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, random_state=42)
-        
-        log.info("Saving training and testing data")
-        os.makedirs(processed_data_save_path, exist_ok=True)
-        X_train.to_csv(os.path.join(processed_data_save_path, 'X_train.csv'), index=False)
-        X_test.to_csv(os.path.join(processed_data_save_path, 'X_test.csv'), index=False)
-        Y_train.to_csv(os.path.join(processed_data_save_path, 'Y_train.csv'), index=False)
-        Y_test.to_csv(os.path.join(processed_data_save_path, 'Y_test.csv'), index=False)
-        log.info(f"Training and testing datasets saved to {processed_data_save_path}")
-    else:
-        log.error("Failed to load data")
\ No newline at end of file
+
+    log.info("Saving training and testing data")
+    os.makedirs(processed_data_save_path, exist_ok=True)
+    for name, data in [('X_train', X_train), ('X_test', X_test), ('Y_train', Y_train.to_frame()), ('Y_test', Y_test.to_frame())]:
+        with stage("write", rows=len(data)), data_writers[file_type](dataset_path(processed_data_save_path, name, file_type)) as writer:
+            writer.append(data)
+    job_roles_vocabulary.save(os.path.join(processed_data_save_path, job_roles_vocabulary_file))
+    log.info(f"Training and testing datasets saved to {processed_data_save_path}")
+
+
+def test_split_mask(record_index: np.ndarray, test_size: float = 0.2, seed: int = 42) -> np.ndarray:
+    """
+    Deterministic train/test assignment by record position: every record index is hashed (splitmix64)
+    into [0, 1) and the record goes to the test set below test_size. The assignment of a record does not
+    depend on the other records, so it is the same for any chunk size.
+
+    Args:
+        record_index: Positions of the records in the raw data.
+        test_size: Fraction of the records in the test set.
+        seed: Seed of the hash.
+
+    Returns:
+        Boolean mask of the test records.
+    """
+    with np.errstate(over='ignore'):
+        z = record_index.astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+
+@traced("prepare_data")
+def prepare_data_in_chunks(raw_data_path: str, processed_data_save_path: str, chunk_size: int, file_type: str = 'csv',
+                           workers: int = 1, feature_cache_path: Optional[str] = None) -> None:
+    """
+    Prepare data for training and testing chunk by chunk: the raw data (a JSON array or JSON lines) is parsed
+    incrementally, and every chunk of records is normalized, transformed, split and appended to the outputs
+    on its own, so the memory stays bounded by the chunk size. The train/test split is by record position
+    (see test_split_mask), so the outputs are the same for any chunk size.
+
+    Args:
+        raw_data_path: Path to the raw data file.
+        processed_data_save_path: Directory of the prepared datasets.
+        chunk_size: Number of records per chunk.
+        file_type: Format of the prepared datasets (see data_writer.data_writers).
+        workers: Number of processes for the feature transformation of every chunk.
+        feature_cache_path: Directory of the feature cache (see FeatureCache), only new or changed records are transformed.
+    """
+    log.info(f"Streaming data from {raw_data_path} in chunks of {chunk_size} records")
+    loader = StreamingJSONDataLoader(raw_data_path, chunk_size=chunk_size)
+    os.makedirs(processed_data_save_path, exist_ok=True)
+
+    # The vocabulary grows chunk by chunk, the transformer holds on to the same object
+    job_roles_vocabulary = Vocabulary(['none'])
+    transformer = FeatureTransformer(job_roles_vocabulary=job_roles_vocabulary, workers=workers)
+    writers = {
+        name: data_writers[file_type](dataset_path(processed_data_save_path, name, file_type))
+        for name in ['X_train', 'X_test', 'Y_train', 'Y_test']
+    }
+    # A failed run leaves the feature cache of the last complete run in place
+    with FeatureCache(feature_cache_path) if feature_cache_path else nullcontext() as feature_cache:
+        n_records = 0
+        for records in loader.iter_record_chunks():
+            if feature_cache is not None:
+                job_roles_vocabulary.update(JobRolesTransformer.build_vocabulary(job_roles_frame(records)).token_to_index)
+                X = feature_cache.transform(records, transformer)
+                Y = record_labels(records)
+            else:
+                with stage("json_normalize", rows=len(records)):
+                    chunk_df = pd.json_normalize(records)
+                job_roles_vocabulary.update(JobRolesTransformer.build_vocabulary(chunk_df).token_to_index)
+                X = transformer.transform_features(chunk_df, selected_features)
+                Y = chunk_df[label_column]
+
+            test = test_split_mask(np.arange(n_records, n_records + len(records)))
+            parts = {'X_train': X[~test], 'X_test': X[test], 'Y_train': Y[~test].to_frame(), 'Y_test': Y[test].to_frame()}
+            for name, writer in writers.items():
+                with stage("write", rows=len(parts[name])):
+                    writer.append(parts[name])
+            n_records += len(records)
+            log.info(f"Prepared {n_records} records")
+
+        for writer in writers.values():
+            writer.close()
+    job_roles_vocabulary.save(os.path.join(processed_data_save_path, job_roles_vocabulary_file))
+    log.info(f"Job roles vocabulary size: {len(job_roles_vocabulary)}")
+    log.info(f"Training and testing datasets saved to {processed_data_save_path}")
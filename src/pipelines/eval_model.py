@@ -8,42 +8,44 @@ from src.models.logistic_regression_model import LogisticRegressionModel
 from src.models.random_forest_model import RandomForestModel
 from src.models.rule_based_model import RuleBasedModel
 from src.evaluation.evaluator import BinaryClassificationEvaluator
-from src.data_processing.data_loader import CSVDataLoader
+from src.data_processing.data_loader import data_loaders
+from src.data_processing.data_writer import dataset_path
 from src.utils.config_utils import load_yaml_config
 from src.utils.log import log
 
-def load_data(config_path: str, file_type: str = 'csv'):
+def load_data(config_path: str, file_type: str = None):
     """
     Load the processed data for both training and testing.
 
     Args:
         config_path: Path to the data config YAML file to read the location of the processed data.
-        file_type: Type of the data file (default: 'csv').
+        file_type: Type of the data files, 'csv', 'npy' or 'parquet' (default: processed_data_format of the data config, or 'csv').
 
     Returns:
         X_train, X_test, y_train, y_test: Training and testing data.
     """
     data_config = load_yaml_config(config_path)
     processed_data_save_path = data_config['processed_data_save_path']
+    file_type = file_type or data_config.get('processed_data_format', 'csv')
 
-    if file_type == 'csv':
-        loader = CSVDataLoader
+    if file_type in data_loaders:
+        loader = data_loaders[file_type]
     else:
-        raise ValueError("Only csv file is currently supported")
+        raise ValueError(f"Unsupported file type: {file_type}")
 
-    X_train_loader = loader(os.path.join(processed_data_save_path, 'X_train.' + file_type))
+    X_train_loader = loader(dataset_path(processed_data_save_path, 'X_train', file_type))
     X_train_loader.load_data()
     X_train = X_train_loader.to_pandas()
 
-    X_test_loader = loader(os.path.join(processed_data_save_path, 'X_test.' + file_type))
+    X_test_loader = loader(dataset_path(processed_data_save_path, 'X_test', file_type))
     X_test_loader.load_data()
     X_test = X_test_loader.to_pandas()
 
-    y_train_loader = loader(os.path.join(processed_data_save_path, 'Y_train.' + file_type))
+    y_train_loader = loader(dataset_path(processed_data_save_path, 'Y_train', file_type))
     y_train_loader.load_data()
     y_train = y_train_loader.to_pandas()
 
-    y_test_loader = loader(os.path.join(processed_data_save_path, 'Y_test.' + file_type))
+    y_test_loader = loader(dataset_path(processed_data_save_path, 'Y_test', file_type))
     y_test_loader.load_data()
     y_test = y_test_loader.to_pandas()
 
@@ -0,0 +1,34 @@
+"""
+This pipeline defines how we export trained models to compact NumPy serving artifacts.
+"""
+import joblib
+from src.models.logistic_regression_scorer import LogisticRegressionScorer
+from src.models.compiled_forest import CompiledForest
+from src.utils.config_utils import load_yaml_config, get_artifact_path
+from src.utils.log import log
+
+
+def export_model(model_config_path: str):
+    """
+    Export a trained model to its NumPy serving artifact (saved alongside the model),
+    which is used by the API when the model config has `serving_backend: numpy`.
+
+    Args:
+        model_config_path: Path to the model configuration YAML file.
+    """
+    model_config = load_yaml_config(model_config_path)
+    model_type = model_config['model_type']
+    model_save_path = model_config['model_save_path']
+
+    if model_type == 'logistic_regression':
+        scorer = LogisticRegressionScorer.from_model(joblib.load(model_save_path))
+        export_path = get_artifact_path(model_save_path, LogisticRegressionScorer.artifact_file)
+        scorer.save(export_path)
+    elif model_type == 'random_forest':
+        compiled_forest = CompiledForest.from_model(joblib.load(model_save_path))
+        export_path = get_artifact_path(model_save_path, CompiledForest.artifact_file)
+        compiled_forest.save(export_path)
+    else:
+        raise ValueError(f"Model type {model_type} can not be exported.")
+
+    log.info(f"{model_type} model exported to {export_path}.")
@@ -2,38 +2,43 @@
 This pipeline defines how we train and save the models.
 """
 import os
+import shutil
 import joblib
 from src.models.logistic_regression_model import LogisticRegressionModel
 from src.models.random_forest_model import RandomForestModel
 from src.models.rule_based_model import RuleBasedModel
-from src.data_processing.data_loader import CSVDataLoader
-from src.utils.config_utils import load_yaml_config
+from src.pipelines.export_model import export_model
+from src.data_processing.data_loader import data_loaders
+from src.data_processing.data_writer import dataset_path
+from src.config.feature_settings import job_roles_vocabulary_file
+from src.utils.config_utils import load_yaml_config, get_artifact_path
 from src.utils.log import log
 
-def load_data(config_path: str, file_type: str = 'csv'):
+def load_data(config_path: str, file_type: str = None):
     """
     Load the processed data for training.
 
     Args:
         config_path: Path to the data config YAML file to read the location of the processed data.
-        file_type: Type of the data file (default: 'csv').
+        file_type: Type of the data files, 'csv', 'npy' or 'parquet' (default: processed_data_format of the data config, or 'csv').
 
     Returns:
         X_train, y_train: Training data.
     """
     data_config = load_yaml_config(config_path)
     processed_data_save_path = data_config['processed_data_save_path']
+    file_type = file_type or data_config.get('processed_data_format', 'csv')
 
-    if file_type == 'csv':
-        loader = CSVDataLoader
+    if file_type in data_loaders:
+        loader = data_loaders[file_type]
     else:
-        raise ValueError("Only csv file is currently supported")
+        raise ValueError(f"Unsupported file type: {file_type}")
 
-    X_train_loader = loader(os.path.join(processed_data_save_path, 'X_train.' + file_type))
+    X_train_loader = loader(dataset_path(processed_data_save_path, 'X_train', file_type))
     X_train_loader.load_data()
     X_train = X_train_loader.to_pandas()
 
-    y_train_loader = loader(os.path.join(processed_data_save_path, 'Y_train.' + file_type))
+    y_train_loader = loader(dataset_path(processed_data_save_path, 'Y_train', file_type))
     y_train_loader.load_data()
     y_train = y_train_loader.to_pandas()
 
@@ -73,6 +78,17 @@ def train_model(data_config_path: str, model_config_path: str):
         os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
         joblib.dump(model, model_save_path)
         log.info(f"{model_type} model trained and saved to {model_save_path}.")
+
+        # Keep the job roles vocabulary alongside the model, so the role encoding is stable when serving it
+        data_config = load_yaml_config(data_config_path)
+        vocabulary_path = os.path.join(data_config['processed_data_save_path'], job_roles_vocabulary_file)
+        if os.path.exists(vocabulary_path):
+            vocabulary_save_path = get_artifact_path(model_save_path, job_roles_vocabulary_file)
+            shutil.copyfile(vocabulary_path, vocabulary_save_path)
+            log.info(f"Job roles vocabulary saved to {vocabulary_save_path}.")
+
+        if model_type in ('logistic_regression', 'random_forest'):
+            export_model(model_config_path)
     else:
         log.info(f"{model_type} model does not require training and is not saved.")
 
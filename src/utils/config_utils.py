@@ -1,3 +1,4 @@
+import os
 import yaml
 
 def load_yaml_config(config_path: str) -> dict:
@@ -11,4 +12,17 @@ def load_yaml_config(config_path: str) -> dict:
     """
     with open(config_path, 'r') as file:
         config = yaml.safe_load(file)
-    return config
\ No newline at end of file
+    return config
+
+def get_artifact_path(model_save_path: str, file_name: str) -> str:
+    """Get the path of an extra artifact that is saved alongside a trained model,
+    e.g. artifacts/trained_models/xxx_model.pkl -> artifacts/trained_models/xxx_model_<file_name>.
+
+    Args:
+        model_save_path: Path of the trained model.
+        file_name: File name of the extra artifact.
+
+    Returns:
+        The artifact path.
+    """
+    return f"{os.path.splitext(model_save_path)[0]}_{file_name}"
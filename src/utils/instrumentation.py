@@ -0,0 +1,197 @@
+"""
+Optional per-stage instrumentation: wall time, rows processed and allocated memory of pipeline stages.
+
+Stages are marked with `with stage("name", rows=...)` blocks or the `@instrumented("name")` decorator. While
+instrumentation is disabled (the default) a stage is a shared no-op object, so the overhead is one function
+call and one flag check. When it is enabled, the stages of a unit of work (an API request, a data preparation
+run) are collected into the active Trace, which is summarized per stage name into a structured log record
+(and, in the API, a Server-Timing header). Stages outside of a trace are logged one by one.
+The stage names in use are listed in the README (e.g. `feature.<name>` for every feature registry node).
+"""
+import functools
+import time
+import tracemalloc
+from contextvars import ContextVar
+from typing import Callable, Optional
+from src.utils.log import log_record
+
+enabled = False
+trace_memory = False
+
+# The trace of the current request (context variables are copied into the threads FastAPI runs endpoints in)
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+def configure(enable: bool, memory: bool = False) -> None:
+    """
+    Enable or disable the instrumentation.
+
+    Args:
+        enable: Whether to record stages.
+        memory: Whether to record the allocated memory per stage as well (starts tracemalloc, which slows down
+            allocations noticeably, so it is meant for profiling runs).
+    """
+    global enabled, trace_memory
+    enabled = enable
+    trace_memory = enable and memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+class Trace:
+    """
+    The stage records of one unit of work.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.records = []
+        self.depth = 0
+        self.start = time.perf_counter()
+
+    def summary(self) -> list[dict]:
+        """
+        The records aggregated by stage name (in order of first occurrence): calls, total milliseconds, rows
+        and allocated bytes (when the memory is traced).
+        """
+        stages = {}
+        for record in self.records:
+            summary = stages.setdefault(record['stage'], {'stage': record['stage'], 'depth': record['depth'], 'calls': 0, 'ms': 0.0})
+            summary['calls'] += 1
+            summary['ms'] += record['ms']
+            for key in ['rows', 'allocated']:
+                if record.get(key) is not None:
+                    summary[key] = summary.get(key, 0) + record[key]
+        for summary in stages.values():
+            summary['ms'] = round(summary['ms'], 3)
+        return list(stages.values())
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def log(self, **fields) -> None:
+        """
+        Log the summary as one structured "stages" record.
+        """
+        log_record("stages", trace=self.name, total_ms=round(self.elapsed_ms(), 3), stages=self.summary(), **fields)
+
+    def __enter__(self) -> "Trace":
+        self.token = current_trace.set(self)
+        return self
+
+    def __exit__(self, *args) -> None:
+        current_trace.reset(self.token)
+
+
+class Stage:
+    """
+    Context manager that records one stage into the active trace.
+    """
+
+    def __init__(self, name: str, rows: Optional[int] = None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self) -> "Stage":
+        self.trace = current_trace.get()
+        if self.trace is not None:
+            self.depth = self.trace.depth
+            self.trace.depth += 1
+        self.memory = tracemalloc.get_traced_memory()[0] if trace_memory else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        record = {'stage': self.name, 'ms': (time.perf_counter() - self.start) * 1000, 'rows': self.rows}
+        if self.memory is not None:
+            record['allocated'] = tracemalloc.get_traced_memory()[0] - self.memory
+        if self.trace is None:
+            log_record("stage", **record)
+            return
+        self.trace.depth -= 1
+        record['depth'] = self.depth
+        self.trace.records.append(record)
+
+
+class NullStage:
+    """
+    The stage while the instrumentation is disabled.
+    """
+    rows = None
+
+    def __enter__(self) -> "NullStage":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+null_stage = NullStage()
+
+
+def stage(name: str, rows: Optional[int] = None):
+    """
+    A stage to time with a with-block. The rows can also be set on the stage inside the block.
+    """
+    return Stage(name, rows) if enabled else null_stage
+
+
+def trace(name: str) -> Optional[Trace]:
+    """
+    A new trace to collect the stages of a with-block, None while the instrumentation is disabled.
+    """
+    return Trace(name) if enabled else None
+
+
+def instrumented(name: str) -> Callable:
+    """
+    Decorator that records every call of a function (or method) as a stage. The rows are the length
+    of the first argument after self, when it has one (e.g. the DataFrame of a transform method).
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            data = args[1] if len(args) > 1 else None
+            with Stage(name, rows=len(data) if hasattr(data, '__len__') and not isinstance(data, dict) else None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator that collects the stages of every call of a function into a trace, and logs its summary
+    (for runs outside of the API, e.g. the data preparation).
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with Trace(name) as run_trace:
+                result = fn(*args, **kwargs)
+            run_trace.log()
+            return result
+        return wrapper
+    return decorator
+
+
+def server_timing(trace: Trace) -> str:
+    """
+    Server-Timing header value of a trace: every stage with its total duration, rows and calls, the time outside
+    of the top-level stages (request parsing and validation, response serialization), and the total time.
+    """
+    entries = []
+    summaries = trace.summary()
+    for summary in summaries:
+        desc = f"calls={summary['calls']}" + (f" rows={summary['rows']}" if 'rows' in summary else '')
+        entries.append(f'{summary["stage"]};dur={summary["ms"]};desc="{desc}"')
+    total = trace.elapsed_ms()
+    stages = sum(summary['ms'] for summary in summaries if summary['depth'] == 0)
+    entries.append(f'io;dur={round(max(total - stages, 0), 3)};desc="parsing, validation and serialization"')
+    entries.append(f'total;dur={round(total, 3)}')
+    return ', '.join(entries)
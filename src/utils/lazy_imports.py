@@ -0,0 +1,41 @@
+"""
+Lazily imported modules, so that importing the serving code does not pay for pandas and SciPy (and the API
+worker is ready sooner) when the slim serving path never needs them.
+
+`pd = LazyModule('pandas')` behaves like `import pandas as pd`, except that pandas is only imported on the first
+attribute access. Modules that use one in annotations need `from __future__ import annotations`, so that the
+annotations are not evaluated at import time, and type checks against a lazy module should check is_loaded first.
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    """
+    A module that is imported on first attribute access.
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: The full module name, e.g. 'scipy.sparse'.
+        """
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute: str):
+        # Only called for attributes the proxy itself does not have
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}'>"
+
+
+def is_loaded(name: str) -> bool:
+    """
+    Whether a module has been imported (by anyone), e.g. to skip a type check against a module that is not loaded:
+    no object can be an instance of one of its classes then.
+    """
+    return name in sys.modules
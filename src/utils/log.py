@@ -2,9 +2,21 @@
 logging settings
 """
 
+import json
 import logging
 
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s [%(threadName)s][%(levelname)-5.5s]  %(message)s"
                     )
 log = logging.getLogger()
+
+
+def log_record(event: str, **fields) -> None:
+    """
+    Log a structured record: the event name and its fields as one JSON object.
+
+    Args:
+        event: Name of the event, e.g. "stages".
+        fields: JSON serializable fields of the record.
+    """
+    log.info(json.dumps({"event": event, **fields}, default=str))
@@ -0,0 +1,59 @@
+"""
+Randomized raw talents and jobs for the equivalence tests, with the edge cases of the feature engines: duplicate list
+items, empty and missing lists, unknown degrees and seniorities, and salaries outside of the salary bins.
+"""
+import random
+from typing import Optional
+from src.config.feature_settings import degree_mapping, rating_mapping, seniority_mapping
+
+languages = ['German', 'English', 'French', 'Spanish', 'Italian', 'Polish', 'Dutch', 'Turkish']
+job_roles = ['backend-developer', 'data-scientist', 'designer', 'copywriter', 'sales-manager', 'recruiter', 'none']
+# Around and outside the salary bins: negative, 0, the bin edges and above the last edge
+salaries = [-1000, 0, 1, 49999, 50000, 50001, 60000, 79999.5, 119999, 120000, 10 ** 9]
+
+
+def pick(rng: random.Random, values: list, max_items: int) -> list:
+    """
+    A random list of values, with duplicates.
+    """
+    return [rng.choice(values) for _ in range(rng.randint(0, max_items))]
+
+
+def salary(rng: random.Random, missing: bool) -> Optional[float]:
+    """
+    A random salary, often one of the edge cases. With missing, it can be None.
+    """
+    if missing and rng.random() < 0.1:
+        return None
+    return rng.choice(salaries) if rng.random() < 0.5 else rng.randint(20000, 140000)
+
+
+def random_talent(rng: random.Random, index: int, missing: bool = True) -> dict:
+    """
+    A random talent. With missing, scalar fields and the role list can be None.
+    """
+    return {
+        'talent_id': f'talent_{index}',
+        'salary_expectation': salary(rng, missing),
+        'degree': rng.choice(list(degree_mapping) + ['unknown-degree'] + ([None] if missing else [])),
+        'seniority': rng.choice(list(seniority_mapping) + ['unknown-seniority'] + ([None] if missing else [])),
+        'job_roles': None if missing and rng.random() < 0.1 else pick(rng, job_roles, 4),
+        'languages': [{'title': rng.choice(languages), 'rating': rng.choice(list(rating_mapping))}
+                      for _ in range(rng.randint(0, 4))],
+    }
+
+
+def random_job(rng: random.Random, index: int, missing: bool = True) -> dict:
+    """
+    A random job. With missing, scalar fields and the role and seniority lists can be None. Job seniorities are
+    always known, the row-wise reference can not look up unknown ones.
+    """
+    return {
+        'job_id': f'job_{index}',
+        'max_salary': salary(rng, missing),
+        'min_degree': rng.choice(list(degree_mapping) + ['unknown-degree'] + ([None] if missing else [])),
+        'seniorities': None if missing and rng.random() < 0.1 else pick(rng, list(seniority_mapping), 3),
+        'job_roles': None if missing and rng.random() < 0.1 else pick(rng, job_roles, 3),
+        'languages': [{'title': rng.choice(languages), 'rating': rng.choice(list(rating_mapping)),
+                       'must_have': rng.random() < 0.5} for _ in range(rng.randint(0, 3))],
+    }
@@ -0,0 +1,103 @@
+"""
+The vectorized feature engines (the row feature registry of FeatureTransformer, and the talent x job encodings of
+CrossFeatureTransformer from dicts and from columns) against a row-wise reference of the features, on randomized
+talents and jobs.
+"""
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from src.api.columns import talent_columns, job_columns
+from src.config.feature_settings import salary_bins, salary_labels, degree_mapping, seniority_mapping, selected_features
+from src.data_processing.feature_transformer.cross_transformer import CrossFeatureTransformer, concat_encodings
+from src.data_processing.feature_transformer.job_roles_transformer import JobRolesTransformer
+from src.data_processing.feature_transformer.language_transformer import LanguageTransformer
+from src.data_processing.feature_transformer.main_transformer import FeatureTransformer
+from tests.records import random_talent, random_job
+
+
+def reference_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The selected features of a frame of talent/job pairs, computed row by row (as the feature transformers did
+    before the vectorized engines).
+    """
+    talent_salary = df['talent.salary_expectation'].fillna(0)
+    job_salary = df['job.max_salary'].fillna(0)
+    talent_degree = df['talent.degree'].fillna('none').map(degree_mapping)
+    job_degree = df['job.min_degree'].fillna('none').map(degree_mapping)
+    talent_seniority = df['talent.seniority'].fillna('none').map(seniority_mapping)
+    job_seniorities = [[seniority_mapping[seniority] for seniority in (['none'] if seniorities is None else seniorities)]
+                       for seniorities in df['job.seniorities']]
+    talent_roles = [['none'] if roles is None else roles for roles in df['talent.job_roles']]
+    job_roles = [['none'] if roles is None else roles for roles in df['job.job_roles']]
+    return pd.DataFrame({
+        'salary_match_binary': (talent_salary <= job_salary).astype(int),
+        'salary_diff': np.where(job_salary == 0, 0, round((job_salary - talent_salary) / job_salary, 2)),
+        'talent_salary_bin': pd.cut(talent_salary, bins=salary_bins, labels=salary_labels, right=False),
+        'job_max_salary_bin': pd.cut(job_salary, bins=salary_bins, labels=salary_labels, right=False),
+        'degree_match_binary': (talent_degree >= job_degree).astype(int),
+        'seniority_match_binary': [int(talent in job) for talent, job in zip(talent_seniority, job_seniorities)],
+        'seniority_exceed_binary': [int(all(talent > label for label in job))
+                                    for talent, job in zip(talent_seniority, job_seniorities)],
+        'job_roles_match_binary': [JobRolesTransformer.job_roles_match(talent, job)
+                                   for talent, job in zip(talent_roles, job_roles)],
+        'language_must_have_match_binary': [LanguageTransformer.must_have_languages_match(talent, job)
+                                            for talent, job in zip(df['talent.languages'], df['job.languages'])],
+        'language_good2have_count': [LanguageTransformer.count_good2have_languages(talent, job)
+                                     for talent, job in zip(df['talent.languages'], df['job.languages'])],
+    }, index=df.index)
+
+
+def assert_features_equal(actual, expected: pd.DataFrame) -> None:
+    """
+    Compare feature values column by column (NaN salary bins compare equal).
+    """
+    for i, feature in enumerate(selected_features):
+        values = actual[feature] if isinstance(actual, pd.DataFrame) else actual[:, i]
+        np.testing.assert_array_equal(np.asarray(values, dtype=float), np.asarray(expected[feature], dtype=float),
+                                      err_msg=feature)
+
+
+def pair_frame(talents: list[dict], jobs: list[dict]) -> pd.DataFrame:
+    """
+    The raw frame of all talent x job pairs, talent-major.
+    """
+    return pd.json_normalize([{'talent': talent, 'job': job} for talent in talents for job in jobs], sep='.')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_row_features_match_reference(seed):
+    rng = random.Random(seed)
+    df = pd.json_normalize([{'talent': random_talent(rng, i), 'job': random_job(rng, i)} for i in range(300)], sep='.')
+    X = FeatureTransformer().transform_features(df)
+    assert list(X.columns) == selected_features
+    assert_features_equal(X, reference_features(df))
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('max_tokens', [1000, 3])
+def test_cross_features_match_reference(seed, max_tokens):
+    # With max_tokens=3 most languages and roles are outside of the capped vocabularies
+    rng = random.Random(seed)
+    talents = [random_talent(rng, i) for i in range(25)]
+    jobs = [random_job(rng, i) for i in range(30)]
+    transformer = CrossFeatureTransformer(max_languages=max_tokens, max_job_roles=max_tokens)
+    talent_encoding = transformer.encode_talents(pd.json_normalize([{'talent': talent} for talent in talents], sep='.'))
+    # Jobs encoded in two calls, the first one before the vocabularies grew, and combined
+    job_encoding = concat_encodings([
+        transformer.encode_jobs(pd.json_normalize([{'job': job} for job in part], sep='.')) for part in [jobs[:10], jobs[10:]]
+    ])
+    X = transformer.transform(talent_encoding, job_encoding, as_frame=False)
+    assert_features_equal(X, reference_features(pair_frame(talents, jobs)))
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('max_tokens', [1000, 3])
+def test_columnar_cross_features_match_reference(seed, max_tokens):
+    rng = random.Random(seed)
+    talents = [random_talent(rng, i, missing=False) for i in range(25)]
+    jobs = [random_job(rng, i, missing=False) for i in range(30)]
+    transformer = CrossFeatureTransformer(max_languages=max_tokens, max_job_roles=max_tokens)
+    X = transformer.transform(transformer.encode_talent_columns(talent_columns(talents)),
+                              transformer.encode_job_columns(job_columns(jobs)), as_frame=False)
+    assert_features_equal(X, reference_features(pair_frame(talents, jobs)))
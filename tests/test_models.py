@@ -0,0 +1,72 @@
+"""
+The NumPy serving models against the sklearn models they are exported from, on randomized feature rows.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from src.config.feature_settings import selected_features, salary_labels
+from src.models.compiled_forest import CompiledForest
+from src.models.logistic_regression_scorer import LogisticRegressionScorer
+
+
+def random_features(rng: np.random.Generator, n_rows: int, nan_bins: float = 0.0) -> pd.DataFrame:
+    """
+    Random rows of the selected features, with NaN salary bins (salaries outside of the bins) at the given rate.
+    """
+    X = pd.DataFrame({feature: rng.integers(0, 2, n_rows).astype(float) for feature in selected_features})
+    X['salary_diff'] = np.round(rng.normal(0, 0.5, n_rows), 2)
+    X['language_good2have_count'] = rng.integers(0, 4, n_rows).astype(float)
+    for feature in ['talent_salary_bin', 'job_max_salary_bin']:
+        X[feature] = rng.choice(salary_labels, n_rows).astype(float)
+        X.loc[rng.random(n_rows) < nan_bins, feature] = np.nan
+    return X
+
+
+def random_labels(X: pd.DataFrame, rng: np.random.Generator) -> np.ndarray:
+    """
+    Labels that depend on the features, plus noise.
+    """
+    signal = X['salary_match_binary'] + X['job_roles_match_binary'] + X['language_must_have_match_binary'] + X['salary_diff']
+    return (signal + rng.normal(0, 0.7, len(X)) > 1.5).astype(int)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_logistic_regression_scorer_matches_sklearn(seed):
+    rng = np.random.default_rng(seed)
+    X = random_features(rng, 2000)
+    model = LogisticRegression().fit(X, random_labels(X, rng))
+    scorer = LogisticRegressionScorer.from_model(model)
+
+    X_test = random_features(rng, 5000)
+    labels, scores = scorer.predict_with_scores(X_test)
+    np.testing.assert_array_equal(labels, model.predict(X_test))
+    np.testing.assert_allclose(scores, model.predict_proba(X_test)[:, 1], rtol=1e-12)
+    np.testing.assert_array_equal(scorer.predict(X_test[selected_features].to_numpy()), model.predict(X_test))
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('train_nan_bins', [0.0, 0.2])
+def test_compiled_forest_matches_sklearn(seed, train_nan_bins):
+    # Forests trained with and without NaN bins, both scored on rows with NaN bins
+    rng = np.random.default_rng(seed)
+    X = random_features(rng, 2000, nan_bins=train_nan_bins)
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=seed).fit(X, random_labels(X, rng))
+    forest = CompiledForest.from_model(model)
+
+    # More rows than the batch size, so that the rows are reduced to their threshold bins first
+    for n_rows in [100, 5000]:
+        X_test = random_features(rng, n_rows, nan_bins=0.2)
+        np.testing.assert_allclose(forest.predict_proba(X_test), model.predict_proba(X_test), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(forest.predict(X_test), model.predict(X_test))
+
+
+def test_compiled_forest_save_and_load(tmp_path):
+    rng = np.random.default_rng(0)
+    X = random_features(rng, 1000, nan_bins=0.2)
+    model = RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0).fit(X, random_labels(X, rng))
+    CompiledForest.from_model(model).save(str(tmp_path))
+    X_test = random_features(rng, 500, nan_bins=0.2)
+    np.testing.assert_allclose(CompiledForest.load(str(tmp_path)).predict_proba(X_test), model.predict_proba(X_test),
+                               rtol=0, atol=1e-12)
@@ -0,0 +1,19 @@
+"""
+The process-parallel FeatureTransformer against the serial one.
+"""
+import random
+import pandas as pd
+import pytest
+from src.data_processing.feature_transformer.main_transformer import FeatureTransformer
+from tests.records import random_talent, random_job
+
+
+@pytest.mark.parametrize('n_rows', [199, 200, 457])
+def test_parallel_transform_matches_serial(n_rows):
+    rng = random.Random(n_rows)
+    df = pd.json_normalize([{'talent': random_talent(rng, i), 'job': random_job(rng, i)} for i in range(n_rows)], sep='.')
+    # Row partitions of at least 50 rows, so 3 workers split the frames unevenly
+    parallel = FeatureTransformer(workers=3, min_partition_size=50)
+    serial = FeatureTransformer(workers=1)
+    pd.testing.assert_frame_equal(parallel.transform_features(df), serial.transform_features(df))
+    pd.testing.assert_frame_equal(parallel.transform(df.copy()), serial.transform(df.copy()))